@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark upload preprocessing for ImageAnalyzer on a labeled sample.
+
+Runs every image through each preprocessing variant and reports, per
+variant, the bytes uploaded, model latency and species accuracy against the
+labels, so a smaller upload setting can be adopted only at equal accuracy.
+
+Labels: CSV with columns ``file,species`` (scientific or common name;
+relative paths are resolved against the CSV's folder).
+
+Usage:
+    python bench_image_prep.py labels.csv --variants off,1600:85,1024:80,1024:80:WEBP -o prep_report.json
+    python bench_image_prep.py labels.csv --dry-run    # bytes and prep time only, no API calls
+"""
+
+import argparse
+import csv
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from image_prep import ImagePrep, load_image
+
+
+def parse_variant(spec: str) -> Tuple[str, ImagePrep]:
+    """``off`` or ``MAX_SIDE:QUALITY[:FORMAT]``."""
+    if spec == "off":
+        return spec, ImagePrep(enabled=False)
+    parts = spec.split(":")
+    fmt = parts[2].upper() if len(parts) > 2 else "JPEG"
+    return spec, ImagePrep(max_side=int(parts[0]), quality=int(parts[1]) if len(parts) > 1 else 85, format=fmt)
+
+
+def load_labels(path: str) -> List[Tuple[str, str]]:
+    base = Path(path).parent
+    with open(path, newline="") as f:
+        rows = [(r["file"], r["species"]) for r in csv.DictReader(f) if r.get("file")]
+    return [(str(p if Path(p).is_absolute() else base / p), species) for p, species in rows]
+
+
+def _norm(text: Optional[str]) -> str:
+    return " ".join(str(text or "").lower().replace("_", " ").split())
+
+
+def is_correct(result: Dict[str, Any], label: str) -> bool:
+    """Label matches the predicted scientific name (genus + species) or any common name."""
+    species = result.get("species") or {}
+    want = _norm(label)
+    if not want:
+        return False
+    names = [species.get("common_name")] + list(species.get("other_common_names") or [])
+    if any(_norm(n) == want for n in names):
+        return True
+    scientific = _norm(species.get("scientific_name"))
+    # A subspecies prediction still counts for a species-level label
+    return bool(scientific) and (scientific == want or scientific.startswith(want + " "))
+
+
+def _stats(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"mean": None, "p50": None, "p90": None}
+    arr = np.asarray(values, dtype=float)
+    return {"mean": round(float(arr.mean()), 1), "p50": round(float(np.percentile(arr, 50)), 1),
+            "p90": round(float(np.percentile(arr, 90)), 1)}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    samples = load_labels(args.labels)[: args.limit or None]
+    variants = [parse_variant(v.strip()) for v in args.variants.split(",") if v.strip()]
+    analyzer = None
+    if not args.dry_run:
+        from img import ImageAnalyzer
+        from phash_index import PerceptualIndex
+        from triage import Triage
+        # Every variant must reach the model: no near-duplicate reuse, no local skips
+        analyzer = ImageAnalyzer(dedup=PerceptualIndex(enabled=False), triage=Triage(enabled=False))
+    report: Dict[str, Any] = {"images": len(samples), "variants": {}}
+    for name, prep in variants:
+        sent, original, prep_ms, latency = [], [], [], []
+        correct = errors = 0
+        for path, label in samples:
+            if analyzer is None:
+                img, raw, _ = load_image(path)
+                _, upload = prep.prepare(img, len(raw))
+                if not prep.enabled:
+                    # What the SDK would upload for the decoded original
+                    upload["sent_bytes"] = len(raw)
+            else:
+                analyzer.prep = prep
+                result = analyzer.analyze_with_context(path)
+                upload = (result.get("metadata") or {}).get("upload") or {}
+                if "error" in result:
+                    errors += 1
+                elif is_correct(result, label):
+                    correct += 1
+                if upload.get("model_latency_ms") is not None:
+                    latency.append(upload["model_latency_ms"])
+                if not prep.enabled:
+                    upload["sent_bytes"] = upload.get("original_bytes")
+                time.sleep(args.pause)
+            sent.append(upload.get("sent_bytes") or 0)
+            original.append(upload.get("original_bytes") or 0)
+            prep_ms.append(upload.get("prep_ms") or 0.0)
+        entry: Dict[str, Any] = {
+            "upload_bytes_total": int(sum(sent)),
+            "upload_bytes_mean": int(np.mean(sent)) if sent else 0,
+            "original_bytes_total": int(sum(original)),
+            "bytes_saved_pct": round(100.0 * (1 - sum(sent) / sum(original)), 1) if sum(original) else None,
+            "prep_ms": _stats(prep_ms),
+        }
+        if analyzer is not None:
+            scored = len(samples) - errors
+            entry.update({
+                "model_latency_ms": _stats(latency),
+                "accuracy": round(correct / scored, 3) if scored else None,
+                "correct": correct,
+                "errors": errors,
+            })
+        report["variants"][name] = entry
+        print(f"{name:>16}: {entry['upload_bytes_mean'] / 1024:8.1f} KiB/image"
+              f"  saved {entry['bytes_saved_pct']}%"
+              + (f"  latency p50 {entry['model_latency_ms']['p50']} ms  accuracy {entry['accuracy']}"
+                 if analyzer is not None else ""))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload preprocessing benchmark for ImageAnalyzer")
+    parser.add_argument("labels", help="CSV with file,species columns")
+    parser.add_argument("--variants", default="off,1600:85,1024:80,1024:80:WEBP",
+                        help="Comma-separated: off or MAX_SIDE:QUALITY[:FORMAT]")
+    parser.add_argument("--limit", type=int, default=0, help="Use only the first N images")
+    parser.add_argument("--dry-run", action="store_true", help="Measure bytes and prep time without calling Gemini")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds between API calls (rate limits)")
+    parser.add_argument("--output", "-o", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report saved to: {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
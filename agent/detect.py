@@ -8,17 +8,25 @@ and routes to the appropriate analyzer.
 """
 
 import os
+import copy
 import json
 import argparse
 import mimetypes
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
 
 # Import our analyzer classes
 from img import ImageAnalyzer
 from video2 import VideoAnalyzer
 from sound import AudioAnalyzer
+from media_metadata import extract_metadata, fill_context
+from image_prep import load_image
+from triage import AUDIT, SKIP, no_subject_result
+from fused_analysis import (Evidence, build_prompt, limits_from_env, merge_analyses, parse_json,
+                            request_contents, split_batches)
+from phash_index import for_report
 
 class UniversalDetector:
     """
@@ -84,6 +92,23 @@ class UniversalDetector:
         Returns:
             Analysis results as dictionary
         """
+        return self.analyze_with_context(file_path)
+    
+    def analyze_with_context(self, file_path: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Analyze any file type with report context
+        
+        Missing coordinates and timestamp in the context are filled from the
+        file's own capture metadata (image EXIF, video container) first.
+        
+        Args:
+            file_path: Path to the file to analyze
+            context: Optional report context (location, description, coordinates, timestamp, ...)
+            
+        Returns:
+            Analysis results as dictionary
+        """
+        media = None
         try:
             # Clean path and check if file exists
             file_path = file_path.replace(" ", "")
@@ -112,11 +137,16 @@ class UniversalDetector:
             print(f"📁 Analyzing: {file_path}")
             
             if file_type == 'image':
-                result = self.image_analyzer.analyze(file_path)
+                # ImageAnalyzer reads EXIF itself and records it in its own metadata
+                result = self.image_analyzer.analyze_with_context(file_path, context)
             elif file_type == 'video':
-                result = self.video_analyzer.analyze(file_path)
+                media = extract_metadata(file_path, 'video')
+                context, media["filled"] = fill_context(context, media)
+                if media["filled"]:
+                    print(f"📍 Filled {', '.join(media['filled'])} from video metadata")
+                result = self.video_analyzer.analyze_with_context(file_path, context)
             elif file_type == 'audio':
-                result = self.audio_analyzer.analyze(file_path)
+                result = self.audio_analyzer.analyze_with_context(file_path, context)
             else:
                 error_result = {
                     "error": f"Unsupported file type: {file_type}",
@@ -126,7 +156,7 @@ class UniversalDetector:
                 return self._add_metadata(error_result, file_path, file_type)
             
             # Add universal metadata
-            return self._add_metadata(result, file_path, file_type)
+            return self._add_metadata(result, file_path, file_type, media)
             
         except Exception as e:
             error_result = {
@@ -136,7 +166,193 @@ class UniversalDetector:
             }
             return self._add_metadata(error_result, file_path, "unknown")
     
-    def _add_metadata(self, result: Dict[str, Any], file_path: str, file_type: str) -> Dict[str, Any]:
+    def analyze_report(
+        self,
+        file_paths: List[str],
+        context: Optional[Dict[str, Any]] = None,
+        max_request_bytes: Optional[int] = None,
+        max_parts: Optional[int] = None,
+        max_clip_bytes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Analyze all evidence of one report with as few model calls as possible
+        
+        Images and short clips go into one multimodal request (split only when the
+        payload or part limits are hit) and come back as one fused analysis with
+        per-evidence notes. Audio, long videos and unknown files are analyzed on
+        their own and attached under ``individual_results``.
+        
+        Args:
+            file_paths: Paths of the report's evidence files
+            context: Optional report context (see analyze_with_context)
+            max_request_bytes, max_parts, max_clip_bytes: Override the FUSED_* limits
+            
+        Returns:
+            One analysis in the single-file schema plus ``evidence_notes``
+        """
+        env_bytes, env_parts, env_clip = limits_from_env()
+        max_request_bytes = max_request_bytes or env_bytes
+        max_parts = max_parts or env_parts
+        max_clip_bytes = max_clip_bytes or env_clip
+        
+        items: List[Evidence] = []
+        reused: List[Evidence] = []
+        separate: List[str] = []
+        notes: List[Dict[str, Any]] = []
+        analyses: List[Dict[str, Any]] = []
+        dedup = self.image_analyzer.dedup
+        for index, file_path in enumerate(file_paths, 1):
+            file_type = self.detect_file_type(file_path)
+            try:
+                if file_type == 'image':
+                    item = self._image_evidence(f"E{index}", file_path, context)
+                elif file_type == 'video' and os.path.getsize(file_path) <= max_clip_bytes:
+                    with open(file_path, 'rb') as f:
+                        data = f.read()
+                    mime_type = mimetypes.guess_type(file_path)[0] or 'video/mp4'
+                    item = Evidence(f"E{index}", file_path, 'video', mime_type, data,
+                                    media=extract_metadata(file_path, 'video'))
+                else:
+                    separate.append(file_path)
+                    continue
+            except Exception as e:
+                print(f"⚠️ Could not prepare {file_path} for the fused request: {e}")
+                separate.append(file_path)
+                continue
+            context, filled = fill_context(context, item.media)
+            if filled:
+                item.media["filled"] = filled
+                print(f"📍 Filled {', '.join(filled)} from {Path(file_path).name}")
+            if item.screen is not None and item.screen["decision"] == SKIP:
+                notes.append({"evidence_id": item.id, "summary": "No subject detected by local triage; not sent",
+                              "species_seen": "", "supports_assessment": False, "notes": ""})
+                continue
+            previous = item.near.pop("previous", None) if item.near else None
+            if previous and dedup.mode == "reuse":
+                # Burst shot or re-compressed copy of an analyzed image: its analysis joins the merge
+                match = item.near["match"]
+                match["reused"] = True
+                analyses.append(for_report(previous, context))
+                notes.append({"evidence_id": item.id,
+                              "summary": f"Near-duplicate of {match['source'] or match['id']}; reused its analysis",
+                              "species_seen": (previous.get("species") or {}).get("common_name", ""),
+                              "supports_assessment": True, "notes": ""})
+                reused.append(item)
+                continue
+            items.append(item)
+        
+        batches, oversize = split_batches(items, max_request_bytes, max_parts)
+        separate += [item.path for item in oversize]
+        print(f"🧩 Fused analysis: {len(items)} item(s) in {len(batches)} request(s), "
+              f"{len(separate)} analyzed separately")
+        
+        requests: List[Dict[str, Any]] = []
+        for batch in batches:
+            prompt = build_prompt(batch, context)
+            start = time.perf_counter()
+            entry: Dict[str, Any] = {
+                "evidence": [item.id for item in batch],
+                "payload_bytes": sum(item.payload_bytes for item in batch),
+                "prompt_chars": len(prompt),
+            }
+            try:
+                response = self.image_analyzer.model.generate_content(request_contents(prompt, batch))
+                analysis = parse_json(getattr(response, "text", "") or "")
+                if analysis is None:
+                    entry["error"] = "Failed to parse JSON"
+                else:
+                    analyses.append(analysis)
+                    # Each image of the request is indexed with the analysis it got
+                    indexed = {k: v for k, v in analysis.items() if k != "evidence_notes"}
+                    for item in batch:
+                        if item.near is not None:
+                            dedup.add(item.near["hashes"], copy.deepcopy(indexed), item.path)
+            except Exception as e:
+                entry["error"] = str(e)
+            entry["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            requests.append(entry)
+        
+        individual = {path: self.analyze_with_context(path, context) for path in separate}
+        # Separately analyzed files count towards the report's assessment too
+        for single in individual.values():
+            body = self._analysis_body(single)
+            if body is not None:
+                analyses.append(body)
+        
+        if analyses:
+            result = merge_analyses(analyses)
+        elif notes and len(notes) == len(file_paths):
+            # Local triage found no subject in any file
+            result = no_subject_result(context)
+        else:
+            errors = [r["error"] for r in requests if r.get("error")]
+            errors += [str(r.get("error")) for r in individual.values() if isinstance(r, dict) and r.get("error")]
+            result = {"error": "; ".join(errors) or "No analysis returned", "status": "failed"}
+        result["evidence_notes"] = notes + list(result.get("evidence_notes") or [])
+        
+        # Audited would-be skips are scored from their evidence note
+        seen = {n.get("evidence_id"): n.get("species_seen") for n in result["evidence_notes"]}
+        for item in items:
+            if item.screen is not None and item.screen["decision"] == AUDIT:
+                self.image_analyzer.triage.record_audit(
+                    item.screen, {"species": {"common_name": seen.get(item.id) or "", "confidence": 1}}, item.path)
+        
+        if individual:
+            result["individual_results"] = individual
+        
+        result["metadata"] = {
+            "analysis_type": "fused_report",
+            "timestamp": self._get_timestamp(),
+            "model": "gemini-2.5-flash",
+            "evidence": [dict(item.describe(), upload=item.upload, media_metadata=item.media, triage=item.screen,
+                              near_duplicate=item.near and {
+                                  "phash": f"{item.near['hashes']['phash']:016x}",
+                                  "dhash": f"{item.near['hashes']['dhash']:016x}",
+                                  "match": item.near["match"]})
+                         for item in items + reused],
+            "requests": requests,
+            "model_calls": len(requests) + len(separate),
+            # One call per file is what per-file analysis would have made
+            "model_calls_saved": len(file_paths) - len(requests) - len(separate),
+            "context_filled": sorted({f for item in items for f in item.media.get("filled", [])}),
+        }
+        return result
+    
+    @staticmethod
+    def _analysis_body(result: Any) -> Optional[Dict[str, Any]]:
+        """The schema part of a single-file result (audio nests it under "analysis"), or None on failure"""
+        if not isinstance(result, dict) or result.get("error"):
+            return None
+        body = result if "risk_assessment" in result or "species" in result else result.get("analysis")
+        if not isinstance(body, dict) or body.get("error") or "risk_assessment" not in body:
+            return None
+        body = copy.deepcopy(body)
+        body.pop("metadata", None)
+        return body
+    
+    def _image_evidence(self, evidence_id: str, file_path: str,
+                        context: Optional[Dict[str, Any]] = None) -> Evidence:
+        """Load, read EXIF, triage and prepare one image exactly as ImageAnalyzer would"""
+        analyzer = self.image_analyzer
+        img, original, suffix = load_image(file_path)
+        media = extract_metadata(img, 'image')
+        archived = analyzer.prep.archive(original, suffix) if original else None
+        part, upload = analyzer.prep.prepare(img, len(original) if original else None)
+        upload["archived_original"] = archived
+        if not isinstance(part, dict):
+            # Prep disabled: send the original file bytes
+            part = {"mime_type": mimetypes.guess_type(file_path)[0] or "image/jpeg", "data": original}
+        screen = analyzer.triage.screen(img) if analyzer.triage.applies(context) else None
+        near = None
+        if analyzer.dedup.enabled:
+            hashes = analyzer.dedup.hash_image(img, original)
+            match = analyzer.dedup.lookup(hashes)
+            near = {"hashes": hashes, "match": match, "previous": match.pop("analysis") if match else None}
+        return Evidence(evidence_id, file_path, 'image', part["mime_type"], part["data"],
+                        media=media, upload=upload, screen=screen, near=near)
+    
+    def _add_metadata(self, result: Dict[str, Any], file_path: str, file_type: str,
+                      media: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Add universal metadata to the analysis result
         
@@ -144,6 +360,7 @@ class UniversalDetector:
             result: The analysis result
             file_path: The original file path
             file_type: The detected file type
+            media: Capture metadata read from the file (gps, timestamp, camera, filled fields)
             
         Returns:
             Dict with added metadata
@@ -159,6 +376,8 @@ class UniversalDetector:
                 "version": "1.0.0"
             }
         }
+        if media:
+            universal_metadata["media_metadata"] = media
         
         if isinstance(result, dict):
             # Merge with existing metadata if present
@@ -267,6 +486,7 @@ Examples:
   python detect.py video.mp4 --output results.json  # Analyze video with custom output
   python detect.py audio.mp3 --batch            # Analyze multiple files
   python detect.py *.jpg --output-dir results/  # Batch analyze all JPG files
+  python detect.py a.jpg b.jpg clip.mp4 --fused # One fused analysis for a whole report
         """
     )
     
@@ -274,6 +494,7 @@ Examples:
     parser.add_argument("--output", "-o", help="Output file path for single file analysis")
     parser.add_argument("--output-dir", "-d", help="Output directory for batch analysis")
     parser.add_argument("--batch", action="store_true", help="Enable batch mode for multiple files")
+    parser.add_argument("--fused", action="store_true", help="Analyze all files as one report in a single fused model call")
     parser.add_argument("--api-key", help="Gemini API key (optional, can use environment variable)")
     parser.add_argument("--save-json", help="Path to existing analysis JSON to save with universal metadata")
     parser.add_argument("--file", dest="src_file", help="Original source file path when using --save-json")
@@ -301,6 +522,16 @@ Examples:
         print(f"✅ Results saved to: {saved_path}")
         return
 
+    if args.fused and args.files:
+        # One report: images and short clips share a request, one fused analysis comes back
+        result = detector.analyze_report(args.files)
+        output_file = args.output or "report_analysis.json"
+        detector.save_results(result, output_file)
+        print(f"✅ Results saved to: {output_file}")
+        metadata = result.get("metadata", {})
+        print(f"📊 {len(args.files)} file(s), {metadata.get('model_calls')} model call(s)")
+        return
+
     if len(args.files) == 1 and not args.batch:
         # Single file analysis
         file_path = args.files[0]
@@ -0,0 +1,219 @@
+"""
+Single-call analysis of all evidence in one report.
+
+A report with five photos of one incident used to make five Gemini calls
+with the same long prompt and came back with five partly conflicting risk
+assessments. Here every image and short clip of a report goes into one
+multimodal request under one prompt, labelled E1..En, and the model returns
+one fused analysis plus a note per evidence item.
+
+Requests are split by payload size (inline data is limited per request)
+and part count; the fused results of several requests are merged
+deterministically (highest urgency/score wins, evidence lists are joined).
+
+Configuration (environment, or UniversalDetector.analyze_report arguments):
+    FUSED_MAX_REQUEST_MB=18      inline payload per request (base64 size)
+    FUSED_MAX_PARTS=16           evidence items per request
+    FUSED_MAX_CLIP_MB=8          larger videos are analyzed on their own
+"""
+
+import copy
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from video2 import SNAKE_SCHEMA_TEMPLATE
+
+# The video analyzer's schema is the shared single-analysis schema; metadata is ours to fill
+ANALYSIS_SCHEMA: Dict[str, Any] = {k: v for k, v in SNAKE_SCHEMA_TEMPLATE.items() if k != "metadata"}
+EVIDENCE_NOTE_SCHEMA: Dict[str, Any] = {
+    "evidence_id": "",        # E1, E2, ... as labelled in the request
+    "summary": "",            # one line: what this item shows
+    "species_seen": "",       # common name, or "" if none visible/audible
+    "supports_assessment": True,
+    "notes": "",              # conflicts with other evidence, quality problems
+}
+URGENCY_ORDER = ["low", "moderate", "high", "critical", "emergency"]
+
+
+@dataclass
+class Evidence:
+    """One image or clip prepared for a fused request."""
+
+    id: str
+    path: str
+    file_type: str
+    mime_type: str
+    data: bytes
+    media: Dict[str, Any] = field(default_factory=dict)
+    upload: Dict[str, Any] = field(default_factory=dict)
+    screen: Optional[Dict[str, Any]] = None
+    # Perceptual hashes and near-duplicate match (images only); "previous" holds the matched analysis
+    near: Optional[Dict[str, Any]] = None
+
+    @property
+    def payload_bytes(self) -> int:
+        # Inline parts travel base64-encoded in the REST request body
+        return (len(self.data) + 2) // 3 * 4
+
+    def part(self) -> Dict[str, Any]:
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "evidence_id": self.id,
+            "file": os.path.basename(self.path),
+            "type": self.file_type,
+            "payload_bytes": self.payload_bytes,
+        }
+
+
+def limits_from_env() -> Tuple[int, int, int]:
+    """(max request bytes, max parts, max clip bytes)."""
+    mb = 1024 * 1024
+    return (
+        int(float(os.getenv("FUSED_MAX_REQUEST_MB", "18")) * mb),
+        int(os.getenv("FUSED_MAX_PARTS", "16")),
+        int(float(os.getenv("FUSED_MAX_CLIP_MB", "8")) * mb),
+    )
+
+
+def split_batches(
+    items: List[Evidence], max_bytes: int, max_parts: int
+) -> Tuple[List[List[Evidence]], List[Evidence]]:
+    """
+    Pack evidence, in order, into requests under the size and part limits.
+
+    Returns:
+        (batches, oversize items that do not fit a request even alone)
+    """
+    batches: List[List[Evidence]] = []
+    oversize: List[Evidence] = []
+    current: List[Evidence] = []
+    size = 0
+    for item in items:
+        if item.payload_bytes > max_bytes:
+            oversize.append(item)
+            continue
+        if current and (size + item.payload_bytes > max_bytes or len(current) >= max_parts):
+            batches.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += item.payload_bytes
+    if current:
+        batches.append(current)
+    return batches, oversize
+
+
+def build_prompt(batch: List[Evidence], context: Optional[Dict[str, Any]] = None) -> str:
+    """One prompt covering every item of the batch; items are labelled by their evidence id."""
+    context = context or {}
+    listing = []
+    for item in batch:
+        line = f"- {item.id}: {item.file_type}, {os.path.basename(item.path)}"
+        if item.media.get("timestamp"):
+            line += f", captured {item.media['timestamp']}"
+        if item.media.get("gps"):
+            line += f", GPS {item.media['gps']['latitude']},{item.media['gps']['longitude']}"
+        listing.append(line)
+    schema = copy.deepcopy(ANALYSIS_SCHEMA)
+    schema["evidence_notes"] = [EVIDENCE_NOTE_SCHEMA]
+    return f"""Wildlife Threat Analysis - One report, {len(batch)} evidence items + Context
+
+CONTEXT INFORMATION:
+- Location: {context.get('location', 'Not provided')}
+- Threat Description: {context.get('description', 'Not provided')}
+- Threat Type: {context.get('threat_type', 'Not provided')}
+- Coordinates: {context.get('coordinates', 'Not provided')}
+- Captured At: {context.get('timestamp') or 'Not provided'}
+- Report ID: {context.get('report_id', 'Not provided')}
+- Evidence Count: {context.get('evidence_count', 'Not provided')}
+- Reporter Name: {context.get('reporter_name', 'anonymous')}
+
+EVIDENCE (each item follows its label in the request):
+{chr(10).join(listing)}
+
+All items belong to the same incident. Combine them into ONE assessment: identify the
+species from the clearest item, use every item for threat and risk evaluation, and
+resolve conflicts between items instead of reporting them separately.
+
+Return ONLY valid JSON that matches EXACTLY this schema (same keys, no extras), with one
+"evidence_notes" entry per evidence item:
+{json.dumps(schema, indent=2)}
+
+Return only valid JSON without any Markdown or commentary.
+"""
+
+
+def request_contents(prompt: str, batch: List[Evidence]) -> List[Any]:
+    """Prompt, then each item's label followed by its media part."""
+    contents: List[Any] = [prompt]
+    for item in batch:
+        contents.append(f"Evidence {item.id}:")
+        contents.append(item.part())
+    return contents
+
+
+def parse_json(raw: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(raw)
+    except ValueError:
+        pass
+    match = re.search(r"\{[\s\S]*\}", raw or "")
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except ValueError:
+            return None
+    return None
+
+
+def _score(analysis: Dict[str, Any]) -> Tuple[int, float]:
+    risk = analysis.get("risk_assessment") or {}
+    urgency = str(risk.get("urgency") or "").strip().lower()
+    try:
+        score = float(risk.get("ai-score") or 0)
+    except (TypeError, ValueError):
+        score = 0.0
+    return (URGENCY_ORDER.index(urgency) if urgency in URGENCY_ORDER else -1, score)
+
+
+def _species_confidence(analysis: Dict[str, Any]) -> float:
+    try:
+        return float((analysis.get("species") or {}).get("confidence") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def merge_analyses(analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fuse the results of several requests of one report.
+
+    The most urgent result is the base; species comes from the most confident
+    result, threat evidence lists are joined and an incident category counts
+    if any request flagged it.
+    """
+    if len(analyses) == 1:
+        return analyses[0]
+    fused = copy.deepcopy(max(analyses, key=_score))
+    fused["species"] = copy.deepcopy(max(analyses, key=_species_confidence).get("species", fused.get("species")))
+    threats = fused.setdefault("threat_analysis", {})
+    for key in ("evidence", "weapons_traps", "suspicious_activity"):
+        joined: List[Any] = []
+        for analysis in analyses:
+            for entry in (analysis.get("threat_analysis") or {}).get(key) or []:
+                if entry not in joined:
+                    joined.append(entry)
+        threats[key] = joined
+    threats["illegal_activity_detected"] = any(
+        (a.get("threat_analysis") or {}).get("illegal_activity_detected") for a in analyses
+    )
+    incident = fused.setdefault("incident", {})
+    for analysis in analyses:
+        for name, flag in (analysis.get("incident") or {}).items():
+            if str(flag).lower() == "true":
+                incident[name] = "true"
+    fused["evidence_notes"] = [note for a in analyses for note in a.get("evidence_notes") or []]
+    return fused
@@ -0,0 +1,140 @@
+"""
+Image preprocessing before upload to Gemini.
+
+Phone and camera-trap photos are 12-48 MP; sending them as-is makes uploads
+slow and costs image tokens without helping species identification, which
+the model does at far lower resolution. ``ImagePrep`` applies the EXIF
+orientation, caps the long side, drops all metadata and re-encodes to JPEG
+or WebP at a fixed quality. The untouched original can be kept in an
+archive directory (content-addressed), so nothing is lost for evidence.
+
+Configuration (environment, or ImagePrep arguments):
+    IMAGE_PREP=0                 disable (send the decoded original)
+    IMAGE_PREP_MAX_SIDE=1600     long-side cap in pixels
+    IMAGE_PREP_FORMAT=JPEG       JPEG or WEBP
+    IMAGE_PREP_QUALITY=85        encoder quality
+    IMAGE_ARCHIVE_DIR=...        keep original bytes here (sha256 file names)
+"""
+
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+@dataclass
+class ImagePrep:
+    """Settings for the upload preprocessing stage."""
+
+    enabled: bool = True
+    max_side: int = 1600
+    format: str = "JPEG"
+    quality: int = 85
+    archive_dir: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "ImagePrep":
+        return cls(
+            enabled=os.getenv("IMAGE_PREP", "1").lower() not in ("0", "false", "no"),
+            max_side=int(os.getenv("IMAGE_PREP_MAX_SIDE", "1600")),
+            format=os.getenv("IMAGE_PREP_FORMAT", "JPEG").upper(),
+            quality=int(os.getenv("IMAGE_PREP_QUALITY", "85")),
+            archive_dir=os.getenv("IMAGE_ARCHIVE_DIR") or None,
+        )
+
+    def archive(self, original: bytes, suffix: str = "") -> Optional[str]:
+        """Store the original bytes once under their sha256; returns the archive path."""
+        if not self.archive_dir or not original:
+            return None
+        directory = Path(self.archive_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / (hashlib.sha256(original).hexdigest() + suffix.lower())
+        if not path.exists():
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_bytes(original)
+            os.replace(tmp, path)
+        return str(path)
+
+    def prepare(self, img: Image.Image, original_bytes: Optional[int] = None) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Make the upload payload for one image.
+
+        Args:
+            img: decoded (possibly lazily loaded) image
+            original_bytes: size of the source file/download, for the stats
+
+        Returns:
+            (content part for generate_content, stats dict)
+        """
+        start = time.perf_counter()
+        stats: Dict[str, Any] = {
+            "original_size": list(img.size),
+            "original_bytes": original_bytes,
+            "preprocessed": self.enabled,
+        }
+        if not self.enabled:
+            stats["prep_ms"] = 0.0
+            return img, stats
+        if original_bytes and img.format == "JPEG" and max(img.size) > 2 * self.max_side:
+            # Let the JPEG decoder skip work: DCT scaling decodes at 1/2, 1/4 or 1/8 size directly
+            scale = self.max_side / max(img.size)
+            img.draft("RGB", (max(1, int(img.size[0] * scale)), max(1, int(img.size[1] * scale))))
+        # Rotate by the EXIF orientation before the metadata (and the tag) is dropped
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if max(img.size) > self.max_side:
+            img = img.copy()
+            img.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+        buf = BytesIO()
+        fmt = self.format if self.format in MIME_TYPES else "JPEG"
+        # Re-encoding from pixels writes no EXIF/XMP/ICC blocks
+        save_args: Dict[str, Any] = {"quality": self.quality}
+        if fmt == "JPEG":
+            save_args.update(optimize=True, progressive=True)
+        elif fmt == "WEBP":
+            save_args.update(method=4)
+        img.save(buf, format=fmt, **save_args)
+        data = buf.getvalue()
+        stats.update({
+            "sent_size": list(img.size),
+            "sent_bytes": len(data),
+            "format": fmt,
+            "quality": self.quality,
+            "prep_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+        if original_bytes:
+            stats["bytes_saved_pct"] = round(100.0 * (1 - len(data) / original_bytes), 1)
+        return {"mime_type": MIME_TYPES[fmt], "data": data}, stats
+
+
+def load_image(image_source: Any, timeout: float = 30.0) -> Tuple[Image.Image, Optional[bytes], str]:
+    """
+    Open a path, URL or PIL image without decoding pixels yet.
+
+    Returns:
+        (image, original bytes or None for PIL input, file suffix)
+    """
+    if isinstance(image_source, Image.Image):
+        return image_source, None, ""
+    if isinstance(image_source, str) and image_source.startswith(("http://", "https://")):
+        import requests
+        response = requests.get(image_source, timeout=timeout)
+        response.raise_for_status()
+        original = response.content
+        suffix = Path(image_source.split("?")[0]).suffix
+    elif isinstance(image_source, str):
+        with open(image_source, "rb") as f:
+            original = f.read()
+        suffix = Path(image_source).suffix
+    else:
+        raise ValueError("Unsupported image source type")
+    return Image.open(BytesIO(original)), original, suffix
+
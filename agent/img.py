@@ -3,14 +3,19 @@ import base64
 import os
 from dotenv import load_dotenv
 from PIL import Image
-import requests
-from io import BytesIO
 import json
 import re
+import time
 import argparse
+import copy
 from pathlib import Path
 from typing import Dict, Any, Optional, Union
 
+from image_prep import ImagePrep, load_image
+from media_metadata import extract_metadata, fill_context
+from triage import AUDIT, SKIP, Triage, no_subject_result
+from phash_index import PerceptualIndex, for_report
+
 # Load environment variables
 load_dotenv("C:/PROJECTS/StatusCode2/EkoNet/agent/.env")
 
@@ -20,13 +25,25 @@ class ImageAnalyzer:
     A class for analyzing images to detect wildlife species and provide detailed analysis
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        prep: Optional[ImagePrep] = None,
+        triage: Optional[Triage] = None,
+        dedup: Optional[PerceptualIndex] = None,
+    ):
         """
         Initialize the ImageAnalyzer with Gemini API
 
         Args:
             api_key: Optional API key. If not provided, will use GEMINI_API_KEY from environment
+            prep: Upload preprocessing (resize/strip/re-encode). Defaults to IMAGE_PREP_* environment settings
+            triage: Local YOLO pre-screen for blank frames. Defaults to TRIAGE_* environment settings
+            dedup: Near-duplicate index of analyzed images. Defaults to PHASH_* environment settings
         """
+        self.prep = prep or ImagePrep.from_env()
+        self.triage = triage or Triage.from_env()
+        self.dedup = dedup or PerceptualIndex.from_env()
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
@@ -59,24 +76,52 @@ class ImageAnalyzer:
                 - description: Threat description
                 - threat_type: Type of threat
                 - coordinates: GPS coordinates
+                - timestamp: Capture time
+              Missing coordinates and timestamp are filled from the image's EXIF.
 
         Returns:
             Dict containing the analysis results in JSON format
         """
+        upload = None
+        media = None
+        screen = None
+        near = None
         try:
-            # Load image from different sources
-            if isinstance(image_source, str):
-                if image_source.startswith(("http://", "https://")):
-                    # Download from URL
-                    response = requests.get(image_source)
-                    img = Image.open(BytesIO(response.content))
-                else:
-                    # Load from file path
-                    img = Image.open(image_source)
-            elif isinstance(image_source, Image.Image):
-                img = image_source
-            else:
-                raise ValueError("Unsupported image source type")
+            # Load image from different sources (path, URL or PIL image); pixels are decoded lazily
+            img, original, suffix = load_image(image_source)
+            # EXIF (GPS, capture time, camera/trap id) must be read before prep strips it
+            media = extract_metadata(img, "image")
+            context, media["filled"] = fill_context(context, media)
+            if media["filled"]:
+                print(f"📍 Filled {', '.join(media['filled'])} from image metadata")
+            # Keep the untouched original for evidence, then send a smaller, metadata-free copy
+            archived = self.prep.archive(original, suffix) if original else None
+
+            # Burst shots and re-compressed copies reuse the analysis of an indexed near-duplicate
+            if self.dedup.enabled:
+                near = {"hashes": PerceptualIndex.hash_image(img, original), "match": None}
+                match = self.dedup.lookup(near["hashes"])
+                if match is not None:
+                    previous = match.pop("analysis")
+                    near["match"] = match
+                    if self.dedup.mode == "reuse" and previous:
+                        print(f"♻️ Near-duplicate of {match['source'] or match['id']} "
+                              f"(distance {match['phash_distance']}), reusing its analysis")
+                        match["reused"] = True
+                        # The image is the same, the report is not
+                        result = for_report(previous, context)
+                        return self._add_metadata(result, image_source, {"archived_original": archived},
+                                                  media, screen, near)
+
+            image_part, upload = self.prep.prepare(img, len(original) if original else None)
+            upload["archived_original"] = archived
+
+            # Blank camera-trap frames are answered locally instead of by Gemini
+            if self.triage.applies(context):
+                screen = self.triage.screen(img)
+                if screen["decision"] == SKIP:
+                    print(f"⏭️ Triage: no subject detected (best {screen['best_confidence']}), skipping Gemini")
+                    return self._add_metadata(no_subject_result(context), image_source, upload, media, screen, near)
 
             # Prepare prompt for high-specificity wildlife monitoring
             context_info = ""
@@ -89,6 +134,7 @@ CONTEXT INFORMATION:
 - Threat Description: {context.get("description", "Not provided")}
 - Threat Type: {context.get("threat_type", "Not provided")}
 - Coordinates: {context.get("coordinates", "Not provided")}
+- Captured At: {context.get("timestamp") or "Not provided"}
 - Report ID: {context.get("report_id", "Not provided")}
 - Evidence Count: {context.get("evidence_count", "Not provided")}
 - Reporter Name: {context.get("reporter_name", "anonymous")}
@@ -188,7 +234,9 @@ Return only valid JSON without any Markdown or commentary.
 """
 
             # Generate analysis
-            response = self.model.generate_content([prompt, img])
+            model_start = time.perf_counter()
+            response = self.model.generate_content([prompt, image_part])
+            upload["model_latency_ms"] = round((time.perf_counter() - model_start) * 1000, 1)
 
             # Extract JSON from response with robust parsing
             raw_text = getattr(response, "text", "") or ""
@@ -196,7 +244,7 @@ Return only valid JSON without any Markdown or commentary.
             # First try direct JSON
             try:
                 result = json.loads(raw_text)
-                return self._add_metadata(result, image_source)
+                return self._add_metadata(result, image_source, upload, media, screen, near)
             except Exception:
                 pass
 
@@ -204,7 +252,7 @@ Return only valid JSON without any Markdown or commentary.
             try:
                 fenced = raw_text.split("json")[1].split("")[0].strip()
                 result = json.loads(fenced)
-                return self._add_metadata(result, image_source)
+                return self._add_metadata(result, image_source, upload, media, screen, near)
             except Exception:
                 pass
 
@@ -213,7 +261,7 @@ Return only valid JSON without any Markdown or commentary.
                 match = re.search(r"\{[\s\S]*\}$", raw_text)
                 if match:
                     result = json.loads(match.group(0))
-                    return self._add_metadata(result, image_source)
+                    return self._add_metadata(result, image_source, upload, media, screen, near)
             except Exception:
                 pass
 
@@ -221,6 +269,10 @@ Return only valid JSON without any Markdown or commentary.
             return self._add_metadata(
                 {"raw_response": raw_text, "error": "Failed to parse JSON"},
                 image_source,
+                upload,
+                media,
+                screen,
+                near,
             )
 
         except Exception as e:
@@ -229,7 +281,7 @@ Return only valid JSON without any Markdown or commentary.
                 "status": "failed",
                 "message": f"Analysis failed: {e}",
             }
-            return self._add_metadata(error_result, image_source)
+            return self._add_metadata(error_result, image_source, upload, media, screen, near)
 
 #     def analyze_text_with_context(
 #         self, description: str, context: Optional[Dict[str, Any]] = None
@@ -407,7 +459,13 @@ Return only valid JSON without any Markdown or commentary.
         return self.analyze_text_with_context(description, context)
 
     def _add_metadata(
-        self, result: Dict[str, Any], image_source: Union[str, Image.Image]
+        self,
+        result: Dict[str, Any],
+        image_source: Union[str, Image.Image],
+        upload: Optional[Dict[str, Any]] = None,
+        media: Optional[Dict[str, Any]] = None,
+        triage: Optional[Dict[str, Any]] = None,
+        near: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """
         Add metadata to the analysis result
@@ -415,6 +473,10 @@ Return only valid JSON without any Markdown or commentary.
         Args:
             result: The analysis result
             image_source: The original image source
+            upload: Preprocessing stats (bytes/size sent, archive path, model latency)
+            media: Capture metadata from EXIF (gps, timestamp, camera, trap_id, filled fields)
+            triage: Pre-screen decision; audited would-be skips are scored against the result here
+            near: Perceptual hashes and near-duplicate match; fresh model results are indexed here
 
         Returns:
             Dict with added metadata
@@ -427,6 +489,25 @@ Return only valid JSON without any Markdown or commentary.
             else "PIL_Image",
             "model": "gemini-2.5-flash",
         }
+        if upload is not None:
+            metadata["upload"] = upload
+        if media:
+            metadata["media_metadata"] = media
+        if triage is not None:
+            if triage["decision"] == AUDIT and isinstance(result, dict):
+                self.triage.record_audit(triage, result, metadata["source"])
+            metadata["triage"] = {**triage, "stats": self.triage.stats()}
+        if near is not None:
+            match = near["match"]
+            fresh = (match is None or not match.get("reused")) and (triage is None or triage["decision"] != SKIP)
+            if fresh and isinstance(result, dict) and "error" not in result:
+                self.dedup.add(near["hashes"], copy.deepcopy(result), metadata["source"])
+            metadata["near_duplicate"] = {
+                "phash": f"{near['hashes']['phash']:016x}",
+                "dhash": f"{near['hashes']['dhash']:016x}",
+                "match": match,
+                "index": self.dedup.stats(),
+            }
 
         if isinstance(result, dict):
             result["metadata"] = metadata
@@ -0,0 +1,397 @@
+"""
+Local capture metadata for evidence files.
+
+Camera-trap and phone images carry GPS position, capture time, camera make/
+model and often a trap or station name in EXIF; phone videos carry the same
+in their container (``©xyz`` / QuickTime ``keys`` location, creation time).
+Reading it locally takes a few milliseconds and fills coordinates and
+timestamp the reporter did not type, before any model call.
+
+Images are read with PIL (header only, pixels are not decoded). MP4/MOV
+containers are walked directly; other containers, or MP4s without usable
+tags, fall back to ``ffprobe`` when it is on PATH.
+"""
+
+import json
+import re
+import shutil
+import struct
+import subprocess
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+# EXIF tag ids (PIL exposes raw ids; names via ExifTags would cost a lookup table)
+GPS_IFD = 0x8825
+EXIF_IFD = 0x8769
+TAG_IMAGE_DESCRIPTION = 270
+TAG_MAKE = 271
+TAG_MODEL = 272
+TAG_DATETIME = 306
+TAG_ARTIST = 315
+TAG_DATETIME_ORIGINAL = 36867
+TAG_OFFSET_TIME_ORIGINAL = 36881
+TAG_USER_COMMENT = 37510
+TAG_BODY_SERIAL = 42033
+
+MP4_SUFFIXES = {".mp4", ".m4v", ".mov", ".3gp", ".3g2"}
+# Containers whose children are boxes (walked for mvhd/udta/meta)
+MP4_CONTAINERS = {b"moov", b"udta", b"meta", b"ilst", b"trak"}
+MP4_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+
+ISO6709 = re.compile(r"([+-]\d{1,2}(?:\.\d+)?)([+-]\d{1,3}(?:\.\d+)?)([+-]\d+(?:\.\d+)?)?")
+TRAP_ID = re.compile(r"\b(?:trap|cam(?:era)?|station|site|unit)[\s_#:=-]*([A-Za-z0-9][A-Za-z0-9_-]{0,23})", re.I)
+
+MetadataSource = Union[str, bytes, Image.Image]
+
+
+def _rational(value: Any) -> float:
+    if isinstance(value, tuple) and len(value) == 2:
+        return value[0] / value[1] if value[1] else 0.0
+    return float(value)
+
+
+def _dms(values: Any, ref: Any) -> Optional[float]:
+    try:
+        degrees, minutes, seconds = (_rational(v) for v in values)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    decimal = degrees + minutes / 60.0 + seconds / 3600.0
+    if str(ref).strip().upper() in ("S", "W"):
+        decimal = -decimal
+    return round(decimal, 7)
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        # UserComment starts with an 8-byte character-code prefix
+        if value[:8] in (b"ASCII\x00\x00\x00", b"UNICODE\x00", b"\x00" * 8):
+            encoding = "utf-16" if value.startswith(b"UNICODE") else "ascii"
+            value = value[8:].decode(encoding, "ignore")
+        else:
+            value = value.decode("utf-8", "ignore")
+    text = str(value).strip("\x00 \t\r\n")
+    return text or None
+
+
+def _exif_datetime(value: Any, offset: Any = None) -> Optional[str]:
+    """``YYYY:MM:DD HH:MM:SS`` (+ ``OffsetTimeOriginal``) to ISO 8601."""
+    text = _text(value)
+    if not text:
+        return None
+    try:
+        stamp = datetime.strptime(text[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    iso = stamp.isoformat()
+    offset = _text(offset)
+    if offset and re.fullmatch(r"[+-]\d{2}:\d{2}", offset):
+        iso += offset
+    return iso
+
+
+def _gps_datetime(gps: Dict[int, Any]) -> Optional[str]:
+    """GPSDateStamp + GPSTimeStamp, which are always UTC."""
+    date, time_parts = _text(gps.get(29)), gps.get(7)
+    if not date or not time_parts:
+        return None
+    try:
+        h, m, s = (_rational(v) for v in time_parts)
+        day = datetime.strptime(date, "%Y:%m:%d").replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return (day + timedelta(hours=h, minutes=m, seconds=int(s))).isoformat()
+
+
+def _trap_id(*texts: Optional[str]) -> Optional[str]:
+    for text in texts:
+        match = TRAP_ID.search(text or "")
+        if match:
+            return match.group(1)
+    return None
+
+
+def _parse_iso6709(text: Optional[str]) -> Optional[Dict[str, float]]:
+    match = ISO6709.match((text or "").strip())
+    if not match:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if abs(lat) > 90 or abs(lon) > 180:
+        return None
+    gps = {"latitude": lat, "longitude": lon}
+    if match.group(3):
+        gps["altitude"] = float(match.group(3))
+    return gps
+
+
+def _apple_datetime(text: Optional[str]) -> Optional[str]:
+    """``2024-03-01T06:12:40+0530`` style QuickTime dates to ISO 8601."""
+    text = (text or "").strip()
+    for fmt in ("%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"):
+        try:
+            stamp = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return (stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)).isoformat()
+    return None
+
+
+def image_metadata(source: MetadataSource) -> Dict[str, Any]:
+    """
+    Read GPS, capture time, camera and trap id from an image's EXIF.
+
+    Args:
+        source: file path, raw bytes or an opened (not necessarily decoded) PIL image
+
+    Returns:
+        Dict with any of ``gps``, ``timestamp``, ``camera``, ``trap_id``; empty when
+        the image carries no usable metadata
+    """
+    if isinstance(source, Image.Image):
+        img = source
+    elif isinstance(source, bytes):
+        img = Image.open(BytesIO(source))
+    else:
+        img = Image.open(source)
+    exif = img.getexif()
+    if not exif:
+        return {}
+    sub = exif.get_ifd(EXIF_IFD)
+    gps_ifd = exif.get_ifd(GPS_IFD)
+    meta: Dict[str, Any] = {"source": "exif"}
+
+    lat = _dms(gps_ifd.get(2), gps_ifd.get(1)) if gps_ifd.get(2) else None
+    lon = _dms(gps_ifd.get(4), gps_ifd.get(3)) if gps_ifd.get(4) else None
+    # Traps without a GPS fix write 0/0; that is the Gulf of Guinea, not a location
+    if lat is not None and lon is not None and (lat, lon) != (0.0, 0.0):
+        gps: Dict[str, Any] = {"latitude": lat, "longitude": lon}
+        if gps_ifd.get(6) is not None:
+            altitude = _rational(gps_ifd[6])
+            gps["altitude"] = round(-altitude if gps_ifd.get(5) in (1, b"\x01") else altitude, 1)
+        meta["gps"] = gps
+
+    timestamp = (_exif_datetime(sub.get(TAG_DATETIME_ORIGINAL), sub.get(TAG_OFFSET_TIME_ORIGINAL))
+                 or _gps_datetime(gps_ifd)
+                 or _exif_datetime(exif.get(TAG_DATETIME)))
+    if timestamp:
+        meta["timestamp"] = timestamp
+
+    camera = {k: v for k, v in {
+        "make": _text(exif.get(TAG_MAKE)),
+        "model": _text(exif.get(TAG_MODEL)),
+        "serial": _text(sub.get(TAG_BODY_SERIAL)),
+    }.items() if v}
+    if camera:
+        meta["camera"] = camera
+
+    description = _text(exif.get(TAG_IMAGE_DESCRIPTION))
+    comment = _text(sub.get(TAG_USER_COMMENT))
+    trap_id = _trap_id(description, comment, _text(exif.get(TAG_ARTIST)))
+    if trap_id:
+        meta["trap_id"] = trap_id
+    if description:
+        meta["description"] = description
+    return meta if len(meta) > 1 else {}
+
+
+def _boxes(f: BinaryIO, end: int):
+    """Yield (type, payload offset, payload end) for the boxes between f.tell() and end."""
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header)
+        offset = start + 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            offset += 8
+        elif size == 0:
+            size = end - start
+        if size < offset - start or start + size > end:
+            return
+        yield kind, offset, start + size
+        f.seek(start + size)
+
+
+def _walk_mp4(f: BinaryIO, end: int, tags: Dict[str, Any], keys: List[str]) -> None:
+    for kind, offset, box_end in list(_boxes(f, end)):
+        f.seek(offset)
+        if kind == b"mvhd":
+            version = f.read(1)[0]
+            f.read(3)
+            created = struct.unpack(">Q" if version == 1 else ">I", f.read(8 if version == 1 else 4))[0]
+            if created:
+                tags.setdefault("creation_time", (MP4_EPOCH + timedelta(seconds=created)).isoformat())
+        elif kind == b"\xa9xyz":
+            length = struct.unpack(">H", f.read(4)[:2])[0]
+            tags.setdefault("location", f.read(length).decode("utf-8", "ignore"))
+        elif kind == b"keys":
+            f.read(4)
+            count = struct.unpack(">I", f.read(4))[0]
+            for _ in range(count):
+                size = struct.unpack(">I", f.read(4))[0]
+                f.read(4)
+                keys.append(f.read(max(0, size - 8)).decode("utf-8", "ignore"))
+        elif kind == b"meta":
+            # ISO meta is a full box (4 bytes version/flags); QuickTime meta is not
+            peek = f.read(8)
+            f.seek(offset if peek[4:8] in (b"hdlr", b"keys", b"ilst") else offset + 4)
+            _walk_mp4(f, box_end, tags, keys)
+        elif kind == b"ilst" and keys:
+            for item, item_offset, item_end in list(_boxes(f, box_end)):
+                index = struct.unpack(">I", item)[0]
+                if not 1 <= index <= len(keys):
+                    continue
+                f.seek(item_offset)
+                for data_kind, data_offset, data_end in list(_boxes(f, item_end)):
+                    if data_kind == b"data":
+                        f.seek(data_offset + 8)
+                        tags.setdefault(keys[index - 1], f.read(data_end - data_offset - 8).decode("utf-8", "ignore"))
+        elif kind in MP4_CONTAINERS:
+            _walk_mp4(f, box_end, tags, keys)
+
+
+def _mp4_tags(source: Union[str, bytes]) -> Dict[str, Any]:
+    tags: Dict[str, Any] = {}
+    f: BinaryIO = BytesIO(source) if isinstance(source, bytes) else open(source, "rb")
+    try:
+        f.seek(0, 2)
+        end = f.tell()
+        f.seek(0)
+        _walk_mp4(f, end, tags, [])
+    except (struct.error, IndexError, OSError):
+        pass
+    finally:
+        f.close()
+    return tags
+
+
+def _ffprobe_tags(path: str, timeout: float = 10.0) -> Dict[str, Any]:
+    if not shutil.which("ffprobe"):
+        return {}
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", path],
+            capture_output=True, timeout=timeout, check=True,
+        ).stdout
+        return json.loads(out or b"{}").get("format", {}).get("tags", {}) or {}
+    except (subprocess.SubprocessError, ValueError, OSError):
+        return {}
+
+
+def video_metadata(source: Union[str, bytes]) -> Dict[str, Any]:
+    """
+    Read GPS, creation time and camera from a video container.
+
+    Args:
+        source: file path or raw bytes (bytes are only walked as MP4/MOV)
+
+    Returns:
+        Dict with any of ``gps``, ``timestamp``, ``camera``; empty when none found
+    """
+    is_path = isinstance(source, str)
+    suffix = Path(source).suffix.lower() if is_path else ".mp4"
+    tags = _mp4_tags(source) if suffix in MP4_SUFFIXES else {}
+    method = "container"
+    if is_path and not any(k in tags for k in ("location", "com.apple.quicktime.location.ISO6709")):
+        probed = _ffprobe_tags(source)
+        if probed:
+            tags = {**probed, **tags}
+            method = "ffprobe"
+    if not tags:
+        return {}
+
+    meta: Dict[str, Any] = {"source": method}
+    gps = _parse_iso6709(tags.get("com.apple.quicktime.location.ISO6709") or tags.get("location"))
+    if gps and (gps["latitude"], gps["longitude"]) != (0.0, 0.0):
+        meta["gps"] = gps
+    # The QuickTime creation date keeps the local offset; mvhd time is UTC
+    timestamp = (_apple_datetime(tags.get("com.apple.quicktime.creationdate"))
+                 or _apple_datetime(tags.get("creation_time")) or tags.get("creation_time"))
+    if timestamp:
+        meta["timestamp"] = timestamp
+    camera = {k: v for k, v in {
+        "make": tags.get("com.apple.quicktime.make") or tags.get("make"),
+        "model": tags.get("com.apple.quicktime.model") or tags.get("model"),
+    }.items() if v}
+    if camera:
+        meta["camera"] = camera
+    return meta if len(meta) > 1 else {}
+
+
+def extract_metadata(source: MetadataSource, file_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Capture metadata for an image or video; never raises.
+
+    Args:
+        source: path, raw bytes or PIL image
+        file_type: 'image' or 'video'; guessed from the path/object when omitted
+
+    Returns:
+        Metadata dict (see ``image_metadata`` / ``video_metadata``); ``error`` set if reading failed
+    """
+    if file_type is None:
+        if isinstance(source, Image.Image):
+            file_type = "image"
+        elif isinstance(source, str) and Path(source).suffix.lower() in MP4_SUFFIXES | {".mkv", ".avi", ".webm"}:
+            file_type = "video"
+        else:
+            file_type = "image"
+    try:
+        if file_type == "video":
+            return video_metadata(source)
+        if file_type == "image":
+            return image_metadata(source)
+    except Exception as e:
+        return {"error": str(e)}
+    return {}
+
+
+def _has_coordinates(value: Any) -> bool:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value) if value.strip() else None
+        except ValueError:
+            # Free-form text the reporter typed counts as provided
+            return True
+    if isinstance(value, dict):
+        return value.get("latitude") is not None and value.get("longitude") is not None
+    return bool(value)
+
+
+def fill_context(
+    context: Optional[Dict[str, Any]],
+    meta: Dict[str, Any],
+) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Fill missing ``coordinates`` and ``timestamp`` from capture metadata.
+
+    Reporter-supplied values always win. Coordinates are written in the same
+    shape the report form sends (a JSON string ``{"latitude", "longitude"}``,
+    or a dict when the context already used one).
+
+    Returns:
+        (context, names of filled fields); the caller's dict is not modified, a copy
+        is returned when anything was filled
+    """
+    filled: List[str] = []
+    if not meta or "error" in meta:
+        return context, filled
+    updated = dict(context or {})
+    gps = meta.get("gps")
+    if gps and not _has_coordinates(updated.get("coordinates")):
+        coords = {"latitude": gps["latitude"], "longitude": gps["longitude"]}
+        updated["coordinates"] = coords if isinstance(updated.get("coordinates"), dict) else json.dumps(coords)
+        if not updated.get("location_method"):
+            updated["location_method"] = meta.get("source", "metadata")
+        filled.append("coordinates")
+    if meta.get("timestamp") and not updated.get("timestamp"):
+        updated["timestamp"] = meta["timestamp"]
+        filled.append("timestamp")
+    return (updated if filled else context), filled
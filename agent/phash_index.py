@@ -0,0 +1,313 @@
+"""
+Near-duplicate image index (perceptual hashes + BK-tree).
+
+Reporters upload burst shots and re-compressed copies of the same photo;
+an exact content hash misses those, so each one used to cost a full Gemini
+call. ``PerceptualIndex`` keeps a 64-bit pHash (DCT) and dHash (gradient)
+of every analyzed image. Lookups walk a BK-tree over the pHash, so only
+entries within the Hamming radius are visited; the dHash confirms a match,
+which keeps unrelated images that share a coarse pHash apart.
+
+A hit returns the stored analysis, which the caller reuses (or just links).
+Entries can be persisted as JSON lines and are reloaded at startup. The
+report fields of an analysis (location, reporter, evidence count) belong to
+the report, not the image: they are never indexed and are refilled from the
+reusing report's context.
+
+Configuration (environment, or PerceptualIndex arguments):
+    PHASH_INDEX=1                enable (default on)
+    PHASH_THRESHOLD=10           max pHash Hamming distance (of 64 bits)
+    PHASH_DHASH_THRESHOLD=10     max dHash distance to confirm a match
+    PHASH_MODE=reuse             reuse: skip the model call; link: analyze anyway, record the match
+    PHASH_INDEX_PATH=...         JSONL file to persist entries
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+HASH_BITS = 64
+REPORT_FIELDS = ("Location", "reporter_name")
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    return np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n))
+
+
+DCT_32 = _dct_matrix(32)
+
+
+def _to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def phash(gray32: np.ndarray) -> int:
+    """64-bit DCT hash of a 32x32 grayscale array: low 8x8 frequencies against their median."""
+    low = (DCT_32 @ gray32 @ DCT_32.T)[:8, :8]
+    return _to_int(low > np.median(low))
+
+
+def dhash(gray9x8: np.ndarray) -> int:
+    """64-bit gradient hash of a 9x8 (w x h) grayscale array."""
+    return _to_int(gray9x8[:, 1:] > gray9x8[:, :-1])
+
+
+def image_hashes(img: Image.Image) -> Tuple[int, int]:
+    """(pHash, dHash) of an image; orientation is normalized first."""
+    gray = ImageOps.exif_transpose(img).convert("L")
+    g32 = np.asarray(gray.resize((32, 32), Image.Resampling.LANCZOS), dtype=np.float64)
+    g98 = np.asarray(gray.resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+    return phash(g32), dhash(g98)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def without_report_fields(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of an analysis without reporter/location data, safe to index and share across reports."""
+    stripped = {k: copy.deepcopy(v) for k, v in analysis.items() if k not in REPORT_FIELDS}
+    if isinstance(stripped.get("risk_assessment"), dict):
+        stripped["risk_assessment"]["evidence_count"] = None
+    return stripped
+
+
+def for_report(analysis: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Copy of a stored analysis with the report fields of ``context`` (defaults when it has none)."""
+    context = context or {}
+    result = copy.deepcopy(analysis)
+    result["Location"] = context.get("location", "")
+    result["reporter_name"] = context.get("reporter_name") or "anonymous"
+    result.setdefault("risk_assessment", {})["evidence_count"] = context.get("evidence_count")
+    return result
+
+
+class BKTree:
+    """Metric tree over Hamming distance; a radius query skips subtrees the triangle inequality rules out."""
+
+    def __init__(self):
+        # node = [hash, entry ids, {distance: child node}]
+        self._root: Optional[List[Any]] = None
+        self.size = 0
+        # Approximate bytes held by nodes, kept up to date on insert
+        self.memory_bytes = 0
+
+    @staticmethod
+    def _node(key: int, entry_id: str) -> Tuple[List[Any], int]:
+        node = [key, [entry_id], {}]
+        size = sys.getsizeof(node) + sys.getsizeof(key) + sys.getsizeof(node[1]) + sys.getsizeof(node[2])
+        return node, size + sys.getsizeof(entry_id)
+
+    def add(self, key: int, entry_id: str) -> None:
+        self.size += 1
+        if self._root is None:
+            self._root, size = self._node(key, entry_id)
+            self.memory_bytes += size
+            return
+        node = self._root
+        while True:
+            d = hamming(key, node[0])
+            if d == 0:
+                node[1].append(entry_id)
+                self.memory_bytes += sys.getsizeof(entry_id) + 8
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d], size = self._node(key, entry_id)
+                self.memory_bytes += size
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> Tuple[List[Tuple[int, str]], int]:
+        """
+        Entries within ``radius`` of ``key``.
+
+        Returns:
+            ([(distance, entry id)] sorted by distance, nodes visited)
+        """
+        found: List[Tuple[int, str]] = []
+        visited = 0
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            visited += 1
+            d = hamming(key, node[0])
+            if d <= radius:
+                found.extend((d, entry_id) for entry_id in node[1])
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        found.sort()
+        return found, visited
+
+
+class PerceptualIndex:
+    """
+    Perceptual-hash index of analyzed images and their analyses.
+
+    Args:
+        enabled: index and look up at all
+        threshold: max pHash Hamming distance for a near-duplicate
+        dhash_threshold: max dHash distance confirming a pHash candidate
+        mode: "reuse" (return the stored analysis) or "link" (analyze anyway, record the match)
+        path: optional JSONL file to persist entries
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        threshold: int = 10,
+        dhash_threshold: int = 10,
+        mode: str = "reuse",
+        path: Optional[str] = None,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.dhash_threshold = dhash_threshold
+        self.mode = mode if mode in ("reuse", "link") else "reuse"
+        self.path = path
+        self._tree = BKTree()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._counts = {"lookups": 0, "hits": 0, "nodes_visited": 0, "lookup_ms_total": 0.0}
+        self._analysis_bytes = 0
+        if enabled and path and os.path.exists(path):
+            self._load(path)
+
+    @classmethod
+    def from_env(cls) -> "PerceptualIndex":
+        return cls(
+            enabled=os.getenv("PHASH_INDEX", "1").lower() not in ("0", "false", "no"),
+            threshold=int(os.getenv("PHASH_THRESHOLD", "10")),
+            dhash_threshold=int(os.getenv("PHASH_DHASH_THRESHOLD", "10")),
+            mode=os.getenv("PHASH_MODE", "reuse").lower(),
+            path=os.getenv("PHASH_INDEX_PATH") or None,
+        )
+
+    def _load(self, path: str) -> None:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._insert(entry)
+        print(f"🗂️ Loaded {len(self._entries)} perceptual hashes from {path}")
+
+    def _insert(self, entry: Dict[str, Any]) -> None:
+        if entry["id"] in self._entries:
+            return
+        entry["phash"] = int(entry["phash"], 16) if isinstance(entry["phash"], str) else entry["phash"]
+        entry["dhash"] = int(entry["dhash"], 16) if isinstance(entry["dhash"], str) else entry["dhash"]
+        # Entries written before report fields were stripped must not leak them either
+        entry["analysis"] = without_report_fields(entry.get("analysis") or {})
+        self._entries[entry["id"]] = entry
+        self._tree.add(entry["phash"], entry["id"])
+        self._analysis_bytes += len(json.dumps(entry.get("analysis") or {}))
+
+    @staticmethod
+    def hash_image(img: Image.Image, original: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Hashes of one image without touching ``img`` (callers keep using it for upload).
+
+        Returns:
+            Dict with ``phash``, ``dhash``, ``id`` (sha256 of the original bytes when given)
+        """
+        if original:
+            work = Image.open(BytesIO(original))
+            # The hash needs 32x32 pixels: let the JPEG decoder scale down by up to 8x
+            work.draft("L", (64, 64))
+        else:
+            work = img.copy()
+        p, d = image_hashes(work)
+        entry_id = hashlib.sha256(original).hexdigest() if original else f"{p:016x}{d:016x}"
+        return {"id": entry_id, "phash": p, "dhash": d}
+
+    def lookup(self, hashes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Closest indexed near-duplicate of ``hashes``.
+
+        Returns:
+            Match dict (entry id, source, distances, threshold, stored analysis) or None
+        """
+        start = time.perf_counter()
+        with self._lock:
+            candidates, visited = self._tree.search(hashes["phash"], self.threshold)
+            match = None
+            for distance, entry_id in candidates:
+                entry = self._entries[entry_id]
+                d_distance = hamming(hashes["dhash"], entry["dhash"])
+                if d_distance <= self.dhash_threshold:
+                    match = {
+                        "id": entry_id,
+                        "source": entry.get("source"),
+                        "phash_distance": distance,
+                        "dhash_distance": d_distance,
+                        "threshold": self.threshold,
+                        "dhash_threshold": self.dhash_threshold,
+                        "analysis": entry.get("analysis"),
+                        "indexed_at": entry.get("indexed_at"),
+                    }
+                    break
+            self._counts["lookups"] += 1
+            self._counts["hits"] += match is not None
+            self._counts["nodes_visited"] += visited
+            self._counts["lookup_ms_total"] += (time.perf_counter() - start) * 1000
+        return match
+
+    def add(self, hashes: Dict[str, Any], analysis: Dict[str, Any], source: str = "") -> None:
+        """Index an analyzed image without its report fields (and append it to the JSONL file when persisting)."""
+        entry = {
+            "id": hashes["id"],
+            "phash": hashes["phash"],
+            "dhash": hashes["dhash"],
+            "source": source,
+            "indexed_at": time.time(),
+            "analysis": without_report_fields(analysis),
+        }
+        with self._lock:
+            if entry["id"] in self._entries:
+                return
+            self._insert(entry)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps({**entry, "phash": f"{entry['phash']:016x}", "dhash": f"{entry['dhash']:016x}"}) + "\n")
+
+    def stats(self) -> Dict[str, Any]:
+        """Thresholds, hit rate, lookup cost and memory held by the index."""
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._entries)
+            tree_bytes = self._tree.memory_bytes
+            analysis_bytes = self._analysis_bytes
+        lookups = counts["lookups"]
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "dhash_threshold": self.dhash_threshold,
+            "hash_bits": HASH_BITS,
+            "entries": entries,
+            "lookups": lookups,
+            "hits": counts["hits"],
+            "hit_rate": round(counts["hits"] / lookups, 3) if lookups else None,
+            "avg_nodes_visited": round(counts["nodes_visited"] / lookups, 1) if lookups else None,
+            "avg_lookup_ms": round(counts["lookup_ms_total"] / lookups, 3) if lookups else None,
+            "memory": {
+                "tree_bytes": tree_bytes,
+                # Stored analyses, as serialized JSON
+                "analyses_bytes": analysis_bytes,
+                "bytes_per_entry": round((tree_bytes + analysis_bytes) / entries) if entries else 0,
+            },
+            "path": self.path,
+        }
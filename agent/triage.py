@@ -0,0 +1,277 @@
+"""
+Local pre-screen that skips Gemini on empty frames.
+
+Most camera-trap uploads are blank frames triggered by wind or light, and
+each one used to cost a full Gemini call. ``Triage`` runs the project's
+YOLO weights on CPU over the classes in a detection profile (animals,
+people, vehicles, weapons). When no subject class reaches even a low
+confidence, the image is answered locally with a schema-conformant
+"no subject" result.
+
+A random share of would-be skips is still sent to Gemini as an audit; the
+outcome (did Gemini find something?) is counted and optionally logged, so
+the false-skip rate of the current threshold can be measured.
+
+Configuration (environment, or Triage arguments):
+    TRIAGE=1                     enable (off by default)
+    TRIAGE_MODEL=yolov8n.pt      YOLO weights
+    TRIAGE_PROFILE=...           class profile (detection/profiles/triage_subjects.json)
+    TRIAGE_SKIP_BELOW=0.15       skip when the best subject confidence is below this
+    TRIAGE_AUDIT_RATE=0.05       share of would-be skips still sent to Gemini
+    TRIAGE_AUDIT_LOG=...         JSONL file for audit outcomes
+    TRIAGE_IMGSZ=640             inference size
+    TRIAGE_WITH_REPORT_TEXT=0    also screen uploads whose report has a typed threat
+                                 description/type (snares, carcasses and non-COCO species
+                                 produce no detection, so these are normally always analyzed)
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from PIL import Image, ImageOps
+
+DEFAULT_PROFILE = str(Path(__file__).resolve().parent.parent / "detection" / "profiles" / "triage_subjects.json")
+
+SKIP, AUDIT, PASS = "skip", "audit", "pass"
+
+
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def load_subject_classes(path: Optional[str] = None) -> Dict[int, str]:
+    """Class id -> name from a detection profile file (same format as detection/profiles)."""
+    with open(path or DEFAULT_PROFILE, "r") as f:
+        data = json.load(f)
+    return {int(c["id"]): str(c["name"]) for c in data.get("classes") or []}
+
+
+def gemini_found_subject(result: Dict[str, Any]) -> bool:
+    """Whether a full analysis reported a species or illegal activity (i.e. a skip would have been wrong)."""
+    species = result.get("species") or {}
+    named = bool(species.get("scientific_name") or species.get("common_name"))
+    try:
+        confident = int(species.get("confidence") or 0) > 0
+    except (TypeError, ValueError):
+        confident = named
+    threats = result.get("threat_analysis") or {}
+    return (named and confident) or bool(threats.get("illegal_activity_detected"))
+
+
+def no_subject_result(context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """An analysis in ImageAnalyzer's schema for a frame with nothing to analyze."""
+    context = context or {}
+    return {
+        "species": {
+            "scientific_name": "",
+            "genus": "",
+            "species_epithet": "",
+            "subspecies": None,
+            "common_name": "",
+            "other_common_names": [],
+            "confidence": 0,
+            "taxonomy": {"class": "", "order": "", "family": ""},
+            "distinguishing_features": [],
+            "similar_candidates": [],
+        },
+        "conservation": {"iucn_status": "", "protected_status": ""},
+        "danger_profile": {
+            "is_venomous": None,
+            "is_poisonous": None,
+            "toxicity_level": None,
+            "primary_toxins": [],
+            "threat_to_humans": "",
+            "evidence": "",
+        },
+        "health_indicators": {"age_sex": None, "visible_injuries": [], "condition": ""},
+        "habitat_context": {"environment": "", "human_impact": None},
+        "threat_analysis": {
+            "illegal_activity_detected": False,
+            "evidence": [],
+            "weapons_traps": [],
+            "suspicious_activity": [],
+        },
+        "risk_assessment": {
+            "ai-score": "1",
+            "ai-report": "No animal, person, vehicle or weapon detected in the image; full analysis was skipped.",
+            "urgency": "Low",
+            "evidence_count": context.get("evidence_count"),
+        },
+        "incident": {
+            "Anti poaching": "false",
+            "Human wildlife conflict": "false",
+            "Medical care": "false",
+            "Habitat restoration": "false",
+            "Species recovery": "false",
+        },
+        "Location": context.get("location", ""),
+        "reporter_name": context.get("reporter_name") or "anonymous",
+    }
+
+
+class Triage:
+    """
+    YOLO pre-screen with skip decisions and false-skip audit sampling.
+
+    Args:
+        enabled: run the pre-screen at all
+        model_name: YOLO weights to load (lazily, on first use)
+        profile: detection profile listing the subject classes
+        skip_below: best subject confidence under which a frame counts as empty
+        audit_rate: share (0-1) of would-be skips still sent to the full analysis
+        audit_log: optional JSONL path for audit outcomes
+        imgsz: inference size
+        with_report_text: also screen images whose report carries a threat description or type
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        model_name: str = "yolov8n.pt",
+        profile: Optional[str] = None,
+        skip_below: float = 0.15,
+        audit_rate: float = 0.05,
+        audit_log: Optional[str] = None,
+        imgsz: int = 640,
+        with_report_text: bool = False,
+    ):
+        self.enabled = enabled
+        self.with_report_text = with_report_text
+        self.model_name = model_name
+        self.classes = load_subject_classes(profile)
+        self.skip_below = skip_below
+        self.audit_rate = min(1.0, max(0.0, audit_rate))
+        self.audit_log = audit_log
+        self.imgsz = imgsz
+        self._model: Optional[Any] = None
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._counts = {"screened": 0, "passed": 0, "skipped": 0, "audited": 0, "audit_false_skips": 0}
+
+    @classmethod
+    def from_env(cls) -> "Triage":
+        return cls(
+            enabled=_env_flag("TRIAGE"),
+            model_name=os.getenv("TRIAGE_MODEL", "yolov8n.pt"),
+            profile=os.getenv("TRIAGE_PROFILE") or None,
+            skip_below=float(os.getenv("TRIAGE_SKIP_BELOW", "0.15")),
+            audit_rate=float(os.getenv("TRIAGE_AUDIT_RATE", "0.05")),
+            audit_log=os.getenv("TRIAGE_AUDIT_LOG") or None,
+            imgsz=int(os.getenv("TRIAGE_IMGSZ", "640")),
+            with_report_text=_env_flag("TRIAGE_WITH_REPORT_TEXT"),
+        )
+
+    def applies(self, context: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Whether this image may be screened at all.
+
+        Only bare uploads (camera traps) are screened by default: a reporter who typed
+        a threat has seen something, often a snare or a species COCO does not know.
+        """
+        if not self.enabled:
+            return False
+        context = context or {}
+        has_text = bool(str(context.get("description") or "").strip() or str(context.get("threat_type") or "").strip())
+        return self.with_report_text or not has_text
+
+    def load(self) -> Any:
+        """Load the weights on CPU (startup warmer or first screened image)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from ultralytics import YOLO  # type: ignore
+                    import numpy as np
+                    model = YOLO(self.model_name)
+                    model(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8), device="cpu",
+                          imgsz=self.imgsz, verbose=False)
+                    self._model = model
+        return self._model
+
+    def screen(self, img: Image.Image) -> Dict[str, Any]:
+        """
+        Decide whether ``img`` needs the full analysis.
+
+        Returns:
+            Dict with ``decision`` (skip / audit / pass), the subjects found and timing.
+            Errors never skip: a failed screen returns ``pass``.
+        """
+        start = time.perf_counter()
+        try:
+            model = self.load()
+            frame = ImageOps.exif_transpose(img)
+            if frame.mode != "RGB":
+                frame = frame.convert("RGB")
+            # Low conf floor so weak detections still count against skipping
+            with self._lock:
+                result = model(frame, device="cpu", imgsz=self.imgsz, conf=min(0.05, self.skip_below),
+                               classes=sorted(self.classes), verbose=False)[0]
+            subjects: List[Dict[str, Any]] = []
+            for cls_id, conf in zip(result.boxes.cls.tolist(), result.boxes.conf.tolist()):
+                subjects.append({"class": self.classes.get(int(cls_id), str(int(cls_id))),
+                                 "confidence": round(float(conf), 3)})
+            subjects.sort(key=lambda s: -s["confidence"])
+        except Exception as e:
+            print(f"⚠️ Triage failed, sending image for full analysis: {e}")
+            return {"decision": PASS, "error": str(e), "screen_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+        best = subjects[0]["confidence"] if subjects else 0.0
+        if best >= self.skip_below:
+            decision = PASS
+        elif self._random.random() < self.audit_rate:
+            decision = AUDIT
+        else:
+            decision = SKIP
+        with self._lock:
+            self._counts["screened"] += 1
+            self._counts[{PASS: "passed", SKIP: "skipped", AUDIT: "audited"}[decision]] += 1
+        return {
+            "decision": decision,
+            "best_confidence": round(best, 3),
+            "skip_below": self.skip_below,
+            "subjects": subjects[:5],
+            "model": self.model_name,
+            "screen_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    def record_audit(self, screen: Dict[str, Any], result: Dict[str, Any], source: str = "") -> bool:
+        """Count (and log) whether an audited would-be skip actually had a subject."""
+        false_skip = gemini_found_subject(result) and "error" not in result
+        screen["audit_false_skip"] = false_skip
+        with self._lock:
+            if false_skip:
+                self._counts["audit_false_skips"] += 1
+            if self.audit_log:
+                species = result.get("species") or {}
+                entry = {
+                    "ts": time.time(),
+                    "source": source,
+                    "best_confidence": screen.get("best_confidence"),
+                    "skip_below": self.skip_below,
+                    "false_skip": false_skip,
+                    "species": species.get("scientific_name") or species.get("common_name"),
+                }
+                with open(self.audit_log, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        if false_skip:
+            print(f"⚠️ Triage audit: full analysis found a subject in a would-be skip ({source})")
+        return false_skip
+
+    def stats(self) -> Dict[str, Any]:
+        """Running counts, observed skip rate and estimated false-skip rate."""
+        with self._lock:
+            counts = dict(self._counts)
+        empty = counts["skipped"] + counts["audited"]
+        return {
+            **counts,
+            "skip_rate": round(counts["skipped"] / counts["screened"], 3) if counts["screened"] else None,
+            # Audits are a uniform sample of would-be skips
+            "est_false_skip_rate": round(counts["audit_false_skips"] / counts["audited"], 3) if counts["audited"] else None,
+            "would_skip_rate": round(empty / counts["screened"], 3) if counts["screened"] else None,
+            "audit_rate": self.audit_rate,
+            "skip_below": self.skip_below,
+        }
@@ -447,6 +447,19 @@ class VideoAnalyzer:
         Args:
             video_path: Path to the video file to analyze
             
+        Returns:
+            Dict containing the analysis results in JSON format
+        """
+        return self.analyze_with_context(video_path, context=None)
+
+    def analyze_with_context(self, video_path: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Analyze video with audio, using the report context (location, coordinates, capture time)
+        
+        Args:
+            video_path: Path to the video file to analyze
+            context: Optional report context; omitted from the prompt when not given
+            
         Returns:
             Dict containing the analysis results in JSON format
         """
@@ -469,6 +482,20 @@ class VideoAnalyzer:
             # Generate timestamp for reporting
             analysis_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
+            context_parts = []
+            if context:
+                context_parts.append(f"""CONTEXT INFORMATION:
+- Location: {context.get("location", "Not provided")}
+- Threat Description: {context.get("description", "Not provided")}
+- Threat Type: {context.get("threat_type", "Not provided")}
+- Coordinates: {context.get("coordinates", "Not provided")}
+- Captured At: {context.get("timestamp") or "Not provided"}
+- Report ID: {context.get("report_id", "Not provided")}
+- Evidence Count: {context.get("evidence_count", "Not provided")}
+- Reporter Name: {context.get("reporter_name", "anonymous")}
+
+Use this context to enhance your analysis, especially for threat assessment and risk evaluation.""")
+            
             # Prepare multimodal prompt
             response = self.model.generate_content([
                 "EMERGENCY WILDLIFE MONITORING ANALYSIS - BE CONCISE BUT PRECISE",
@@ -476,6 +503,7 @@ class VideoAnalyzer:
                     "mime_type": "video/mp4",  # Supports MP4, MOV, AVI
                     "data": video_data
                 },
+                *context_parts,
                 """Analyze this video for wildlife threats and provide structured analysis.
 
                 Format response as JSON:
@@ -0,0 +1,145 @@
+"""
+Per-viewer adaptive MJPEG rate control.
+
+Every viewer of ``/webcam/stream`` reads the same latest frame, but a ranger
+station on a slow uplink cannot take full-resolution JPEGs at camera rate.
+``AdaptiveRate`` measures how long each multipart frame takes to be handed
+to the socket (the server blocks once a client's output buffer is full, so
+this is the link's real send time) and moves the viewer along a ladder of
+(quality, width) variants, lowering the frame rate only once the smallest
+variant still does not fit. Variants come from ``LatestFrameBuffer.get`` so
+viewers on the same rung share one encode per frame.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# (JPEG quality, width in pixels; 0 = native), best first
+LADDER: List[Tuple[int, int]] = [
+    (85, 0),
+    (75, 1280),
+    (65, 960),
+    (55, 640),
+    (45, 480),
+    (35, 320),
+]
+
+
+class AdaptiveRate:
+    """
+    Chooses variant and frame rate for one stream viewer.
+
+    Args:
+        max_fps: frame rate cap for this viewer
+        min_fps: floor the frame rate may drop to on the smallest variant
+        max_quality / max_width: caps requested by the client (width 0 = native)
+        adaptive: False pins the viewer to the capped variant and rate
+        high_load / low_load: send-time fractions of the frame interval that
+            trigger a step down / allow a step up
+        hold_seconds: time at low load before stepping up again
+    """
+
+    def __init__(self, max_fps: float = 15.0, min_fps: float = 2.0, max_quality: int = 95,
+                 max_width: int = 0, adaptive: bool = True, high_load: float = 0.6,
+                 low_load: float = 0.25, hold_seconds: float = 3.0):
+        self.max_fps = max(min_fps, max_fps)
+        self.min_fps = min_fps
+        self.adaptive = adaptive
+        self.high_load = high_load
+        self.low_load = low_load
+        self.hold_seconds = hold_seconds
+        # Client caps clamp every rung, so the ladder never exceeds what was asked for
+        ladder = []
+        for quality, width in ([(max_quality, max_width)] + LADDER):
+            rung = (min(quality, max_quality), _cap_width(width, max_width))
+            if rung not in ladder and (not ladder or _smaller(rung, ladder[-1])):
+                ladder.append(rung)
+        self.ladder = ladder if adaptive else ladder[:1]
+        self.level = 0
+        self.fps = self.max_fps
+        self.load = 0.0  # EWMA of send time / frame interval
+        self._calm_since: Optional[float] = None
+        self._changed_at = 0.0
+        self.frames = 0
+        self.bytes_sent = 0
+        self.send_seconds = 0.0
+        self.started = time.time()
+
+    @property
+    def variant(self) -> Tuple[int, int]:
+        """(quality, width) to request for the next frame."""
+        return self.ladder[self.level]
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.fps
+
+    def record(self, nbytes: int, send_seconds: float, now: Optional[float] = None) -> None:
+        """Account one sent frame and adapt variant/rate to the observed send time."""
+        now = now or time.time()
+        self.frames += 1
+        self.bytes_sent += nbytes
+        self.send_seconds += send_seconds
+        self.load = 0.7 * self.load + 0.3 * (send_seconds / self.interval)
+        if not self.adaptive or now - self._changed_at < 1.0:
+            return
+        if self.load > self.high_load:
+            self._calm_since = None
+            if self.level < len(self.ladder) - 1:
+                self.level += 1
+            elif self.fps > self.min_fps:
+                self.fps = max(self.min_fps, self.fps * 0.7)
+            else:
+                return
+            self._changed_at = now
+            self.load *= 0.5  # smaller frames should cut the load; judge them fresh
+        elif self.load < self.low_load:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.hold_seconds:
+                # Recover frame rate first, then picture quality
+                if self.fps < self.max_fps:
+                    self.fps = min(self.max_fps, self.fps / 0.7)
+                elif self.level > 0:
+                    self.level -= 1
+                else:
+                    return
+                self._changed_at = now
+                self._calm_since = now
+        else:
+            self._calm_since = None
+
+    def throughput(self) -> Optional[float]:
+        """Measured bytes/second while sending; None before anything blocked measurably."""
+        if self.send_seconds < 1e-3:
+            return None
+        return self.bytes_sent / self.send_seconds
+
+    def status(self) -> Dict[str, Any]:
+        quality, width = self.variant
+        rate = self.throughput()
+        return {
+            "adaptive": self.adaptive,
+            "quality": quality,
+            "width": width,
+            "fps": round(self.fps, 1),
+            "level": self.level,
+            "levels": len(self.ladder),
+            "load": round(self.load, 3),
+            "frames": self.frames,
+            "bytes_sent": self.bytes_sent,
+            "throughput_kbps": round(rate * 8 / 1000, 1) if rate is not None else None,
+            "connected_seconds": round(time.time() - self.started, 1),
+        }
+
+
+def _cap_width(width: int, max_width: int) -> int:
+    if not max_width:
+        return width
+    return max_width if width == 0 else min(width, max_width)
+
+
+def _smaller(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    """True when rung ``a`` is strictly cheaper than ``b`` (0 width = native, the largest)."""
+    wa, wb = a[1] or 1 << 30, b[1] or 1 << 30
+    return (a[0] <= b[0] and wa <= wb) and a != b
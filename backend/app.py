@@ -3,10 +3,11 @@ import sys
 sys.path.append('../agent')
 import json
 import tempfile
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, send_from_directory
 from typing import Optional
 import subprocess
 from flask_cors import CORS
@@ -44,12 +45,39 @@ def health() -> Any:
     ok = UniversalDetector is not None
     return jsonify({"ok": ok, "details": None if ok else _import_error_message}), (200 if ok else 500)
 
+@app.get("/ready")
+def ready() -> Any:
+    """
+    Readiness for load balancers: 200 once every required component is warm, else 503.
+
+    Per-component status (pending/loading/ready/failed/disabled) with load times.
+    READY_REQUIRED (comma-separated) limits which components gate readiness.
+    """
+    _start_warmers()
+    report = _warmup.report()
+    return jsonify(report), (200 if report["ready"] else 503)
+
+# One UniversalDetector (Gemini clients + Whisper) shared by all requests instead of one per request
+_detector = None
+_detector_lock = threading.Lock()
+
+def _get_detector() -> Any:
+    """Shared UniversalDetector, constructed on first use (normally by the startup warmer)."""
+    global _detector
+    if UniversalDetector is None:
+        raise RuntimeError(f"Failed to import detect.py: {_import_error_message}")
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = UniversalDetector()
+    return _detector
+
 def _analyze_file_with_context(temp_path: Path, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Analyze file with context using UniversalDetector."""
     if UniversalDetector is None:
         raise RuntimeError(f"Failed to import detect.py: {_import_error_message}")
 
-    detector = UniversalDetector()
+    detector = _get_detector()
     return detector.analyze_with_context(str(temp_path), context)
 
 def _analyze_text_with_context(description: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -57,9 +85,17 @@ def _analyze_text_with_context(description: str, context: Optional[Dict[str, Any
     if UniversalDetector is None:
         raise RuntimeError(f"Failed to import detect.py: {_import_error_message}")
 
-    detector = UniversalDetector()
+    detector = _get_detector()
     return detector.analyze_text_with_context(description, context)
 
+@app.get("/analysis/stats")
+def analysis_stats() -> Any:
+    """Near-duplicate index (threshold, hit rate, lookup cost, memory) and triage skip counters."""
+    if _detector is None:
+        return jsonify({"error": "analyzers not loaded yet"}), 503
+    analyzer = _detector.image_analyzer
+    return jsonify({"near_duplicate": analyzer.dedup.stats(), "triage": analyzer.triage.stats()})
+
 @app.post("/analyze")
 def analyze() -> Any:
     """
@@ -101,8 +137,53 @@ def analyze() -> Any:
     print(f"🔍 AI Agent analyzing: {len(uploaded_files)} file(s) + context")
 
     results: List[Dict[str, Any]] = []
+    # One multimodal call for all images/short clips of the report instead of one call per file
+    fused = request.form.get('fused', os.getenv('FUSED_ANALYSIS', '0')).lower() in ('1', 'true', 'yes')
 
-    if uploaded_files:
+    if uploaded_files and fused and len(uploaded_files) > 1 and UniversalDetector is not None:
+        tmp_paths: List[Path] = []
+        try:
+            for f in uploaded_files:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=Path(f.filename).suffix) as tmp:
+                    f.save(tmp.name)
+                    tmp_paths.append(Path(tmp.name))
+            detector = _get_detector()
+            analysis = detector.analyze_report([str(p) for p in tmp_paths], analysis_context)
+            # Map temp paths back to the uploaded names for the report
+            names = {p.name: f.filename for p, f in zip(tmp_paths, uploaded_files)}
+            for item in analysis.get("metadata", {}).get("evidence", []):
+                item["file"] = names.get(item["file"], item["file"])
+            if "individual_results" in analysis:
+                analysis["individual_results"] = {names.get(Path(k).name, k): v
+                                                  for k, v in analysis["individual_results"].items()}
+            output_path = f"C:/PROJECTS/StatusCode2/EkoNet/backend/report_{report_id or 'fused'}_analysis.json"
+            detector.save_results(analysis, output_path)
+            print(f"✅ Generated fused report: {Path(output_path).name}")
+            results.append({
+                "analysis_type": "report_fused",
+                "original_filenames": [f.filename for f in uploaded_files],
+                "content_types": [f.mimetype for f in uploaded_files],
+                "file_size": sum(os.path.getsize(p) for p in tmp_paths),
+                "analysis_result": analysis,
+                "saved_json_path": output_path,
+                "context_used": analysis_context,
+                "source": "fused",
+            })
+        except Exception as e:
+            print(f"❌ Fused analysis failed: {e}")
+            results.append({
+                "analysis_type": "report_fused",
+                "original_filenames": [f.filename for f in uploaded_files],
+                "error": str(e),
+                "context_used": analysis_context
+            })
+        finally:
+            for tmp_path in tmp_paths:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+    elif uploaded_files:
         # File + Context Analysis
         for f in uploaded_files:
             if not f or f.filename == '':
@@ -118,28 +199,17 @@ def analyze() -> Any:
             tmp_path: Optional[Path] = None
             try:
                 if is_video and VideoAnalyzer is not None and _video2_ok:
-                    # Read uploaded bytes directly, prefer context-aware API
-                    raw_bytes = f.read()
-                    analyzer = VideoAnalyzer()
-                    if hasattr(analyzer, 'analyze_with_context'):
-                        analysis = analyzer.analyze_with_context(
-                            raw_bytes,
-                            analysis_context,
-                            mime_type=f.mimetype,
-                            filename=f.filename,
-                        )
-                        file_size_val = len(raw_bytes) if raw_bytes is not None else None
-                        source_label = "uploaded_bytes"
+                    # Analyze from a temp file; the detector fills coordinates/timestamp from the container metadata
+                    file_ext = Path(f.filename).suffix
+                    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp:
+                        f.save(tmp.name)
+                        tmp_path = Path(tmp.name)
+                    if UniversalDetector is not None:
+                        analysis = _analyze_file_with_context(tmp_path, analysis_context)
                     else:
-                        # Fallback to temp-file path based analysis
-                        file_ext = Path(f.filename).suffix
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp:
-                            tmp.write(raw_bytes)
-                            tmp.flush()
-                            tmp_path = Path(tmp.name)
-                        analysis = analyzer.analyze(str(tmp_path))
-                        file_size_val = os.path.getsize(tmp_path)
-                        source_label = str(tmp_path)
+                        analysis = VideoAnalyzer().analyze_with_context(str(tmp_path), analysis_context)
+                    file_size_val = os.path.getsize(tmp_path)
+                    source_label = str(tmp_path)
                 else:
                     # For images and non-video types: save to temp and analyze
                     file_ext = Path(f.filename).suffix
@@ -153,7 +223,7 @@ def analyze() -> Any:
                 # Save results
                 if UniversalDetector is not None:
                     try:
-                        detector = UniversalDetector()
+                        detector = _get_detector()
                         detector.save_results(analysis, output_path)
                     except Exception:
                         # Fallback simple save
@@ -205,7 +275,7 @@ def analyze() -> Any:
             
             # Save results
             if UniversalDetector is not None:
-                detector = UniversalDetector()
+                detector = _get_detector()
                 detector.save_results(text_analysis, output_path)
                 print(f"✅ Generated report: text_report_{report_id}_analysis.json")
             
@@ -244,6 +314,7 @@ def analyze() -> Any:
 
     # Return unified response
     files_analyzed = len([r for r in results if r.get("analysis_type") == "file_with_context"])
+    files_analyzed += sum(len(r.get("original_filenames", [])) for r in results if r.get("analysis_type") == "report_fused")
     text_analyzed = len([r for r in results if r.get("analysis_type") == "text_only"])
     
     return jsonify({
@@ -277,12 +348,14 @@ def list_analyses() -> Any:
 # ------------------ Webcam MJPEG Stream ------------------
 try:
     import cv2  # type: ignore
+    from camera_reader import CameraReader  # type: ignore
     _cv2_ok = True
 except Exception:
     cv2 = None  # type: ignore
     _cv2_ok = False
 
 _webcam_cap = None  # lazy-initialized capture
+_camera_metrics: Dict[str, Dict[str, Any]] = {}  # last reader status per camera, kept across switches
 _webcam_proc: Optional[subprocess.Popen] = None  # external webcam.py process
 _ip_camera_url: Optional[str] = None  # IP camera URL for external streams
 
@@ -294,18 +367,135 @@ except Exception:
     YOLO = None  # type: ignore
     _ultra_ok = False
 
-_yolo_model = None
+# Shared detection helpers live next to detection/webcam.py
+DETECTION_PATH = str(Path(__file__).resolve().parents[1] / 'detection')
+sys.path.append(DETECTION_PATH)
+
+try:
+    from postprocess import result_arrays, class_counts  # type: ignore
+    from tracker import Tracker  # type: ignore
+    from model_manager import ModelSwapper, AVAILABLE_MODELS  # type: ignore
+    from tiling import TiledDetector  # type: ignore
+    from roi import RegionOfInterest  # type: ignore
+    from clips import ClipRecorder, list_clips  # type: ignore
+except Exception as _pe:
+    _ultra_ok = False
+    print(f"⚠️ Could not import detection postprocess helpers: {_pe}")
+
+try:
+    from detection_profile import load_profile  # type: ignore
+    # Same classes, thresholds and colors as detection/webcam.py, loaded once
+    _profile = load_profile()
+    _profile_filter = _profile.detection_filter()
+except Exception as _dpe:
+    _profile = None
+    _ultra_ok = False
+    print(f"⚠️ Could not load detection profile: {_dpe}")
+
+try:
+    from instrumentation import StageTimings  # type: ignore
+    from event_log import latest_event  # type: ignore
+    # Rolling per-stage timings for the MJPEG pipeline (shared by all stream clients)
+    _pipeline_timings = StageTimings()
+except Exception as _ie:
+    _pipeline_timings = None
+    latest_event = None  # type: ignore
+    print(f"⚠️ Pipeline instrumentation unavailable: {_ie}")
+
+# Push feed for the live page: one broadcaster fans out to every SSE subscriber
+try:
+    from event_feed import EventBroadcaster, DeltaTracker  # type: ignore
+    # Every subscriber holds a server thread while connected, so their number is capped
+    _feed = EventBroadcaster(capacity=int(os.getenv("EVENT_FEED_CAPACITY", "1000")),
+                             max_subscribers=int(os.getenv("EVENT_FEED_MAX_SUBSCRIBERS", "32")))
+    _feed_deltas = DeltaTracker(interval=float(os.getenv("EVENT_FEED_DELTA_SECONDS", "1.0")))
+    _stream_ok = _cv2_ok
+except Exception as _fe:
+    _feed = None
+    _feed_deltas = None
+    _stream_ok = False
+    print(f"⚠️ Live event feed unavailable: {_fe}")
+
+# Latest streamed frame per camera, served by /webcam/snapshot.jpg without another capture loop
+try:
+    from frame_buffer import LatestFrameBuffer, encode_jpeg  # type: ignore
+except Exception as _fbe:
+    LatestFrameBuffer = None  # type: ignore
+    encode_jpeg = None  # type: ignore
+    _stream_ok = False
+    print(f"⚠️ Frame buffer unavailable, live streaming disabled: {_fbe}")
+_latest_frames: Dict[str, Any] = {}
+
+# Frames and detections from a webcam.py started with --shm; it owns the camera and the model
+try:
+    from shm_ring import FrameRing  # type: ignore
+    _shm_ok = True
+except Exception as _se:
+    FrameRing = None  # type: ignore
+    _shm_ok = False
+    print(f"⚠️ Shared-memory ring unavailable: {_se}")
+_script_shm_name: Optional[str] = None
+_script_ring: Optional[Any] = None
+
+# One capture loop feeds every /webcam/stream viewer; each viewer adapts its own variant and rate
+try:
+    from adaptive_stream import AdaptiveRate  # type: ignore
+except Exception as _ase:
+    AdaptiveRate = None  # type: ignore
+    _stream_ok = False
+    print(f"⚠️ Adaptive streaming unavailable: {_ase}")
+STREAM_IDLE_SECONDS = float(os.getenv("STREAM_IDLE_SECONDS", "5"))
+# Model confidence floor for the stream, tiled or not; per-class profile thresholds apply on top
+STREAM_CONF = float(os.getenv("STREAM_CONF", "0.25"))
+_stream_lock = threading.Lock()
+_capture_thread: Optional[threading.Thread] = None
+_capture_stop = threading.Event()
+_stream_viewers = 0
+_stream_clients: Dict[int, Any] = {}
+
+try:
+    from detection_history import DetectionHistory, bucket_of  # type: ignore
+    _history = DetectionHistory(os.getenv(
+        "DETECTION_HISTORY_DB", str(Path(__file__).resolve().parent / 'detection_history.sqlite3')))
+except Exception as _he:
+    _history = None
+    print(f"⚠️ Detection history store unavailable: {_he}")
+
+# Active YOLO model for the MJPEG stream; switches load in the background and swap atomically
+_models = ModelSwapper(AVAILABLE_MODELS) if _ultra_ok else None
 _detect_every_n = 2
 _frame_index = 0
 _det_counts: dict[str, int] = {}
 _session_start_ts: Optional[float] = None
+_tracking_enabled = False
+_tiler = None  # sliced inference for high-resolution sources (?tiles=1)
+_roi = None  # ROI polygons of the current camera (detection/cameras.json)
+# Pre/post-event clips (?clips=1): one ring buffer + background writer per camera
+CLIPS_DIR = os.getenv("CLIPS_DIR", str(Path(__file__).resolve().parent / 'clips'))
+_clips_enabled = False
+_clip_recorders: Dict[str, Any] = {}
+_tracker = None  # per-session Tracker when tracking is enabled
+_track_events: List[Dict[str, Any]] = []
+_bucket_counts: dict[tuple[int, str], int] = {}  # (hour bucket, label) -> count for history rollups
+_webcam_proc_started_ts: Optional[float] = None
+_webcam_control_port: Optional[int] = None  # control socket of a headless webcam.py
+
+def _count_detection(label: str, count: int, ts: float) -> None:
+    """Add detections to the session totals and their hourly rollup bucket."""
+    _det_counts[label] = _det_counts.get(label, 0) + count
+    if _history is not None:
+        key = (bucket_of(ts), label)
+        _bucket_counts[key] = _bucket_counts.get(key, 0) + count
 
 def _reset_session_stats() -> None:
     """Reset detection session counters/timers."""
-    global _frame_index, _det_counts, _session_start_ts
+    global _frame_index, _det_counts, _session_start_ts, _tracker, _track_events, _bucket_counts
     _frame_index = 0
     _det_counts = {}
+    _bucket_counts = {}
     _session_start_ts = None
+    _tracker = Tracker() if _tracking_enabled and _ultra_ok else None
+    _track_events = []
 
 def _write_output_json() -> dict:
     """Write a final summary to detection/output.json compatible with frontend."""
@@ -329,6 +519,8 @@ def _write_output_json() -> dict:
             },
             "all_animals": all_detections,
         }
+        if _tracker is not None:
+            detection_results["tracking"] = _tracker.summary()
     else:
         detection_results = {
             "total_detections": 0,
@@ -342,7 +534,7 @@ def _write_output_json() -> dict:
             "end_time": end_ts,
             "total_events": total_detections,
         },
-        "events": [
+        "events": _track_events + [
             {
                 "event": "final_summary",
                 "timestamp": end_ts,
@@ -371,24 +563,31 @@ def _write_output_json() -> dict:
 def _get_webcam_cap():
     global _webcam_cap, _ip_camera_url
     if _webcam_cap is None and _cv2_ok:
-        if _ip_camera_url:
-            # Use IP camera URL
-            _webcam_cap = cv2.VideoCapture(_ip_camera_url)
-        else:
-            # Use local webcam
-            _webcam_cap = cv2.VideoCapture(0)
-        # Try setting a sane resolution
-        try:
-            _webcam_cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-            _webcam_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        except Exception:
-            pass
+        # Background reader: reconnects with backoff and always hands out the freshest frame
+        _webcam_cap = CameraReader(
+            _ip_camera_url if _ip_camera_url else 0,  # IP camera URL or local webcam
+            # Try setting a sane resolution
+            properties={cv2.CAP_PROP_FRAME_WIDTH: 1280, cv2.CAP_PROP_FRAME_HEIGHT: 720},
+            stale_seconds=float(os.getenv("CAMERA_STALE_SECONDS", "5")),
+            frozen_seconds=float(os.getenv("CAMERA_FROZEN_SECONDS", "30")),
+            backoff_max=float(os.getenv("CAMERA_BACKOFF_MAX_SECONDS", "30")),
+        )
+        _webcam_cap.wait_connected(float(os.getenv("CAMERA_CONNECT_WAIT_SECONDS", "5")))
     return _webcam_cap
 
+def _stop_capture_thread():
+    """Stop the shared capture loop before its capture object is released."""
+    _capture_stop.set()
+    thread = _capture_thread
+    if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+        thread.join(timeout=5.0)
+
 def _reset_webcam_cap():
     """Reset webcam capture to allow switching between local and IP camera"""
     global _webcam_cap
+    _stop_capture_thread()
     if _webcam_cap is not None:
+        _camera_metrics[str(_webcam_cap.source)] = _webcam_cap.status()
         _webcam_cap.release()
         _webcam_cap = None
 
@@ -404,100 +603,544 @@ def _clear_ip_camera_url():
     _ip_camera_url = None
     _reset_webcam_cap()
 
-def _generate_mjpeg():
+def _capture_loop(cap: Any, camera: str, buffer: LatestFrameBuffer) -> None:
+    """
+    Capture, detect, draw and encode frames for every stream viewer.
+
+    Runs on one background thread per stream, publishing into the camera's
+    LatestFrameBuffer; exits when the capture fails or the last viewer has
+    been gone for STREAM_IDLE_SECONDS.
+    """
     import time
-    global _yolo_model, _frame_index, _det_counts, _session_start_ts
-    cap = _get_webcam_cap()
-    if not _cv2_ok or cap is None or not cap.isOpened():
-        # yield a single empty frame notice
-        msg = b"--frame\r\nContent-Type: text/plain\r\n\r\nWebcam unavailable\r\n"
-        yield msg
-        return
+    global _frame_index, _det_counts, _session_start_ts
     if _session_start_ts is None:
+        _reset_session_stats()
         _session_start_ts = time.time()
-        _det_counts = {}
-        _frame_index = 0
-    if _ultra_ok and _yolo_model is None:
+    # Normally loaded and warmed at startup; while that runs, frames stream without boxes
+    if _models is not None and _models.model is None and not _models.status()["loading"] and not _warmup.started:
         try:
-            _yolo_model = YOLO('yolov8n.pt')
-        except Exception:
-            _yolo_model = None
-    while True:
+            _models.load(STREAM_MODEL)
+        except Exception as e:
+            print(f"⚠️ Could not load YOLO model: {e}")
+    idle_since = None
+    # Own lap timer: other capture loops record into the same timings concurrently
+    timings = _pipeline_timings
+    laps = timings.laps() if timings is not None else None
+    while not _capture_stop.is_set():
+        if not _stream_viewers:
+            idle_since = idle_since or time.time()
+            if time.time() - idle_since > STREAM_IDLE_SECONDS:
+                break
+        else:
+            idle_since = None
+        top_detection = None
+        if laps is not None:
+            laps.start()
         success, frame = cap.read()
         if not success:
-            break
+            if not cap.isOpened():
+                break
+            # The reader is reconnecting; viewers keep the last frame meanwhile
+            continue
+        if laps is not None:
+            laps.lap("capture")
         _frame_index += 1
         # Optionally run detection every N frames
-        if _yolo_model is not None and _frame_index % _detect_every_n == 0:
+        # Read the active model once per frame; a background swap never stalls the stream
+        model = _models.model if _models is not None else None
+        if model is not None and _frame_index % _detect_every_n == 0:
             try:
-                results = _yolo_model(frame, verbose=False, imgsz=640)
-                for r in results:
-                    names = r.names if hasattr(r, 'names') else {}
-                    if getattr(r, 'boxes', None) is not None:
-                        for b in r.boxes:
-                            try:
-                                x1, y1, x2, y2 = map(int, b.xyxy[0].cpu().numpy())
-                                conf = float(b.conf[0].cpu().numpy())
-                                cls_id = int(b.cls[0].cpu().numpy())
-                                label = names.get(cls_id, str(cls_id))
-                                # Count label
-                                _det_counts[label] = _det_counts.get(label, 0) + 1
-                                # Draw box
-                                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                                txt = f"{label} {conf:.2f}"
-                                cv2.putText(frame, txt, (x1, max(0, y1-6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 1)
-                            except Exception:
-                                continue
+                model_start = time.perf_counter()
+                infer_frame = _roi.crop(frame)[0] if _roi is not None else frame
+                if _tiler is not None:
+                    detections = [_tiler(model, infer_frame, STREAM_CONF, _profile.class_ids)]
+                    if timings is not None:
+                        timings.record("inference", time.perf_counter() - model_start)
+                    model_post = 0.0
+                else:
+                    # The model drops classes outside the profile in its own NMS
+                    results = model(infer_frame, classes=_profile.class_ids, conf=STREAM_CONF, verbose=False, imgsz=640)
+                    model_post = timings.record_model_speed(
+                        getattr(results[0], 'speed', None) if len(results) else None,
+                        time.perf_counter() - model_start,
+                    ) if timings is not None else 0.0
+                    detections = [result_arrays(r) for r in results]
+                post_start = time.perf_counter()
+                detections = [_profile_filter(*d) for d in detections]
+                if _roi is not None:
+                    detections = [_roi.to_frame(*d, frame.shape) for d in detections]
+                names = _profile.names
+                to_draw = []
+                frame_detections = []
+                for xyxy, confs, class_ids in detections:
+                    track_ids = [-1] * len(class_ids)
+                    if _tracker is not None:
+                        # Count unique individuals as their tracks are confirmed
+                        ids, events = _tracker.update(xyxy, confs, class_ids, names)
+                        track_ids = ids.tolist()
+                        _track_events.extend(events)
+                        for e in events:
+                            _feed.publish(e["event"], e)
+                            if e["event"] == "track_started":
+                                _count_detection(e["animal"], 1, e["timestamp"])
+                    elif class_ids.size:
+                        # Count labels with one bincount per result
+                        now_ts = time.time()
+                        for cls_id, count in class_counts(class_ids).items():
+                            _count_detection(names.get(cls_id, str(cls_id)), count, now_ts)
+                    if class_ids.size:
+                        frame_detections.extend(
+                            {"animal": names.get(c, str(c)), "confidence": round(p, 3), "box": b, "track_id": t}
+                            for b, p, c, t in zip(xyxy.tolist(), confs.tolist(), class_ids.tolist(), track_ids)
+                        )
+                        best = int(confs.argmax())
+                        if top_detection is None or confs[best] > top_detection[1]:
+                            top_detection = (names.get(int(class_ids[best]), str(class_ids[best])), float(confs[best]))
+                    for (x1, y1, x2, y2), conf, cls_id, track_id in zip(xyxy.tolist(), confs.tolist(), class_ids.tolist(), track_ids):
+                        label = names.get(cls_id, str(cls_id))
+                        if track_id >= 0:
+                            label = f"{label} #{track_id}"
+                        to_draw.append((x1, y1, x2, y2, f"{label} {conf:.2f}", _profile.color(cls_id)))
+                if frame_detections:
+                    _feed.publish("detection", {
+                        "timestamp": time.time(),
+                        "camera": _ip_camera_url or "local_webcam",
+                        "frame": _frame_index,
+                        "detections": frame_detections,
+                    })
+                if timings is not None:
+                    timings.record("postprocess", model_post + time.perf_counter() - post_start)
+                    laps.start()
+                for x1, y1, x2, y2, txt, color in to_draw:
+                    # Draw box
+                    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                    cv2.putText(frame, txt, (x1, max(0, y1-6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+                if _roi is not None:
+                    _roi.draw(frame)
+                if laps is not None:
+                    laps.lap("draw")
             except Exception:
                 pass
         # Encode to JPEG
-        ret, buf = cv2.imencode('.jpg', frame)
-        if not ret:
+        if laps is not None:
+            laps.start()
+        try:
+            jpg = encode_jpeg(frame)
+        except RuntimeError:
+            continue
+        if laps is not None:
+            laps.lap("encode")
+        # Viewers pick this frame (or a smaller variant of it) up from the buffer
+        buffer.publish(frame, jpg)
+        recorder = _clip_recorder()
+        if recorder is not None:
+            # Reuses the stream's JPEG; the clip itself is written on the recorder's thread
+            recorder.add_encoded(jpg)
+            if top_detection is not None:
+                recorder.trigger(top_detection[0], confidence=round(top_detection[1], 3))
+            for e in recorder.drain_saved():
+                _feed.publish("clip_saved", e)
+        if _feed_deltas.due():
+            # Periodic change set, so subscribers never need to recompute the summary
+            delta = _feed_deltas.delta(_det_counts)
+            if delta is not None:
+                _feed.publish("delta", delta)
+
+def _script_running() -> bool:
+    return _webcam_proc is not None and _webcam_proc.poll() is None
+
+def _get_script_ring() -> Optional[Any]:
+    """Attach (once) to the shared-memory ring of a running webcam.py, if it publishes one."""
+    global _script_ring
+    if _script_ring is None and _script_shm_name and _script_running():
+        try:
+            _script_ring = FrameRing.attach(_script_shm_name)
+        except (FileNotFoundError, ValueError):
+            return None  # script still opening the camera
+    return _script_ring
+
+def _detach_script_ring() -> None:
+    global _script_ring
+    ring, _script_ring = _script_ring, None
+    if ring is not None:
+        ring.close()
+
+def _sync_script_counts() -> Optional[Dict[str, Any]]:
+    """Mirror webcam.py's running totals (from the ring's status blob) into the session counters."""
+    global _det_counts, _session_start_ts, _frame_index
+    ring = _get_script_ring()
+    status = ring.read_status() if ring is not None else None
+    if status is None:
+        return None
+    _det_counts = dict(status.get("detections") or {})
+    _session_start_ts = status.get("start_time") or _session_start_ts
+    _frame_index = status.get("frames", _frame_index)
+    return status
+
+def _shm_loop(camera: str, buffer: LatestFrameBuffer) -> None:
+    """
+    Serve viewers from webcam.py's shared-memory ring instead of opening the camera.
+
+    Frames are read in place; the newest one is copied once (boxes are drawn on
+    the copy and the frame buffer encodes variants from it later) and checked
+    against the slot sequence, so a frame overwritten mid-copy is skipped.
+    """
+    import time
+    seq = 0
+    idle_since = None
+    last_frame_at = last_status = time.time()
+    names = _profile.names if _profile is not None else {}
+    while not _capture_stop.is_set() and _script_running():
+        if not _stream_viewers:
+            idle_since = idle_since or time.time()
+            if time.time() - idle_since > STREAM_IDLE_SECONDS:
+                break
+        else:
+            idle_since = None
+        ring = _get_script_ring()
+        if ring is None:
+            time.sleep(0.2)
+            continue
+        item = ring.read(seq, timeout=1.0)
+        now = time.time()
+        if item is None:
+            if now - last_frame_at > 3.0:
+                # Writer restarted (new segment) or stalled; map the ring again
+                _detach_script_ring()
+                seq = 0
+                last_frame_at = now
+            continue
+        last_frame_at = now
+        seq = item.seq
+        frame_copy = item.copy()
+        if frame_copy is None:
             continue
-        jpg = buf.tobytes()
-        yield (b"--frame\r\n"
-               b"Content-Type: image/jpeg\r\n\r\n" + jpg + b"\r\n")
+        frame = frame_copy.frame
+        boxes = list(zip(frame_copy.xyxy.tolist(), frame_copy.conf.tolist(), frame_copy.cls.tolist(),
+                         frame_copy.track_ids.tolist()))
+        for (x1, y1, x2, y2), conf, cls_id, track_id in boxes:
+            label = names.get(cls_id, str(cls_id))
+            if track_id >= 0:
+                label = f"{label} #{track_id}"
+            color = _profile.color(cls_id) if _profile is not None else (0, 255, 0)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, f"{label} {conf:.2f}", (x1, max(0, y1-6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        if frame_copy.detected and boxes:
+            _feed.publish("detection", {
+                "timestamp": frame_copy.timestamp,
+                "camera": camera,
+                "frame": frame_copy.frame_index,
+                "detections": [{"animal": names.get(c, str(c)), "confidence": round(p, 3), "box": b, "track_id": t}
+                               for b, p, c, t in boxes],
+            })
+        try:
+            buffer.publish(frame, encode_jpeg(frame))
+        except RuntimeError:
+            continue
+        if now - last_status >= 1.0:
+            last_status = now
+            if _sync_script_counts() is not None and _feed_deltas.due():
+                delta = _feed_deltas.delta(_det_counts)
+                if delta is not None:
+                    _feed.publish("delta", delta)
+
+def _ensure_capture_thread() -> Optional[Any]:
+    """Start the shared capture loop if it is not running; returns the camera's frame buffer."""
+    global _capture_thread
+    if not _stream_ok:
+        return None
+    with _stream_lock:
+        if _script_shm_name and _script_running():
+            # webcam.py owns the device; stream from its ring
+            camera = "webcam_script"
+            buffer = _latest_frames.setdefault(camera, LatestFrameBuffer())
+            if _capture_thread is None or not _capture_thread.is_alive():
+                _capture_stop.clear()
+                _capture_thread = threading.Thread(target=_shm_loop, args=(camera, buffer),
+                                                   name="mjpeg-shm", daemon=True)
+                _capture_thread.start()
+            return buffer
+        cap = _get_webcam_cap()
+        if not _cv2_ok or cap is None or not cap.isOpened():
+            return None
+        camera = _ip_camera_url or "local_webcam"
+        buffer = _latest_frames.setdefault(camera, LatestFrameBuffer())
+        if _capture_thread is None or not _capture_thread.is_alive():
+            _capture_stop.clear()
+            _capture_thread = threading.Thread(target=_capture_loop, args=(cap, camera, buffer),
+                                               name="mjpeg-capture", daemon=True)
+            _capture_thread.start()
+        return buffer
+
+def _generate_mjpeg(rate: AdaptiveRate):
+    """Multipart JPEG stream for one viewer, adapted to its measured send throughput."""
+    import time
+    global _stream_viewers
+    buffer = _ensure_capture_thread()
+    if buffer is None:
+        # yield a single empty frame notice
+        msg = b"--frame\r\nContent-Type: text/plain\r\n\r\nWebcam unavailable\r\n"
+        yield msg
+        return
+    client_id = id(rate)
+    with _stream_lock:
+        _stream_viewers += 1
+        _stream_clients[client_id] = rate
+    try:
+        seq = buffer.seq
+        next_due = 0.0
+        while True:
+            if not buffer.wait(seq, timeout=5.0):
+                if _capture_thread is None or not _capture_thread.is_alive():
+                    break
+                continue
+            now = time.time()
+            if now < next_due:
+                # Frame rate cap: skip straight to the newest frame once due
+                time.sleep(next_due - now)
+            got = buffer.get(*rate.variant)
+            if got is None:
+                continue
+            seq, _, jpg = got
+            next_due = time.time() + rate.interval
+            chunk = (b"--frame\r\n"
+                     b"Content-Type: image/jpeg\r\n\r\n" + jpg + b"\r\n")
+            # The server blocks here once this client's socket buffer is full
+            send_start = time.perf_counter()
+            yield chunk
+            rate.record(len(chunk), time.perf_counter() - send_start)
+    finally:
+        with _stream_lock:
+            _stream_viewers -= 1
+            _stream_clients.pop(client_id, None)
+
+def _query_number(name: str, default: Any, cast: Any, low: Any, high: Any) -> Any:
+    """Query parameter parsed with ``cast`` and clamped to [low, high]; ValueError names the bad parameter."""
+    raw = request.args.get(name, '').strip()
+    if not raw:
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be {'an integer' if cast is int else 'a number'}")
+    if value != value or value in (float('inf'), float('-inf')):
+        raise ValueError(f"{name} must be a finite number")
+    return max(low, min(high, value))
+
+@app.get('/webcam/snapshot.jpg')
+def webcam_snapshot() -> Any:
+    """
+    Latest frame of a running stream as a JPEG, without opening the camera.
+
+    Query: camera (default: current source), quality (10-95), width (pixels, no upscaling),
+    after (frame sequence number; 304 unless a newer frame exists).
+    Responses carry an ETag and X-Frame-Seq, so If-None-Match also returns 304 for an unchanged frame.
+    """
+    if not _stream_ok:
+        return jsonify({"ok": False, "error": "live streaming unavailable"}), 503
+    default_camera = "webcam_script" if _script_shm_name else (_ip_camera_url or "local_webcam")
+    camera = request.args.get('camera') or default_camera
+    buffer = _latest_frames.get(camera)
+    if buffer is None or buffer.seq == 0:
+        return jsonify({"ok": False, "error": "no frames yet; start /webcam/stream for this camera"}), 503
+    try:
+        quality = _query_number('quality', 95, int, 10, 95)
+        width = _query_number('width', 0, int, 0, 3840)
+        after = _query_number('after', -1, int, -1, 2 ** 63)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    seq = buffer.seq
+    etag = f'"{seq}-{quality}-{width}"'
+    headers = {"ETag": etag, "X-Frame-Seq": str(seq), "Cache-Control": "no-cache"}
+    # Conditional GET: nothing is encoded or copied when the client already has this frame
+    if seq <= after or etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+    seq, ts, jpg = buffer.get(quality, width)
+    headers.update({"ETag": f'"{seq}-{quality}-{width}"', "X-Frame-Seq": str(seq), "X-Frame-Timestamp": f"{ts:.3f}"})
+    return Response(jpg, mimetype='image/jpeg', headers=headers)
+
+@app.get('/webcam/events')
+def webcam_events() -> Any:
+    """
+    Server-Sent Events feed of live detections.
+
+    Events: detection (per processed frame with detections), delta (changed
+    counts, about once a second), track_started/track_ended, clip_saved,
+    session_started/session_stopped, and reset when a client fell too far behind.
+    Reconnecting clients resume from Last-Event-ID. Above EVENT_FEED_MAX_SUBSCRIBERS
+    connected clients, new ones get 503 with Retry-After.
+    """
+    if _feed is None:
+        return jsonify({"ok": False, "error": "live event feed unavailable"}), 503
+    if _feed.full:
+        # Clients retry after the hint; no worker thread is held meanwhile
+        error = f"too many event subscribers (max {_feed.max_subscribers})"
+        return jsonify({"ok": False, "error": error}), 503, {"Retry-After": "10"}
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    return Response(
+        _feed.stream(last_id),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _clip_recorder() -> Optional[Any]:
+    """Clip recorder of the current camera, created on first use when clips are enabled."""
+    if not _clips_enabled:
+        return None
+    camera = _ip_camera_url or "local_webcam"
+    if camera not in _clip_recorders:
+        _clip_recorders[camera] = ClipRecorder(
+            CLIPS_DIR,
+            camera=camera,
+            pre_seconds=float(os.getenv("CLIP_PRE_SECONDS", "5")),
+            post_seconds=float(os.getenv("CLIP_POST_SECONDS", "10")),
+            max_buffer_bytes=int(float(os.getenv("CLIP_BUFFER_MB", "64")) * 1024 * 1024),
+            max_disk_bytes=int(float(os.getenv("CLIP_DISK_MB", "2048")) * 1024 * 1024),
+        )
+    return _clip_recorders[camera]
 
 @app.get('/webcam/start')
 def webcam_start() -> Any:
+    global _tracking_enabled, _tiler, _roi, _clips_enabled
+    import time
     # Check for IP camera URL in query parameters
     source = request.args.get('source')
+    # Optional tracking: counts become unique individuals instead of frame hits
+    _tracking_enabled = request.args.get('track', '').lower() in ('1', 'true', 'yes')
+    # Optional tiled inference so small, distant animals in high-resolution streams are not missed
+    _tiler = None
+    if _ultra_ok and request.args.get('tiles', '').lower() in ('1', 'true', 'yes'):
+        try:
+            # Overlap below 1: a full overlap would never advance to the next tile
+            _tiler = TiledDetector(_query_number('tile_size', 640, int, 160, 1920),
+                                   _query_number('tile_overlap', 0.2, float, 0.0, 0.9))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
     if source:
         _set_ip_camera_url(source)
     else:
         # No source provided, switch back to local webcam
         _clear_ip_camera_url()
+    _clips_enabled = _ultra_ok and request.args.get('clips', '').lower() in ('1', 'true', 'yes')
+    # Per-camera ROI: crop before inference and ignore detections outside the polygons
+    _roi = None
+    if _ultra_ok:
+        try:
+            _roi = RegionOfInterest.for_camera(_ip_camera_url or "local_webcam")
+        except Exception as e:
+            print(f"⚠️ Invalid ROI config: {e}")
     # Reset session stats on each start
     _reset_session_stats()
+    if _feed is not None:
+        _feed_deltas.reset()
+        _feed.publish("session_started", {"timestamp": time.time(), "camera": _ip_camera_url or "local_webcam"})
     
     cap = _get_webcam_cap()
-    ok = _cv2_ok and cap is not None and cap.isOpened()
-    return jsonify({"ok": ok, "source": "ip_camera" if _ip_camera_url else "local_webcam"})
+    ok = _cv2_ok and cap is not None and cap.connected
+    return jsonify({"ok": ok, "source": "ip_camera" if _ip_camera_url else "local_webcam",
+                    "tracking": _tracker is not None, "tiled": _tiler is not None, "roi": _roi is not None,
+                    "clips": _clips_enabled})
 
 @app.get('/webcam/stream')
 def webcam_stream():
-    return Response(_generate_mjpeg(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    """
+    MJPEG stream of the annotated camera feed.
+
+    Query: adaptive (default 1; 0 pins quality/width/fps), quality (10-95), width (pixels, 0 = native)
+    and fps caps. Adaptive viewers step down quality, then resolution, then frame rate when their
+    link cannot keep up, and step back up once it does.
+    """
+    if not _stream_ok:
+        return jsonify({"ok": False, "error": "live streaming unavailable"}), 503
+    try:
+        rate = AdaptiveRate(
+            max_fps=_query_number('fps', float(os.getenv("STREAM_MAX_FPS", "15")), float, 1.0, 60.0),
+            max_quality=_query_number('quality', 95, int, 10, 95),
+            max_width=_query_number('width', 0, int, 0, 3840),
+            adaptive=request.args.get('adaptive', '1').lower() not in ('0', 'false', 'no'),
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return Response(_generate_mjpeg(rate), mimetype='multipart/x-mixed-replace; boundary=frame',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get('/webcam/camera_status')
+def webcam_camera_status() -> Any:
+    """Reconnect, frame-rate and lag metrics of the current camera and of previously used ones."""
+    cameras = dict(_camera_metrics)
+    current = None
+    if _webcam_cap is not None:
+        current = str(_webcam_cap.source)
+        cameras[current] = _webcam_cap.status()
+    return jsonify({"current": current, "cameras": cameras})
+
+@app.get('/webcam/viewers')
+def webcam_viewers() -> Any:
+    """Current stream viewers with their chosen variant, frame rate and measured throughput."""
+    with _stream_lock:
+        clients = [rate.status() for rate in _stream_clients.values()]
+    return jsonify({"viewers": len(clients), "clients": clients,
+                    "capture_running": _capture_thread is not None and _capture_thread.is_alive()})
 
 @app.post('/webcam/stop')
 def webcam_stop() -> Any:
     """Stop current capture, write output.json, and reset session."""
+    import time
     try:
-        cap = _get_webcam_cap()
+        _stop_capture_thread()
+        cap = _webcam_cap
         if cap is not None and cap.isOpened():
             cap.release()
+        # Close out live tracks so their dwell time is recorded
+        if _tracker is not None:
+            _track_events.extend(_tracker.flush())
+        # Finish any clip still in its post-roll and stop the writers; the next session starts fresh ones
+        for recorder in _clip_recorders.values():
+            recorder.close(timeout=0)
+        _clip_recorders.clear()
         # Write summary JSON
         data = _write_output_json()
+        # Keep every session, not just the last one, in the history store
+        session_id = _record_history_session(data, bucket_counts=_bucket_counts or None)
+        if _feed is not None:
+            _feed.publish("session_stopped", {"timestamp": time.time(), "session_id": session_id,
+                                              "totals": dict(_det_counts)})
         # Reset state to allow future starts
         _reset_webcam_cap()
         _reset_session_stats()
-        return jsonify({"ok": True, "output": data})
+        return jsonify({"ok": True, "output": data, "session_id": session_id})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
+def _record_history_session(data: Dict[str, Any], camera: Optional[str] = None,
+                            bucket_counts: Optional[dict] = None) -> Optional[int]:
+    """Store a finished session summary (output.json layout) in the history store."""
+    if _history is None:
+        return None
+    try:
+        info = data.get("session_info", {})
+        final = next((e for e in reversed(data.get("events", [])) if e.get("event") == "final_summary"), {})
+        stats = final.get("session_stats", {})
+        counts = {a["animal"]: a["count"] for a in final.get("detection_results", {}).get("all_animals", [])}
+        return _history.record_session(
+            camera or _ip_camera_url or "local_webcam",
+            info.get("start_time") or final.get("timestamp"),
+            info.get("end_time") or final.get("timestamp"),
+            counts,
+            bucket_counts=bucket_counts,
+            total_frames=stats.get("total_frames", 0),
+            processed_frames=stats.get("processed_frames", 0),
+            summary=final,
+        )
+    except Exception as e:
+        print(f"⚠️ Failed to record session history: {e}")
+        return None
+
 @app.post('/webcam/start_script')
 def webcam_start_script() -> Any:
     """Start external Python webcam script (agent/webcam.py) using a command string."""
-    global _webcam_proc
+    global _webcam_proc, _webcam_proc_started_ts, _webcam_control_port, _script_shm_name
+    import time
     
     # Check for IP camera URL in query parameters
     source = request.args.get('source')
@@ -515,27 +1158,124 @@ def webcam_start_script() -> Any:
         # Build command string (works on Windows and Unix)
         python_exe = sys.executable or 'python'
         cmd = f'"{python_exe}" "{str(script_path)}"'
+        # Headless runs skip drawing/display and are controlled via signals or the control socket
+        _webcam_control_port = None
+        if request.args.get('headless', '').lower() in ('1', 'true', 'yes'):
+            _webcam_control_port = int(os.getenv("WEBCAM_CONTROL_PORT", "8765"))
+            cmd += f' --headless --control-port {_webcam_control_port}'
+        if request.args.get('track', '').lower() in ('1', 'true', 'yes'):
+            cmd += ' --track'
+        # One process owns the camera: the script writes frames/detections to shared memory and
+        # /webcam/stream, /webcam/snapshot.jpg and /webcam/summary read them from there
+        _script_shm_name = None
+        if _shm_ok and request.args.get('shm', '1').lower() not in ('0', 'false', 'no'):
+            _script_shm_name = os.getenv("WEBCAM_SHM_NAME", "ekonet_webcam")
+            cmd += f' --shm {_script_shm_name}'
+            _reset_webcam_cap()
+            _detach_script_ring()
         _webcam_proc = subprocess.Popen(cmd, shell=True)
-        return jsonify({"ok": True, "pid": _webcam_proc.pid})
+        _webcam_proc_started_ts = time.time()
+        return jsonify({"ok": True, "pid": _webcam_proc.pid, "shm": _script_shm_name})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 @app.post('/webcam/stop_script')
 def webcam_stop_script() -> Any:
     """Stop external webcam.py if running."""
-    global _webcam_proc
+    global _webcam_proc, _script_shm_name
     try:
+        _stop_capture_thread()
+        _detach_script_ring()
+        _script_shm_name = None
         if _webcam_proc and _webcam_proc.poll() is None:
             _webcam_proc.terminate()
+            try:
+                _webcam_proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
             _webcam_proc = None
-            return jsonify({"ok": True, "message": "stopped"})
+            # Ingest the script's summary if it wrote one for this run
+            session_id = None
+            out_path = Path(__file__).resolve().parents[1] / 'detection' / 'output.json'
+            if out_path.exists() and _webcam_proc_started_ts and out_path.stat().st_mtime >= _webcam_proc_started_ts:
+                with open(out_path, 'r') as f:
+                    # Same camera id as the stream sessions, so history counts group per camera
+                    session_id = _record_history_session(json.load(f), camera=_ip_camera_url or "local_webcam")
+            return jsonify({"ok": True, "message": "stopped", "session_id": session_id})
         return jsonify({"ok": True, "message": "not running"})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
+def _send_script_command(line: str) -> Optional[Dict[str, Any]]:
+    """Send one command to a running headless webcam.py over its control socket."""
+    if not _webcam_control_port or not (_webcam_proc and _webcam_proc.poll() is None):
+        return None
+    import socket
+    try:
+        with socket.create_connection(("127.0.0.1", _webcam_control_port), timeout=2) as sock:
+            sock.sendall((line + "\n").encode("utf-8"))
+            return json.loads(sock.makefile("r", encoding="utf-8").readline() or "null")
+    except (OSError, ValueError) as e:
+        return {"ok": False, "error": str(e)}
+
+@app.get('/webcam/clips')
+def webcam_clips() -> Any:
+    """Saved pre/post-event clips, newest first, plus live recorder state."""
+    if not _ultra_ok:
+        return jsonify({"ok": False, "error": "detection helpers unavailable"}), 503
+    limit = int(request.args.get('limit', 50))
+    return jsonify({
+        "ok": True,
+        "clips": list_clips(CLIPS_DIR, limit=limit),
+        "recorders": [r.status() for r in _clip_recorders.values()],
+    })
+
+@app.get('/webcam/clips/<path:name>')
+def webcam_clip_file(name: str) -> Any:
+    return send_from_directory(CLIPS_DIR, name)
+
+@app.get('/webcam/profile')
+def webcam_profile() -> Any:
+    """Detection profile (classes, per-class thresholds, colors) shared with webcam.py."""
+    if _profile is None:
+        return jsonify({"ok": False, "error": "detection profile unavailable"}), 503
+    return jsonify({"ok": True, "profile": _profile.to_dict()})
+
+@app.get('/webcam/model')
+def webcam_model_status() -> Any:
+    """Active/loading model for the MJPEG stream and, if running headless, webcam.py."""
+    script = _send_script_command("status")
+    return jsonify({
+        "ok": _models is not None,
+        "stream": _models.status() if _models is not None else None,
+        "webcam_script": (script.get("state") or {}).get("model_status") if script else None,
+    })
+
+@app.post('/webcam/model')
+def webcam_model_switch() -> Any:
+    """
+    Switch YOLO weights at runtime without dropping frames.
+
+    Body/query: {"model": "yolov8n.pt" | "yolov8s.pt" | "yolov8m.pt" | "yolov8l.pt"}; omit to cycle.
+    The new model loads and warms up in the background; the stream keeps using the
+    current model until the swap. A headless webcam.py receives the same request.
+    """
+    if _models is None:
+        return jsonify({"ok": False, "error": "YOLO is not available"}), 503
+    body = request.get_json(silent=True) or {}
+    name = body.get("model") or request.args.get("model")
+    if name and name not in _models.available:
+        return jsonify({"ok": False, "error": f"unknown model '{name}'", "available": _models.available}), 400
+    stream = _models.request(name)
+    script = _send_script_command(f"model {name}" if name else "model")
+    return jsonify({"ok": stream.get("ok", False), "stream": stream, "webcam_script": script}), (200 if stream.get("ok") else 409)
+
 @app.get('/webcam/summary')
 def webcam_summary() -> Any:
     import time
+    if _script_shm_name:
+        # Totals of a running webcam.py, straight from its shared-memory status
+        _sync_script_counts()
     return jsonify({
         "session_info": {
             "start_time": _session_start_ts or time.time(),
@@ -551,17 +1291,139 @@ def webcam_summary() -> Any:
                     "all_animals": [
                         {"animal": k, "count": v, "percentage": (v / max(1, sum(_det_counts.values())))*100}
                         for k, v in sorted(_det_counts.items(), key=lambda x: x[1], reverse=True)
-                    ]
+                    ],
+                    "tracking": _tracker.summary() if _tracker is not None else None,
                 }
             }
-        ]
+        ],
+        "pipeline_timings": _pipeline_timings_report(),
     })
 
+def _pipeline_timings_report() -> Dict[str, Any]:
+    """Rolling stage percentiles for the MJPEG pipeline and the latest from webcam.py's event log."""
+    script_timings = None
+    try:
+        if latest_event is not None:
+            script_timings = latest_event(str(Path(DETECTION_PATH) / 'logs'), 'pipeline_timings')
+    except Exception:
+        pass
+    return {
+        "mjpeg": _pipeline_timings.snapshot() if _pipeline_timings is not None else None,
+        "webcam_script": script_timings,
+    }
+
+def _parse_ts(value: Optional[str]) -> Optional[float]:
+    """Accept unix seconds or an ISO-8601 timestamp from query parameters."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        from datetime import datetime
+        return datetime.fromisoformat(value).timestamp()
+
+@app.get('/webcam/sessions')
+def webcam_sessions() -> Any:
+    """List stored detection sessions, newest first, with per-species totals."""
+    if _history is None:
+        return jsonify({"error": "history store unavailable"}), 503
+    try:
+        sessions = _history.list_sessions(
+            camera=request.args.get('camera'),
+            start=_parse_ts(request.args.get('start')),
+            end=_parse_ts(request.args.get('end')),
+            limit=min(int(request.args.get('limit', 50)), 500),
+            offset=int(request.args.get('offset', 0)),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"sessions": sessions})
+
+@app.get('/webcam/sessions/<int:session_id>')
+def webcam_session_detail(session_id: int) -> Any:
+    if _history is None:
+        return jsonify({"error": "history store unavailable"}), 503
+    session = _history.get_session(session_id)
+    if session is None:
+        return jsonify({"error": "Session not found"}), 404
+    return jsonify(session)
+
+@app.get('/webcam/history/counts')
+def webcam_history_counts() -> Any:
+    """
+    Detection counts from hourly rollups.
+
+    Query params: start, end (unix seconds or ISO-8601), camera and species
+    (repeatable or comma-separated), group_by = species|camera|hour|none.
+    """
+    if _history is None:
+        return jsonify({"error": "history store unavailable"}), 503
+
+    def _multi(name: str) -> List[str]:
+        return [v.strip() for raw in request.args.getlist(name) for v in raw.split(',') if v.strip()]
+
+    try:
+        start = _parse_ts(request.args.get('start'))
+        end = _parse_ts(request.args.get('end'))
+        group_by = request.args.get('group_by', 'species')
+        counts = _history.query_counts(start, end, _multi('camera'), _multi('species'), group_by)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"start": start, "end": end, "group_by": group_by, "counts": counts})
+
+# ------------------ Startup warm-up ------------------
+from warmup import Warmup  # type: ignore
+STREAM_MODEL = os.getenv("STREAM_MODEL", "yolov8n.pt")
+_warmup = Warmup(required=[c.strip() for c in os.getenv("READY_REQUIRED", "").split(",") if c.strip()] or None)
+
+def _warm_whisper() -> None:
+    """One transcription of a second of silence, so the first audio request skips lazy init."""
+    import numpy as np
+    whisper_model = _get_detector().audio_analyzer.model_whisper
+    whisper_model.transcribe(np.zeros(16000, dtype=np.float32), fp16=False)
+
+def _warm_gemini() -> None:
+    """Gemini clients exist once the detector is built; optionally open the API connection too."""
+    detector = _get_detector()
+    clients = [detector.image_analyzer.model, detector.video_analyzer.model, detector.audio_analyzer.model_gemini]
+    if os.getenv("WARMUP_GEMINI_PING", "").lower() in ('1', 'true', 'yes'):
+        # A token count is free and resolves DNS/TLS before the first real upload
+        clients[0].count_tokens("ping")
+
+if _models is not None:
+    _warmup.chain(("yolo", lambda: _models.load(STREAM_MODEL)))
+else:
+    _warmup.disable("yolo", "ultralytics/detection helpers unavailable")
+if UniversalDetector is not None:
+    _warmup.chain(("analyzers", _get_detector), ("whisper", _warm_whisper), ("gemini", _warm_gemini))
+else:
+    for _name in ("analyzers", "whisper", "gemini"):
+        # Without the analyzers /analyze cannot work: keep /ready at 503 like /health
+        _warmup.disable(_name, _import_error_message, blocking=True)
+if UniversalDetector is not None and os.getenv("TRIAGE", "0").lower() in ('1', 'true', 'yes'):
+    # Separate chain: a missing ultralytics install must not fail the Whisper/Gemini warmers
+    _warmup.chain(("triage", lambda: _get_detector().image_analyzer.triage.load()))
+else:
+    _warmup.disable("triage", "TRIAGE not enabled")
+
+def _start_warmers() -> None:
+    if not _warmup.started and os.getenv("WARMUP", "1").lower() not in ('0', 'false', 'no'):
+        _warmup.start()
+
 if __name__ == "__main__":
     print(f"🚀 Starting Wildlife Detection API Server")
     print(f"📁 Detect.py path: {DETECT_PATH}")
     print(f"🌐 Server running on http://localhost:5002")
     print(f"🔧 Health check at http://localhost:5002/health")
     
+    # Load and warm models in the background; /ready turns 200 once they are hot
+    _start_warmers()
     from waitress import serve
-    serve(app, host="localhost", port=5002)
\ No newline at end of file
+    # Each MJPEG stream and SSE subscriber holds a worker thread. By default the pool has one thread
+    # per allowed SSE subscriber on top of 32 for the API and stream viewers, so a full event feed
+    # cannot starve /analyze. A small output buffer makes a slow viewer's stream block after a few
+    # frames, which is what its adaptive rate control measures.
+    threads = int(os.getenv("WAITRESS_THREADS", "0")) or 32 + (_feed.max_subscribers if _feed is not None else 0)
+    print(f"🧵 {threads} worker threads")
+    serve(app, host="localhost", port=5002, threads=threads,
+          outbuf_high_watermark=int(os.getenv("WAITRESS_OUTBUF_HIGH_WATERMARK", str(512 * 1024))))
\ No newline at end of file
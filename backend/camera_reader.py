@@ -0,0 +1,265 @@
+"""
+Resilient camera reader for the MJPEG pipeline.
+
+``cv2.VideoCapture`` on an RTSP/HTTP camera has two failure modes in the
+field: a network hiccup makes ``read()`` fail for good, and the capture's
+internal buffer quietly queues frames so inference runs seconds behind.
+``CameraReader`` owns the capture on a background thread that grabs
+continuously (draining that buffer) and only decodes while a consumer is
+waiting in ``read()``, so ``read()`` returns the first frame grabbed after
+it was called rather than one that sat in a buffer. Lost or frozen streams are reopened with exponential
+backoff, and per-camera reconnect and lag metrics are kept for
+``/webcam/camera_status``.
+
+It exposes the subset of the ``cv2.VideoCapture`` interface the backend
+uses (``isOpened``, ``read``, ``set``, ``get``, ``release``).
+"""
+
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+
+def open_capture(source: Union[str, int], timeout_ms: int = 5000) -> cv2.VideoCapture:
+    """Open a capture with open/read timeouts where this OpenCV build supports them."""
+    params: List[int] = []
+    if isinstance(source, str):
+        for name, value in (("CAP_PROP_OPEN_TIMEOUT_MSEC", timeout_ms), ("CAP_PROP_READ_TIMEOUT_MSEC", timeout_ms)):
+            if hasattr(cv2, name):
+                params += [getattr(cv2, name), value]
+    if params:
+        return cv2.VideoCapture(source, cv2.CAP_ANY, params)
+    return cv2.VideoCapture(source)
+
+
+def _fingerprint(frame: np.ndarray) -> int:
+    """Cheap checksum of a sparse pixel sample, for spotting a frozen picture."""
+    return zlib.crc32(np.ascontiguousarray(frame[::32, ::32]).tobytes())
+
+
+class CameraReader:
+    """
+    Background grab-and-drop reader with reconnect for one camera.
+
+    Args:
+        source: stream URL, video file or device index
+        properties: capture properties (cv2.CAP_PROP_*) applied on every (re)connect
+        stale_seconds: no frame grabbed for this long forces a reconnect
+        frozen_seconds: an unchanged decoded picture for this long also forces one (0 = off)
+        backoff_initial / backoff_max: reconnect delay bounds in seconds (doubles per failure)
+        timeout_ms: open/read timeout passed to OpenCV
+    """
+
+    def __init__(
+        self,
+        source: Union[str, int],
+        properties: Optional[Dict[int, float]] = None,
+        stale_seconds: float = 5.0,
+        frozen_seconds: float = 30.0,
+        backoff_initial: float = 0.5,
+        backoff_max: float = 30.0,
+        timeout_ms: int = 5000,
+    ):
+        self.source = source
+        self.properties: Dict[int, float] = dict(properties or {})
+        self.stale_seconds = stale_seconds
+        self.frozen_seconds = frozen_seconds
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.timeout_ms = timeout_ms
+        self._cap: Optional[cv2.VideoCapture] = None
+        self._cond = threading.Condition()
+        self._frame: Optional[np.ndarray] = None
+        self._frame_ts = 0.0
+        self._seq = 0
+        self._delivered_seq = 0
+        # Consumers blocked in read(); the reader decodes only while this is non-zero
+        self._waiters = 0
+        self._closed = threading.Event()
+        self._connected = threading.Event()
+        # Metrics
+        self.reconnects = 0
+        self.failures = 0
+        self.stale_events = 0
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+        self.frames_delivered = 0
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[float] = None
+        self._grab_times: Deque[float] = deque(maxlen=120)
+        self._lags: Deque[float] = deque(maxlen=120)
+        self._thread = threading.Thread(target=self._run, name=f"camera-reader-{source}", daemon=True)
+        self._thread.start()
+
+    # -- consumer side ------------------------------------------------------
+
+    def isOpened(self) -> bool:
+        """True until released; the reader keeps reconnecting in between."""
+        return not self._closed.is_set()
+
+    def wait_connected(self, timeout: float) -> bool:
+        return self._connected.wait(timeout)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def read(self, timeout: Optional[float] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        First frame grabbed after this call (at most one frame interval old).
+
+        Blocks up to ``timeout`` seconds (default: ``stale_seconds``) while the
+        camera delivers or reconnects.
+
+        Returns:
+            (True, frame), or (False, None) on timeout or after release
+        """
+        timeout = self.stale_seconds if timeout is None else timeout
+        with self._cond:
+            start = self._seq
+            self._waiters += 1
+            try:
+                ready = self._cond.wait_for(lambda: self._seq > start or self._closed.is_set(), timeout=timeout)
+            finally:
+                self._waiters -= 1
+            if not ready or self._closed.is_set() or self._frame is None:
+                return False, None
+            self._delivered_seq = self._seq
+            frame, ts = self._frame, self._frame_ts
+            self.frames_delivered += 1
+        self._lags.append(time.time() - ts)
+        return True, frame
+
+    def set(self, prop: int, value: float) -> bool:
+        # Applied on the reader thread at the next (re)connect
+        self.properties[prop] = value
+        return True
+
+    def get(self, prop: int) -> float:
+        cap = self._cap
+        try:
+            return float(cap.get(prop)) if cap is not None else 0.0
+        except cv2.error:
+            return 0.0
+
+    def release(self) -> None:
+        self._closed.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.timeout_ms / 1000.0 + 2.0)
+
+    # -- reader thread ------------------------------------------------------
+
+    def _open(self) -> bool:
+        cap = open_capture(self.source, self.timeout_ms)
+        if not cap.isOpened():
+            cap.release()
+            return False
+        for prop, value in self.properties.items():
+            try:
+                cap.set(prop, value)
+            except cv2.error:
+                pass
+        # Keep OpenCV's own queue short where the backend honours it; the grab loop drains the rest
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        except cv2.error:
+            pass
+        self._cap = cap
+        return True
+
+    def _disconnect(self) -> None:
+        self._connected.clear()
+        cap, self._cap = self._cap, None
+        if cap is not None:
+            cap.release()
+
+    def _run(self) -> None:
+        backoff = self.backoff_initial
+        first = True
+        while not self._closed.is_set():
+            if self._cap is None:
+                if not first:
+                    self.reconnects += 1
+                first = False
+                if not self._open():
+                    self.failures += 1
+                    self.last_error = "open failed"
+                    print(f"⚠️ Camera {self.source} unavailable; retrying in {backoff:.1f}s")
+                    self._closed.wait(backoff)
+                    backoff = min(self.backoff_max, backoff * 2)
+                    continue
+                self.connected_at = time.time()
+                self._connected.set()
+                last_grab = last_change = last_decode = time.time()
+                last_print = None
+            # Grab every frame so nothing queues up; decode only for a waiting consumer
+            ok = self._cap.grab()
+            now = time.time()
+            if ok:
+                last_grab = now
+                self.frames_grabbed += 1
+                self._grab_times.append(now)
+                # Without consumers, still decode now and then so a frozen picture is noticed
+                idle_check = bool(self.frozen_seconds) and now - last_decode >= self.frozen_seconds / 3
+                if self._waiters or self._frame is None or idle_check:
+                    ok, frame = self._cap.retrieve()
+                    if ok and frame is not None:
+                        last_decode = now
+                        self.frames_decoded += 1
+                        fingerprint = _fingerprint(frame)
+                        if fingerprint != last_print:
+                            last_change, last_print = now, fingerprint
+                        with self._cond:
+                            self._frame, self._frame_ts = frame, now
+                            self._seq += 1
+                            self._cond.notify_all()
+                # A stream that keeps answering with the same picture is frozen upstream
+                if not self.frozen_seconds or now - last_change <= self.frozen_seconds:
+                    backoff = self.backoff_initial
+                    continue
+                self.last_error = f"frozen picture for {now - last_change:.1f}s"
+            else:
+                if now - last_grab <= self.stale_seconds:
+                    # Brief gaps happen on busy links; retry before tearing down
+                    time.sleep(0.05)
+                    continue
+                self.last_error = f"no frame for {now - last_grab:.1f}s"
+            self.stale_events += 1
+            self.failures += 1
+            print(f"⚠️ Camera {self.source} stalled ({self.last_error}); reconnecting in {backoff:.1f}s")
+            self._disconnect()
+            self._closed.wait(backoff)
+            backoff = min(self.backoff_max, backoff * 2)
+        self._disconnect()
+
+    # -- metrics ------------------------------------------------------------
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        grabs = list(self._grab_times)
+        lags = list(self._lags)
+        fps = (len(grabs) - 1) / (grabs[-1] - grabs[0]) if len(grabs) > 1 and grabs[-1] > grabs[0] else None
+        return {
+            "source": self.source if isinstance(self.source, int) else str(self.source),
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "failures": self.failures,
+            "stale_events": self.stale_events,
+            "last_error": self.last_error,
+            "uptime_seconds": round(now - self.connected_at, 1) if self.connected and self.connected_at else 0.0,
+            "camera_fps": round(fps, 2) if fps else None,
+            "frames_grabbed": self.frames_grabbed,
+            "frames_decoded": self.frames_decoded,
+            "frames_delivered": self.frames_delivered,
+            "frames_dropped": self.frames_grabbed - self.frames_delivered,
+            "frame_age_ms": round((now - self._frame_ts) * 1000, 1) if self._frame_ts else None,
+            "lag_ms_p50": round(float(np.percentile(lags, 50)) * 1000, 1) if lags else None,
+            "lag_ms_max": round(max(lags) * 1000, 1) if lags else None,
+        }
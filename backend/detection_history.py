@@ -0,0 +1,237 @@
+"""
+Persistent multi-session detection history.
+
+Each finished webcam session is stored in a local SQLite database together
+with precomputed rollups:
+
+- ``session_species``: per-session, per-species totals
+- ``hourly_rollups``: detection counts per (hour bucket, camera, species)
+
+Count queries by time range, camera and species read the rollup tables
+through their indexes instead of rescanning raw events. Time ranges resolve
+to whole hours.
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+BUCKET_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    total_frames INTEGER NOT NULL DEFAULT 0,
+    processed_frames INTEGER NOT NULL DEFAULT 0,
+    total_detections INTEGER NOT NULL DEFAULT 0,
+    summary_json TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_camera_start ON sessions (camera, start_ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_start ON sessions (start_ts);
+
+CREATE TABLE IF NOT EXISTS session_species (
+    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    species TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (session_id, species)
+);
+
+CREATE TABLE IF NOT EXISTS hourly_rollups (
+    bucket_ts INTEGER NOT NULL,
+    camera TEXT NOT NULL,
+    species TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (bucket_ts, camera, species)
+);
+CREATE INDEX IF NOT EXISTS idx_rollups_species ON hourly_rollups (species, bucket_ts);
+CREATE INDEX IF NOT EXISTS idx_rollups_camera ON hourly_rollups (camera, bucket_ts);
+"""
+
+
+def bucket_of(ts: float) -> int:
+    """Start of the hour bucket containing ``ts``."""
+    return int(ts // BUCKET_SECONDS) * BUCKET_SECONDS
+
+
+class DetectionHistory:
+    """SQLite-backed store of detection sessions and their rollups."""
+
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Short-lived connection per call; commits on success and always closes."""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record_session(
+        self,
+        camera: str,
+        start_ts: float,
+        end_ts: float,
+        species_counts: Dict[str, int],
+        bucket_counts: Optional[Dict[Tuple[int, str], int]] = None,
+        total_frames: int = 0,
+        processed_frames: int = 0,
+        summary: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        Store one finished session and fold it into the rollups.
+
+        Args:
+            camera: camera identifier (IP camera URL or "local_webcam")
+            species_counts: session totals per species
+            bucket_counts: counts per (hour bucket, species); when omitted the
+                whole session is attributed to the hour it started in
+        Returns:
+            The new session id
+        """
+        if bucket_counts is None:
+            start_bucket = bucket_of(start_ts)
+            bucket_counts = {(start_bucket, sp): c for sp, c in species_counts.items()}
+        with self._write_lock, self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO sessions (camera, start_ts, end_ts, total_frames, processed_frames, total_detections, summary_json)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    camera,
+                    start_ts,
+                    end_ts,
+                    int(total_frames),
+                    int(processed_frames),
+                    int(sum(species_counts.values())),
+                    json.dumps(summary) if summary is not None else None,
+                ),
+            )
+            session_id = int(cur.lastrowid)
+            conn.executemany(
+                "INSERT INTO session_species (session_id, species, count) VALUES (?, ?, ?)",
+                [(session_id, sp, int(c)) for sp, c in species_counts.items() if c],
+            )
+            conn.executemany(
+                "INSERT INTO hourly_rollups (bucket_ts, camera, species, count) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (bucket_ts, camera, species) DO UPDATE SET count = count + excluded.count",
+                [(int(b), camera, sp, int(c)) for (b, sp), c in bucket_counts.items() if c],
+            )
+        return session_id
+
+    def list_sessions(
+        self,
+        camera: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Most recent sessions first, each with its per-species totals."""
+        where, params = self._filters(("camera", camera), ("start_ts >=", start), ("start_ts <", end))
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, camera, start_ts, end_ts, total_frames, processed_frames, total_detections FROM sessions"
+                f"{where} ORDER BY start_ts DESC LIMIT ? OFFSET ?",
+                params + [int(limit), int(offset)],
+            ).fetchall()
+            sessions = [dict(r) for r in rows]
+            if sessions:
+                ids = [s["id"] for s in sessions]
+                marks = ",".join("?" * len(ids))
+                species_rows = conn.execute(
+                    f"SELECT session_id, species, count FROM session_species WHERE session_id IN ({marks})"
+                    " ORDER BY count DESC",
+                    ids,
+                ).fetchall()
+                by_session: Dict[int, List[Dict[str, Any]]] = {}
+                for r in species_rows:
+                    by_session.setdefault(r["session_id"], []).append({"animal": r["species"], "count": r["count"]})
+                for s in sessions:
+                    s["species"] = by_session.get(s["id"], [])
+        return sessions
+
+    def get_session(self, session_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM sessions WHERE id = ?", (int(session_id),)).fetchone()
+            if row is None:
+                return None
+            session = dict(row)
+            session["summary"] = json.loads(session.pop("summary_json") or "null")
+            session["species"] = [
+                {"animal": r["species"], "count": r["count"]}
+                for r in conn.execute(
+                    "SELECT species, count FROM session_species WHERE session_id = ? ORDER BY count DESC",
+                    (int(session_id),),
+                )
+            ]
+        return session
+
+    def query_counts(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        cameras: Optional[Iterable[str]] = None,
+        species: Optional[Iterable[str]] = None,
+        group_by: str = "species",
+    ) -> List[Dict[str, Any]]:
+        """
+        Detection counts from the hourly rollups.
+
+        Args:
+            start/end: unix timestamps; widened to whole hour buckets
+            group_by: "species", "camera", "hour" or "none"
+        """
+        group_cols = {"species": "species", "camera": "camera", "hour": "bucket_ts", "none": None}
+        if group_by not in group_cols:
+            raise ValueError(f"group_by must be one of {sorted(group_cols)}")
+        clauses: List[str] = []
+        params: List[Any] = []
+        if start is not None:
+            clauses.append("bucket_ts >= ?")
+            params.append(bucket_of(start))
+        if end is not None:
+            clauses.append("bucket_ts < ?")
+            params.append(bucket_of(end) + (BUCKET_SECONDS if end % BUCKET_SECONDS else 0))
+        for col, values in (("camera", cameras), ("species", species)):
+            values = [v for v in (values or []) if v]
+            if values:
+                clauses.append(f"{col} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        col = group_cols[group_by]
+        with self._connect() as conn:
+            if col is None:
+                total = conn.execute(f"SELECT COALESCE(SUM(count), 0) FROM hourly_rollups{where}", params).fetchone()[0]
+                return [{"count": int(total)}]
+            rows = conn.execute(
+                f"SELECT {col} AS key, SUM(count) AS count FROM hourly_rollups{where} GROUP BY {col}"
+                f" ORDER BY {'key' if col == 'bucket_ts' else 'count DESC'}",
+                params,
+            ).fetchall()
+        return [{group_by: r["key"], "count": int(r["count"])} for r in rows]
+
+    @staticmethod
+    def _filters(*pairs: Tuple[str, Any]) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for expr, value in pairs:
+            if value is None or value == "":
+                continue
+            clauses.append(f"{expr} ?" if " " in expr else f"{expr} = ?")
+            params.append(value)
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
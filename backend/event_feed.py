@@ -0,0 +1,136 @@
+"""
+Push feed of live detection events (Server-Sent Events).
+
+A single ``EventBroadcaster`` fans out to every subscriber. Publishing
+appends one event to a shared bounded ring with a sequence number and
+wakes waiting subscribers; each subscriber just reads forward from its own
+position, so publishing costs the same with one viewer or a hundred and no
+per-client queues are kept. Clients that reconnect with ``Last-Event-ID``
+resume from the ring; clients that fell further behind than the ring, or
+send an id the feed never issued (e.g. from before a restart), get a
+``reset`` event telling them to refetch ``/webcam/summary`` once.
+
+Each connected subscriber holds one server worker thread for as long as it
+is connected, so the number of subscribers is capped (``max_subscribers``);
+the server's thread pool is sized from that cap plus room for the API and
+MJPEG viewers.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+
+class EventBroadcaster:
+    """
+    Single-producer, many-subscriber event ring.
+
+    Args:
+        capacity: events kept for slow or reconnecting subscribers
+        keepalive_seconds: idle interval after which a comment line is sent
+        max_subscribers: connected subscribers accepted at once (0 = unlimited)
+    """
+
+    def __init__(self, capacity: int = 1000, keepalive_seconds: float = 15.0, max_subscribers: int = 32):
+        self.capacity = capacity
+        self.keepalive_seconds = keepalive_seconds
+        self.max_subscribers = max_subscribers
+        self._ring: Deque[Tuple[int, str, str]] = deque(maxlen=capacity)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._subscribers = 0
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    @property
+    def full(self) -> bool:
+        """Whether a new subscriber should be turned away (checked before opening a stream)."""
+        return bool(self.max_subscribers) and self._subscribers >= self.max_subscribers
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def publish(self, kind: str, data: Dict[str, Any]) -> int:
+        """Serialize once and wake every subscriber; returns the event's sequence number."""
+        payload = json.dumps(data, separators=(",", ":"), default=float)
+        with self._cond:
+            self._seq += 1
+            self._ring.append((self._seq, kind, payload))
+            self._cond.notify_all()
+            return self._seq
+
+    def _since(self, after: int) -> Tuple[bool, list]:
+        """Events with seq > after; flag is True when some were already evicted."""
+        if not self._ring:
+            return False, []
+        oldest = self._ring[0][0]
+        gap = after + 1 < oldest
+        if after >= self._seq:
+            return gap, []
+        start = max(0, after + 1 - oldest)
+        return gap, [self._ring[i] for i in range(start, len(self._ring))]
+
+    def stream(self, last_event_id: Optional[str] = None) -> Iterator[str]:
+        """SSE-formatted lines for one subscriber; runs until the client disconnects."""
+        try:
+            position = int(last_event_id) if last_event_id else self._seq
+        except ValueError:
+            position = self._seq
+        with self._cond:
+            self._subscribers += 1
+            # An id from before a backend restart (seq starts over) or a bogus one would
+            # otherwise park the client until the new sequence catches up
+            restarted = position > self._seq or position < 0
+            if restarted:
+                position = self._seq
+        try:
+            yield f"retry: 3000\n: connected, seq {self._seq}\n\n"
+            if restarted:
+                yield f"event: reset\ndata: {json.dumps({'reason': 'unknown event id', 'timestamp': time.time()})}\n\n"
+            while True:
+                with self._cond:
+                    if position >= self._seq:
+                        self._cond.wait(timeout=self.keepalive_seconds)
+                    gap, events = self._since(position)
+                if gap:
+                    yield f"event: reset\ndata: {json.dumps({'reason': 'fell behind', 'timestamp': time.time()})}\n\n"
+                if not events:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                position = events[-1][0]
+                yield "".join(f"id: {seq}\nevent: {kind}\ndata: {payload}\n\n" for seq, kind, payload in events)
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+
+class DeltaTracker:
+    """Turns running counters into periodic change sets for the feed."""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._last: Dict[str, int] = {}
+        self._last_emit = 0.0
+
+    def reset(self) -> None:
+        self._last = {}
+        self._last_emit = 0.0
+
+    def due(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) - self._last_emit >= self.interval
+
+    def delta(self, counts: Dict[str, int], now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Changed counts since the previous call, or None when nothing changed."""
+        now = now or time.time()
+        self._last_emit = now
+        changed = {k: v - self._last.get(k, 0) for k, v in counts.items() if v != self._last.get(k, 0)}
+        if not changed:
+            return None
+        self._last = dict(counts)
+        return {"timestamp": now, "changed": changed, "totals": dict(counts), "total_detections": sum(counts.values())}
@@ -0,0 +1,115 @@
+"""
+Latest-frame buffer for snapshots.
+
+The MJPEG pipeline already encodes every frame it streams. It publishes
+that frame (raw and encoded) here with a sequence number, so snapshot
+requests are served from memory instead of opening another capture loop.
+Other qualities/sizes are encoded at most once per frame and shared by all
+requesters of the same variant. Stream viewers wait on the buffer for the
+next frame instead of each driving the camera.
+
+JPEG encoding uses libjpeg-turbo through PyTurboJPEG when it is installed
+and falls back to ``cv2.imencode`` otherwise.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    from turbojpeg import TurboJPEG  # type: ignore
+    _turbo = TurboJPEG()
+except Exception:
+    # Package or shared library missing; OpenCV's encoder is used instead
+    _turbo = None
+
+DEFAULT_QUALITY = 95  # cv2.imencode's default, i.e. what the stream sends
+
+
+class LatestFrameBuffer:
+    """
+    Most recent frame of one camera plus a small cache of re-encoded variants.
+
+    Args:
+        max_variants: (quality, width) encodings kept for the current frame
+    """
+
+    def __init__(self, max_variants: int = 8):
+        self.max_variants = max_variants
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._frame: Optional[np.ndarray] = None
+        self._seq = 0
+        self._ts = 0.0
+        self._variants: "OrderedDict[Tuple[int, int], bytes]" = OrderedDict()
+        self._variant_locks: Dict[Tuple[int, int], threading.Lock] = {}
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    @property
+    def timestamp(self) -> float:
+        return self._ts
+
+    def publish(self, frame: np.ndarray, jpg: bytes, quality: int = DEFAULT_QUALITY) -> int:
+        """Store the newest frame and its stream encoding; old variants are dropped."""
+        with self._lock:
+            self._seq += 1
+            self._ts = time.time()
+            self._frame = frame
+            self._variants = OrderedDict({(quality, 0): jpg})
+            self._variant_locks = {}
+            self._new_frame.notify_all()
+            return self._seq
+
+    def wait(self, after: int, timeout: float) -> bool:
+        """Block until a frame newer than ``after`` is published; False on timeout."""
+        with self._new_frame:
+            return self._new_frame.wait_for(lambda: self._seq > after, timeout=timeout)
+
+    def get(self, quality: int = DEFAULT_QUALITY, width: int = 0) -> Optional[Tuple[int, float, bytes]]:
+        """
+        JPEG of the latest frame at the requested quality and width (0 = native).
+
+        Returns:
+            (seq, timestamp, jpeg bytes), or None before the first frame
+        """
+        key = (int(quality), int(width))
+        with self._lock:
+            if self._frame is None:
+                return None
+            seq, ts, frame = self._seq, self._ts, self._frame
+            if key in self._variants:
+                self._variants.move_to_end(key)
+                return seq, ts, self._variants[key]
+            lock = self._variant_locks.setdefault(key, threading.Lock())
+        # One encoder per variant; concurrent requests for it wait and reuse the result
+        with lock:
+            with self._lock:
+                if seq == self._seq and key in self._variants:
+                    return seq, ts, self._variants[key]
+            jpg = encode_jpeg(frame, *key)
+            with self._lock:
+                if seq == self._seq:
+                    self._variants[key] = jpg
+                    while len(self._variants) > self.max_variants:
+                        self._variants.popitem(last=False)
+        return seq, ts, jpg
+
+
+def encode_jpeg(frame: np.ndarray, quality: int = DEFAULT_QUALITY, width: int = 0) -> bytes:
+    """Resize (keeping aspect ratio, never upscaling) and JPEG-encode a BGR frame."""
+    h, w = frame.shape[:2]
+    if width and width < w:
+        frame = cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    if _turbo is not None:
+        return _turbo.encode(np.ascontiguousarray(frame), quality=int(quality))
+    ok, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return buf.tobytes()
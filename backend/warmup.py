@@ -0,0 +1,122 @@
+"""
+Startup warmers and readiness tracking.
+
+Heavy components (YOLO weights, the Gemini clients and Whisper behind
+``UniversalDetector``) used to load on the first request that needed them,
+so that request paid for it. ``Warmup`` runs named warm-up steps on
+background threads at startup and records per-component state for the
+``/ready`` endpoint. Steps in one chain run in order (e.g. construct the
+detector, then warm its Whisper model); separate chains run in parallel.
+"""
+
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+PENDING, LOADING, READY, FAILED, DISABLED = "pending", "loading", "ready", "failed", "disabled"
+
+
+class Warmup:
+    """
+    Background warm-up runner with per-component readiness.
+
+    Args:
+        required: component names that must be ready for ``ready()``; None means
+            every registered component that is not disabled
+    """
+
+    def __init__(self, required: Optional[Iterable[str]] = None):
+        self.required = set(required) if required is not None else None
+        self._lock = threading.Lock()
+        self._components: Dict[str, Dict[str, Any]] = {}
+        self._chains: List[List[Tuple[str, Callable[[], Any]]]] = []
+        self._threads: List[threading.Thread] = []
+        self.started_at: Optional[float] = None
+
+    def chain(self, *steps: Tuple[str, Callable[[], Any]]) -> None:
+        """Register steps run one after another on their own thread; a failed step fails the rest."""
+        for name, _ in steps:
+            self._components[name] = {"status": PENDING}
+        self._chains.append(list(steps))
+
+    def disable(self, name: str, reason: str, blocking: bool = False) -> None:
+        """
+        Record a component that cannot load here (e.g. missing dependency).
+
+        Optional components never block readiness; ``blocking`` ones (the service cannot
+        work without them) and disabled names listed in ``required`` keep it not ready.
+        """
+        self._components[name] = {"status": DISABLED, "error": reason, "blocking": blocking}
+
+    def start(self) -> None:
+        """Start every chain once; later calls are no-ops."""
+        with self._lock:
+            if self.started_at is not None:
+                return
+            self.started_at = time.time()
+            unknown = self._unknown_required()
+            if unknown:
+                print(f"⚠️ Required components never registered (not ready until fixed): {', '.join(unknown)}")
+            for i, steps in enumerate(self._chains):
+                thread = threading.Thread(target=self._run, args=(steps,), name=f"warmup-{i}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    @property
+    def started(self) -> bool:
+        return self.started_at is not None
+
+    def _run(self, steps: List[Tuple[str, Callable[[], Any]]]) -> None:
+        for i, (name, step) in enumerate(steps):
+            self._set(name, status=LOADING, started=time.time())
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                traceback.print_exc()
+                print(f"❌ Warm-up of {name} failed: {e}")
+                self._set(name, status=FAILED, error=str(e), seconds=round(time.perf_counter() - start, 2))
+                for later, _ in steps[i + 1:]:
+                    self._set(later, status=FAILED, error=f"depends on {name}")
+                return
+            seconds = round(time.perf_counter() - start, 2)
+            self._set(name, status=READY, seconds=seconds, ready_at=time.time())
+            print(f"🔥 {name} ready in {seconds}s")
+
+    def _set(self, name: str, **fields: Any) -> None:
+        with self._lock:
+            self._components.setdefault(name, {}).update(fields)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until all chains finished (for scripts/tests); True if they did in time."""
+        deadline = None if timeout is None else time.time() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.time()))
+        return not any(t.is_alive() for t in self._threads)
+
+    def ready(self) -> bool:
+        with self._lock:
+            if self._unknown_required():
+                return False
+            return all(c["status"] == READY for name, c in self._components.items() if self._counts(name, c))
+
+    def _counts(self, name: str, component: Dict[str, Any]) -> bool:
+        if self.required is not None:
+            return name in self.required
+        return component["status"] != DISABLED or bool(component.get("blocking"))
+
+    def _unknown_required(self) -> List[str]:
+        return sorted(self.required - set(self._components)) if self.required is not None else []
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            components = {name: {**c, "required": self._counts(name, c)} for name, c in self._components.items()}
+            for name in self._unknown_required():
+                components[name] = {"status": "unknown", "error": "no such component", "required": True}
+        return {
+            "ready": self.ready(),
+            "started_at": self.started_at,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+            "components": components,
+        }
@@ -0,0 +1,376 @@
+"""
+Camera-trap batch detection over a folder of still images.
+
+Walks a directory tree, decodes images in worker processes (JPEG files are
+decoded at reduced resolution when they are much larger than the model
+input), keeps a bounded number of decoded batches prefetched, and runs
+batched YOLO inference with the same detection profile (classes and
+per-class thresholds) as the live webcam loop. Per-image detections go to
+compact columnar part files (Parquet via pyarrow when installed, otherwise
+compressed ``.npz``), and a manifest records every finished image (and
+every image that failed to decode) so reruns skip them.
+
+Usage:
+    python batch.py /media/sdcard/DCIM --output trap_results --batch 16 --workers 4
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from postprocess import DetectionFilter, result_arrays, class_counts
+from event_log import SessionAggregates
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+    _arrow_ok = True
+except Exception:
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+    _arrow_ok = False
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+MANIFEST_NAME = "manifest.ndjson"
+# DCT-domain reduced JPEG decoding is much cheaper than a full decode plus resize
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def iter_images(root: str) -> Iterator[Path]:
+    """Image files under ``root`` in a stable (sorted) order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if Path(name).suffix.lower() in IMAGE_EXTENSIONS:
+                yield Path(dirpath) / name
+
+
+# EXIF orientations that rotate by 90/270 degrees (width and height trade places)
+_TRANSPOSING_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def _image_size(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Upright (width, height) from the file header without decoding pixels.
+
+    ``cv2.imread`` applies the EXIF orientation, so the size must be the
+    rotated one or the scale back to original pixels comes out wrong.
+    """
+    try:
+        from PIL import Image  # type: ignore
+        with Image.open(path) as im:
+            width, height = im.size
+            if im.getexif().get(0x0112) in _TRANSPOSING_ORIENTATIONS:
+                return height, width
+            return width, height
+    except Exception:
+        return None
+
+
+def decode_image(path: str, imgsz: int) -> Tuple[str, Optional[np.ndarray], float, int, int]:
+    """
+    Decode one image scaled so its longest side is at most ``imgsz``.
+
+    Runs in a worker process; shrinking before the pickle back keeps the
+    inter-process transfer small.
+
+    Returns:
+        (path, BGR image or None, scale applied, original width, original height)
+    """
+    size = _image_size(path)
+    flag = cv2.IMREAD_COLOR
+    reduction = 1
+    if size is not None and Path(path).suffix.lower() in (".jpg", ".jpeg"):
+        for factor, reduced_flag in _REDUCED_FLAGS:
+            if max(size) // factor >= imgsz:
+                flag, reduction = reduced_flag, factor
+                break
+    img = cv2.imread(path, flag)
+    if img is None:
+        return path, None, 1.0, 0, 0
+    h, w = img.shape[:2]
+    orig_w, orig_h = size if size is not None else (w * reduction, h * reduction)
+    longest = max(h, w)
+    if longest > imgsz:
+        f = imgsz / longest
+        img = cv2.resize(img, (max(1, round(w * f)), max(1, round(h * f))), interpolation=cv2.INTER_AREA)
+        h, w = img.shape[:2]
+    return path, img, w / orig_w, orig_w, orig_h
+
+
+def decode_batch(paths: Sequence[str], imgsz: int) -> List[Tuple[str, Optional[np.ndarray], float, int, int]]:
+    return [decode_image(p, imgsz) for p in paths]
+
+
+def detect_frames(
+    model: Any,
+    frames: List[np.ndarray],
+    detection_filter: DetectionFilter,
+    conf: float,
+    imgsz: int = 640,
+) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """One batched model call; filtered (xyxy, conf, cls) arrays per frame."""
+    if not frames:
+        return []
+    class_ids = None if detection_filter.class_ids is None else detection_filter.class_ids.tolist()
+    results = model(frames, conf=conf, classes=class_ids, imgsz=imgsz, verbose=False)
+    return [detection_filter(*result_arrays(r)) for r in results]
+
+
+class Manifest:
+    """Append-only record of finished images keyed by relative path, size and mtime."""
+
+    def __init__(self, output_dir: Path):
+        self.path = output_dir / MANIFEST_NAME
+        self.done: Dict[str, Tuple[int, float]] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.done[rec["path"]] = (rec["size"], rec["mtime"])
+
+    @staticmethod
+    def key(path: Path) -> Tuple[int, float]:
+        st = path.stat()
+        return st.st_size, round(st.st_mtime, 3)
+
+    def is_done(self, rel: str, key: Tuple[int, float]) -> bool:
+        return self.done.get(rel) == key
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+                self.done[rec["path"]] = (rec["size"], rec["mtime"])
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ColumnarWriter:
+    """
+    Buffers detections and writes them as columnar part files.
+
+    One row per detection: path (dictionary-encoded), image size, class,
+    confidence and the box in original image coordinates.
+    """
+
+    def __init__(self, output_dir: Path, names: Dict[int, str], fmt: str = "auto"):
+        if fmt == "auto":
+            fmt = "parquet" if _arrow_ok else "npz"
+        if fmt == "parquet" and not _arrow_ok:
+            raise RuntimeError("pyarrow is required for --format parquet (pip install pyarrow)")
+        self.output_dir = output_dir
+        self.names = names
+        self.format = fmt
+        self.run_id = time.strftime("%Y%m%d-%H%M%S")
+        self.parts_written = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.paths: List[str] = []
+        self.sizes: List[Tuple[int, int]] = []
+        self.image_idx: List[np.ndarray] = []
+        self.boxes: List[np.ndarray] = []
+        self.confs: List[np.ndarray] = []
+        self.classes: List[np.ndarray] = []
+
+    def add(self, rel: str, width: int, height: int, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray) -> None:
+        if cls.size == 0:
+            return
+        idx = len(self.paths)
+        self.paths.append(rel)
+        self.sizes.append((width, height))
+        self.image_idx.append(np.full(cls.size, idx, dtype=np.int32))
+        self.boxes.append(xyxy.astype(np.int32))
+        self.confs.append(conf.astype(np.float32))
+        self.classes.append(cls.astype(np.int16))
+
+    def flush(self) -> Optional[str]:
+        """Write buffered rows to a new part file; returns its name (None if empty)."""
+        if not self.paths:
+            return None
+        image_idx = np.concatenate(self.image_idx)
+        boxes = np.concatenate(self.boxes)
+        confs = np.concatenate(self.confs)
+        classes = np.concatenate(self.classes)
+        sizes = np.asarray(self.sizes, dtype=np.int32)
+        name = f"detections-{self.run_id}-{self.parts_written:04d}.{self.format}"
+        target = self.output_dir / name
+        tmp = target.with_name(name + ".tmp")
+        if self.format == "parquet":
+            class_names = np.array([self.names.get(int(c), str(c)) for c in range(int(classes.max()) + 1)])
+            table = pa.table({
+                "path": pa.DictionaryArray.from_arrays(pa.array(image_idx), pa.array(self.paths)),
+                "width": sizes[image_idx, 0],
+                "height": sizes[image_idx, 1],
+                "class_id": classes,
+                "class_name": pa.DictionaryArray.from_arrays(pa.array(classes.astype(np.int32)), pa.array(class_names)),
+                "confidence": confs,
+                "x1": boxes[:, 0], "y1": boxes[:, 1], "x2": boxes[:, 2], "y2": boxes[:, 3],
+            })
+            pq.write_table(table, tmp, compression="zstd")
+        else:
+            with open(tmp, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    paths=np.array(self.paths),
+                    image_size=sizes,
+                    image_index=image_idx,
+                    class_id=classes,
+                    confidence=confs,
+                    xyxy=boxes,
+                )
+        os.replace(tmp, target)
+        self.parts_written += 1
+        self._reset()
+        return name
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_batch(args: argparse.Namespace) -> Dict[str, Any]:
+    from ultralytics import YOLO  # type: ignore
+    from detection_profile import load_profile
+
+    profile = load_profile(args.profile)
+    root = Path(args.folder).resolve()
+    output_dir = Path(args.output).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(output_dir)
+    writer = ColumnarWriter(output_dir, profile.names, args.format)
+
+    todo: List[Tuple[str, str, Tuple[int, float]]] = []
+    skipped = 0
+    for path in iter_images(str(root)):
+        rel = path.relative_to(root).as_posix()
+        key = Manifest.key(path)
+        if manifest.is_done(rel, key):
+            skipped += 1
+        else:
+            todo.append((str(path), rel, key))
+    print(f"📁 {len(todo)} images to process, {skipped} already in {manifest.path.name}")
+    if not todo:
+        return {"processed": 0, "skipped": skipped}
+
+    print(f"Loading {args.model}...")
+    model = YOLO(args.model)
+    detection_filter = profile.detection_filter()
+    aggregates = SessionAggregates(confidence_threshold=args.conf)
+    pending_records: List[Dict[str, Any]] = []
+    failed = 0
+    processed = 0
+    start = time.time()
+    last_report = start
+    info = {p: (rel, key) for p, rel, key in todo}
+
+    def commit() -> None:
+        # Part file first, then the manifest, so a crash never marks unwritten images done
+        part = writer.flush()
+        for rec in pending_records:
+            rec["part"] = part if rec["detections"] else None
+        manifest.extend(pending_records)
+        pending_records.clear()
+
+    batches = _batched([p for p, _, _ in todo], args.batch)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        inflight: Deque[Future] = deque()
+        for _ in range(args.prefetch):
+            chunk = next(batches, None)
+            if chunk is None:
+                break
+            inflight.append(pool.submit(decode_batch, chunk, args.imgsz))
+        while inflight:
+            decoded = inflight.popleft().result()
+            # Keep the decode queue full while the model works on this batch
+            chunk = next(batches, None)
+            if chunk is not None:
+                inflight.append(pool.submit(decode_batch, chunk, args.imgsz))
+
+            ok = [d for d in decoded if d[1] is not None]
+            failed += len(decoded) - len(ok)
+            for path, img, _, _, _ in decoded:
+                if img is None:
+                    print(f"⚠️ Could not decode {path}")
+                    # Recorded so reruns skip it until the file itself changes
+                    rel, (size, mtime) = info[path]
+                    pending_records.append({"path": rel, "size": size, "mtime": mtime, "detections": 0,
+                                            "failed": True})
+            detections = detect_frames(model, [d[1] for d in ok], detection_filter, args.conf, args.imgsz)
+            for (path, _, scale, width, height), (xyxy, confs, class_ids) in zip(ok, detections):
+                rel, (size, mtime) = info[path]
+                if class_ids.size:
+                    # Boxes back to original image coordinates
+                    xyxy = np.rint(xyxy / scale).astype(np.int32)
+                    for cls_id, count in class_counts(class_ids).items():
+                        aggregates.animal_detections[profile.names.get(cls_id, str(cls_id))] += count
+                writer.add(rel, width, height, xyxy, confs, class_ids)
+                pending_records.append({"path": rel, "size": size, "mtime": mtime, "detections": int(class_ids.size)})
+            processed += len(ok)
+            aggregates.frame_count = aggregates.processed_frames = processed
+            if len(pending_records) >= args.flush_every:
+                commit()
+            now = time.time()
+            if now - last_report >= 5.0:
+                print(f"⏩ {processed}/{len(todo)} images, {processed / (now - start):.1f} images/sec")
+                last_report = now
+    commit()
+
+    elapsed = time.time() - start
+    summary = aggregates.final_summary()
+    report = {
+        "folder": str(root),
+        "processed": processed,
+        "skipped": skipped,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 2),
+        "images_per_second": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "format": writer.format,
+        "parts_written": writer.parts_written,
+        "detection_results": summary["detection_results"],
+    }
+    with open(output_dir / f"summary-{writer.run_id}.json", "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ {processed} images in {elapsed:.1f}s ({report['images_per_second']} images/sec), "
+          f"{failed} failed; results in {output_dir}")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch animal detection over a folder of camera-trap images")
+    parser.add_argument("folder", help="Directory of images (searched recursively)")
+    parser.add_argument("--output", "-o", default="trap_results", help="Directory for part files, manifest and summary")
+    parser.add_argument("--model", default="yolov8s.pt", help="YOLO weights")
+    parser.add_argument("--conf", type=float, default=0.5, help="Confidence threshold")
+    parser.add_argument("--profile", default=None, help="Detection profile JSON (default: $DETECTION_PROFILE or coco_animals)")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference size; images are decoded down to it")
+    parser.add_argument("--batch", type=int, default=16, help="Images per inference batch")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="Decode processes")
+    parser.add_argument("--prefetch", type=int, default=4, help="Decoded batches kept ready ahead of the model")
+    parser.add_argument("--flush-every", type=int, default=2000, help="Images per part file / manifest commit")
+    parser.add_argument("--format", choices=["auto", "parquet", "npz"], default="auto",
+                        help="Output format (auto: parquet if pyarrow is installed, else npz)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run_batch(parse_args())
@@ -0,0 +1,300 @@
+"""
+Pre/post-event clip recording.
+
+``ClipRecorder`` keeps a bounded ring buffer of recent JPEG-encoded frames
+for one camera. When a detection triggers it, the buffered pre-roll and the
+frames of the following post-roll are handed to a background writer thread
+that decodes them and writes an MP4 with ``cv2.VideoWriter``, so the
+capture/inference loop never waits on disk. Memory is capped by the ring
+buffer's byte budget and the writer queue length (frames are dropped, not
+waited for, when the writer falls behind); disk is capped by deleting the
+oldest clips once the directory grows past its budget.
+"""
+
+import json
+import queue
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_")[:48] or "camera"
+
+
+class _Clip:
+    """One clip in progress; frames stream to the writer as they arrive."""
+
+    def __init__(self, path: Path, label: str, trigger_ts: float, end_ts: float, meta: Dict[str, Any]):
+        self.path = path
+        self.label = label
+        self.trigger_ts = trigger_ts
+        self.end_ts = end_ts
+        self.meta = meta
+        self.frames = 0
+        self.dropped = 0
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+
+
+class ClipRecorder:
+    """
+    Ring buffer of encoded frames plus a background clip writer for one camera.
+
+    Args:
+        directory: where clips (.mp4 + .json sidecar) are written
+        camera: camera id, used in clip file names
+        pre_seconds / post_seconds: footage kept before and recorded after a trigger
+        max_clip_seconds: upper bound for a clip extended by repeated triggers
+        max_buffer_bytes: memory budget of the pre-roll ring buffer
+        max_disk_bytes: oldest clips are deleted beyond this total size
+        max_pending_frames: writer queue length; later frames are dropped when full
+        fps: frame rate written to the file when it cannot be estimated
+        jpeg_quality: quality used by ``add_frame`` when encoding raw frames
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        camera: str = "local_webcam",
+        pre_seconds: float = 5.0,
+        post_seconds: float = 10.0,
+        max_clip_seconds: float = 60.0,
+        max_buffer_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: int = 2 * 1024 * 1024 * 1024,
+        max_pending_frames: int = 600,
+        fps: float = 15.0,
+        jpeg_quality: int = 80,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.camera = camera
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_clip_seconds = max_clip_seconds
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.fps = fps
+        self.jpeg_quality = jpeg_quality
+        self._ring: Deque[Tuple[float, bytes]] = deque()
+        self._ring_bytes = 0
+        self._active: Optional[_Clip] = None
+        self._lock = threading.Lock()
+        self._jobs: "queue.Queue[Tuple[str, Any, Any]]" = queue.Queue(maxsize=max_pending_frames)
+        self.saved: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self.dropped_frames = 0
+        self._writer = threading.Thread(target=self._write_loop, name=f"clip-writer-{_slug(camera)}", daemon=True)
+        self._writer.start()
+
+    # -- capture-loop side (never blocks) ---------------------------------
+
+    def add_frame(self, frame: np.ndarray, ts: Optional[float] = None) -> None:
+        """Encode a raw BGR frame and buffer it."""
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if ok:
+            self.add_encoded(buf.tobytes(), ts)
+
+    def add_encoded(self, jpg: bytes, ts: Optional[float] = None) -> None:
+        """Buffer an already-encoded JPEG frame (e.g. the MJPEG stream's)."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._ring.append((ts, jpg))
+            self._ring_bytes += len(jpg)
+            while self._ring and (self._ring_bytes > self.max_buffer_bytes or ts - self._ring[0][0] > self.pre_seconds):
+                self._ring_bytes -= len(self._ring.popleft()[1])
+            clip = self._active
+            if clip is None:
+                return
+            if ts > clip.end_ts:
+                self._active = None
+                self._put(("close", clip, None))
+                return
+        self._put(("frame", clip, (ts, jpg)))
+
+    def trigger(self, label: str, ts: Optional[float] = None, **meta: Any) -> bool:
+        """
+        Start a clip (pre-roll + post-roll) or extend the one being recorded.
+
+        Returns:
+            True if a new clip was started
+        """
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            if self._active is not None:
+                # Keep recording while detections continue, up to the clip length cap
+                start = self._active.first_ts or self._active.trigger_ts
+                self._active.end_ts = min(ts + self.post_seconds, start + self.max_clip_seconds)
+                return False
+            name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(ts))}_{_slug(self.camera)}_{_slug(label)}.mp4"
+            clip = _Clip(self.directory / name, label, ts, ts + self.post_seconds, meta)
+            pre_roll = list(self._ring)
+            self._active = clip
+        self._put(("open", clip, None))
+        for item in pre_roll:
+            self._put(("frame", clip, item))
+        return True
+
+    def _put(self, job: Tuple[str, Any, Any]) -> None:
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            if job[0] == "frame":
+                job[1].dropped += 1
+                self.dropped_frames += 1
+            else:
+                # Open/close markers must arrive; they are rare, so a short wait is acceptable
+                try:
+                    self._jobs.put(job, timeout=1.0)
+                except queue.Full:
+                    print(f"⚠️ Clip writer stalled; lost '{job[0]}'" + (f" for {job[1].path.name}" if job[1] else ""))
+
+    def flush(self) -> None:
+        """Finish the clip being recorded, e.g. when the stream stops."""
+        with self._lock:
+            clip, self._active = self._active, None
+        if clip is not None:
+            self._put(("close", clip, None))
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        """
+        Finish the active clip and stop the writer thread.
+
+        Waits up to ``timeout`` seconds for queued frames to be written; with 0 the
+        writer finishes them in the background.
+        """
+        self.flush()
+        self._put(("stop", None, None))
+        if timeout:
+            self._writer.join(timeout=timeout)
+
+    # -- writer thread ----------------------------------------------------
+
+    def _write_loop(self) -> None:
+        writer: Optional[cv2.VideoWriter] = None
+        pending: List[Tuple[float, bytes]] = []
+        while True:
+            kind, clip, payload = self._jobs.get()
+            if kind == "stop":
+                return
+            try:
+                if kind == "open":
+                    writer, pending = None, []
+                elif kind == "frame":
+                    ts, jpg = payload
+                    if writer is None:
+                        # Hold a few frames so the file's frame rate matches the camera's
+                        pending.append((ts, jpg))
+                        if len(pending) < 10:
+                            continue
+                        writer = self._open_writer(clip, pending)
+                        for item in pending:
+                            self._write_frame(writer, clip, item)
+                        pending = []
+                    else:
+                        self._write_frame(writer, clip, payload)
+                elif kind == "close":
+                    if writer is None and pending:
+                        writer = self._open_writer(clip, pending)
+                        for item in pending:
+                            self._write_frame(writer, clip, item)
+                    pending = []
+                    if writer is not None:
+                        writer.release()
+                        writer = None
+                        self._finish(clip)
+            except Exception as e:
+                print(f"❌ Clip writer error ({clip.path.name if clip else '-'}): {e}")
+                writer, pending = None, []
+
+    def _open_writer(self, clip: _Clip, frames: List[Tuple[float, bytes]]) -> cv2.VideoWriter:
+        first = cv2.imdecode(np.frombuffer(frames[0][1], dtype=np.uint8), cv2.IMREAD_COLOR)
+        span = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / span if len(frames) > 1 and span > 0 else self.fps
+        h, w = first.shape[:2]
+        writer = cv2.VideoWriter(str(clip.path), cv2.VideoWriter_fourcc(*"mp4v"), max(1.0, min(fps, 60.0)), (w, h))
+        if not writer.isOpened():
+            raise RuntimeError(f"could not open {clip.path} for writing")
+        return writer
+
+    def _write_frame(self, writer: cv2.VideoWriter, clip: _Clip, item: Tuple[float, bytes]) -> None:
+        ts, jpg = item
+        frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return
+        writer.write(frame)
+        clip.frames += 1
+        clip.first_ts = ts if clip.first_ts is None else clip.first_ts
+        clip.last_ts = ts
+
+    def _finish(self, clip: _Clip) -> None:
+        info = {
+            "event": "clip_saved",
+            "timestamp": time.time(),
+            "camera": self.camera,
+            "animal": clip.label,
+            "trigger_time": clip.trigger_ts,
+            "file": clip.path.name,
+            "path": str(clip.path),
+            "frames": clip.frames,
+            "dropped_frames": clip.dropped,
+            "duration_seconds": round((clip.last_ts or 0) - (clip.first_ts or 0), 2),
+            "pre_roll_seconds": round(clip.trigger_ts - (clip.first_ts or clip.trigger_ts), 2),
+            **clip.meta,
+        }
+        with open(clip.path.with_suffix(".json"), "w") as f:
+            json.dump(info, f, indent=2)
+        self._enforce_disk_cap()
+        self.saved.put(info)
+        print(f"🎬 Saved clip {clip.path.name} ({clip.frames} frames)")
+
+    def _enforce_disk_cap(self) -> None:
+        clips = sorted(self.directory.glob("*.mp4"), key=lambda p: p.stat().st_mtime)
+        sizes = {p: p.stat().st_size + (p.with_suffix(".json").stat().st_size if p.with_suffix(".json").exists() else 0)
+                 for p in clips}
+        total = sum(sizes.values())
+        for p in clips[:-1]:  # never delete the clip just written
+            if total <= self.max_disk_bytes:
+                break
+            total -= sizes[p]
+            p.unlink(missing_ok=True)
+            p.with_suffix(".json").unlink(missing_ok=True)
+
+    def drain_saved(self) -> List[Dict[str, Any]]:
+        """Clip events finished since the last call (for the event log)."""
+        events: List[Dict[str, Any]] = []
+        while True:
+            try:
+                events.append(self.saved.get_nowait())
+            except queue.Empty:
+                return events
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "camera": self.camera,
+                "recording": self._active.path.name if self._active else None,
+                "buffered_frames": len(self._ring),
+                "buffered_bytes": self._ring_bytes,
+                "dropped_frames": self.dropped_frames,
+            }
+
+
+def list_clips(directory: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest clips first, from their JSON sidecars."""
+    clips: List[Dict[str, Any]] = []
+    path = Path(directory)
+    if not path.exists():
+        return clips
+    for sidecar in sorted(path.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)[:limit]:
+        try:
+            with open(sidecar, "r") as f:
+                clips.append(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return clips
@@ -0,0 +1,101 @@
+"""
+Remote control for detection/webcam.py when it runs without a display.
+
+Commands arrive either over a local line-based TCP socket or as POSIX
+signals and are queued for the capture loop, which applies them between
+frames exactly like the keyboard shortcuts of the windowed mode.
+
+Socket protocol (one command per line, one JSON reply per line):
+    status              -> current state snapshot
+    pause | resume      -> toggle detection
+    quit                -> stop, save output.json and exit
+    conf <0.1-0.9>      -> set confidence threshold
+    skip <1-5>          -> process every Nth frame
+    model [name]        -> switch YOLO weights (loaded in the background)
+
+Signals: SIGTERM/SIGINT quit, SIGUSR1 toggles pause, SIGUSR2 prints status.
+"""
+
+import json
+import queue
+import signal
+import socketserver
+import threading
+from typing import Any, Dict, List, Optional
+
+COMMANDS = {"status", "pause", "resume", "toggle", "quit", "conf", "skip", "model"}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        control: "ControlChannel" = self.server.control  # type: ignore[attr-defined]
+        for raw in self.rfile:
+            line = raw.decode("utf-8", "replace").strip()
+            if not line:
+                continue
+            reply = control.submit(line)
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ControlChannel:
+    """Thread-safe command queue plus a state snapshot published by the loop."""
+
+    def __init__(self):
+        self._commands: "queue.Queue[List[str]]" = queue.Queue()
+        self._state: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[_Server] = None
+
+    def submit(self, line: str) -> Dict[str, Any]:
+        parts = line.split()
+        name = parts[0].lower()
+        if name not in COMMANDS:
+            return {"ok": False, "error": f"unknown command '{name}'", "commands": sorted(COMMANDS)}
+        if name == "status":
+            return {"ok": True, "state": self.state()}
+        self._commands.put([name] + parts[1:])
+        return {"ok": True, "queued": line}
+
+    def drain(self) -> List[List[str]]:
+        """Pending commands, oldest first; called by the capture loop."""
+        pending: List[List[str]] = []
+        while True:
+            try:
+                pending.append(self._commands.get_nowait())
+            except queue.Empty:
+                return pending
+
+    def publish(self, **state: Any) -> None:
+        with self._lock:
+            self._state.update(state)
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._state)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        """Start the control socket on a daemon thread."""
+        self._server = _Server((host, port), _Handler)
+        self._server.control = self  # type: ignore[attr-defined]
+        threading.Thread(target=self._server.serve_forever, name="webcam-control", daemon=True).start()
+        print(f"🎛️ Control socket listening on {host}:{port}")
+
+    def install_signal_handlers(self) -> None:
+        """Map POSIX signals onto queued commands (main thread only)."""
+        signal.signal(signal.SIGTERM, lambda *_: self._commands.put(["quit"]))
+        signal.signal(signal.SIGINT, lambda *_: self._commands.put(["quit"]))
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda *_: self._commands.put(["toggle"]))
+        if hasattr(signal, "SIGUSR2"):
+            signal.signal(signal.SIGUSR2, lambda *_: print(f"📊 Status: {json.dumps(self.state())}"))
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,71 @@
+"""
+Shared, file-backed detection profile.
+
+One JSON file lists the classes a deployment cares about with their display
+name, box color and optional per-class minimum confidence. Both detection
+pipelines (detection/webcam.py and the backend MJPEG stream) load it once
+and pass its class ids to the model, so irrelevant COCO classes are dropped
+inside the model's NMS instead of being counted and filtered in Python.
+
+The profile path comes from ``$DETECTION_PROFILE`` and defaults to
+``detection/profiles/coco_animals.json``.
+"""
+
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from postprocess import DetectionFilter
+
+DEFAULT_PROFILE = str(Path(__file__).resolve().parent / "profiles" / "coco_animals.json")
+
+
+class DetectionProfile:
+    """Class ids, names, colors and per-class thresholds of one profile file."""
+
+    def __init__(self, data: Dict[str, Any], path: Optional[str] = None):
+        self.path = path
+        self.name: str = data.get("name") or (Path(path).stem if path else "profile")
+        self.default_color: Tuple[int, int, int] = tuple(data.get("default_color", (0, 255, 0)))  # type: ignore
+        classes = data.get("classes") or []
+        if not classes:
+            raise ValueError(f"Detection profile {path or self.name} lists no classes")
+        self.names: Dict[int, str] = {int(c["id"]): str(c["name"]) for c in classes}
+        self.colors: Dict[int, Tuple[int, int, int]] = {
+            int(c["id"]): tuple(c["color"]) for c in classes if c.get("color")  # type: ignore
+        }
+        # Classes that need more confidence than the global threshold
+        self.thresholds: Dict[int, float] = {
+            int(c["id"]): float(c["min_confidence"]) for c in classes if c.get("min_confidence") is not None
+        }
+
+    @property
+    def class_ids(self) -> List[int]:
+        return sorted(self.names)
+
+    def color(self, class_id: int) -> Tuple[int, int, int]:
+        return self.colors.get(class_id, self.default_color)
+
+    def detection_filter(self, default_threshold: float = 0.0) -> DetectionFilter:
+        return DetectionFilter(self.class_ids, self.thresholds, default_threshold)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "path": self.path,
+            "classes": [
+                {"id": cid, "name": self.names[cid], "color": list(self.color(cid)),
+                 "min_confidence": self.thresholds.get(cid)}
+                for cid in self.class_ids
+            ],
+        }
+
+
+@lru_cache(maxsize=8)
+def load_profile(path: Optional[str] = None) -> DetectionProfile:
+    """Load (once per path) the detection profile at ``path``, ``$DETECTION_PROFILE`` or the default."""
+    path = path or os.getenv("DETECTION_PROFILE") or DEFAULT_PROFILE
+    with open(path, "r") as f:
+        return DetectionProfile(json.load(f), path)
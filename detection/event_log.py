@@ -0,0 +1,278 @@
+"""
+Crash-safe streaming event log for detection sessions.
+
+Events are appended to an NDJSON file as they happen instead of being held
+in memory until exit. The log rotates by size, is fsynced periodically, and
+carries "aggregates" checkpoints (the running session counters) so that
+``output.json`` can be rebuilt after a crash from the newest checkpoint plus
+the events written after it, even when older log files were rotated away.
+
+Usage:
+    python event_log.py rebuild detection/logs --output detection/output.json
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+LOG_NAME = "events.ndjson"
+
+
+class SessionAggregates:
+    """Running counters for one detection session; constant size."""
+
+    def __init__(self, start_time: Optional[float] = None, confidence_threshold: Optional[float] = None):
+        self.start_time = start_time or time.time()
+        self.confidence_threshold = confidence_threshold
+        self.animal_detections: Dict[str, int] = defaultdict(int)
+        self.frame_count = 0
+        self.processed_frames = 0
+        self.total_events = 0
+        self.tracking: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "start_time": self.start_time,
+            "confidence_threshold": self.confidence_threshold,
+            "animal_detections": dict(self.animal_detections),
+            "frame_count": self.frame_count,
+            "processed_frames": self.processed_frames,
+            "total_events": self.total_events,
+            "tracking": self.tracking,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SessionAggregates":
+        agg = cls(data.get("start_time"), data.get("confidence_threshold"))
+        agg.animal_detections.update(data.get("animal_detections") or {})
+        agg.frame_count = int(data.get("frame_count") or 0)
+        agg.processed_frames = int(data.get("processed_frames") or 0)
+        agg.total_events = int(data.get("total_events") or 0)
+        agg.tracking = data.get("tracking")
+        return agg
+
+    def detection_results(self) -> Dict[str, Any]:
+        """The ``detection_results`` block shared by every summary writer."""
+        counts = {k: v for k, v in self.animal_detections.items() if v > 0}
+        if not counts:
+            return {"total_detections": 0, "most_detected_animal": None, "all_animals": []}
+        total = sum(counts.values())
+        ranked = sorted(counts.items(), key=lambda x: x[1], reverse=True)
+        results = {
+            "total_detections": total,
+            "most_detected_animal": {
+                "animal": ranked[0][0],
+                "count": ranked[0][1],
+                "percentage": round((ranked[0][1] / total) * 100, 1),
+            },
+            "all_animals": [
+                {"animal": a, "count": c, "percentage": round((c / total) * 100, 1)} for a, c in ranked
+            ],
+        }
+        if self.tracking is not None:
+            results["tracking"] = self.tracking
+        return results
+
+    def final_summary(self, end_time: Optional[float] = None) -> Dict[str, Any]:
+        end_time = end_time or time.time()
+        total_time = end_time - self.start_time
+        return {
+            "event": "final_summary",
+            "timestamp": end_time,
+            "session_stats": {
+                "total_time_seconds": round(total_time, 2),
+                "total_frames": self.frame_count,
+                "processed_frames": self.processed_frames,
+                "average_fps": round(self.processed_frames / total_time, 1) if total_time > 0 else 0,
+                "confidence_threshold": self.confidence_threshold,
+            },
+            "detection_results": self.detection_results(),
+        }
+
+
+class EventLog:
+    """
+    Append-only NDJSON event log with size-based rotation and periodic fsync.
+
+    Only a bounded tail of recent events is kept in memory for ``output.json``.
+
+    Args:
+        directory: folder holding events.ndjson and its rotated backups
+        max_bytes: rotate once the active file grows past this size
+        backups: rotated files to keep (events.ndjson.1 is the newest)
+        fsync_interval: seconds between fsyncs of the active file
+        recent: number of recent events kept in memory
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 8 * 1024 * 1024,
+        backups: int = 5,
+        fsync_interval: float = 2.0,
+        recent: int = 200,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / LOG_NAME
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.fsync_interval = fsync_interval
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=recent)
+        self.events_written = 0
+        self._aggregates: Optional[SessionAggregates] = None
+        self._last_fsync = time.time()
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def _write(self, line: str) -> None:
+        if self._fh.tell() + len(line) > self.max_bytes and self._fh.tell() > 0:
+            self._rotate()
+        self._fh.write(line)
+        self._fh.flush()
+        now = time.time()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._fh.fileno())
+            self._last_fsync = now
+
+    def _rotate(self) -> None:
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        for i in range(self.backups, 0, -1):
+            src = self.path if i == 1 else self.path.with_name(f"{LOG_NAME}.{i - 1}")
+            dst = self.path.with_name(f"{LOG_NAME}.{i}")
+            if src.exists():
+                os.replace(src, dst)
+        self._fh = open(self.path, "a", encoding="utf-8")
+        # Every file starts with the running totals so rotated-away history is not needed
+        if self._aggregates is not None:
+            self._fh.write(self._checkpoint_line(self._aggregates))
+
+    def _checkpoint_line(self, aggregates: SessionAggregates) -> str:
+        aggregates.total_events = self.events_written
+        record = {"event": "aggregates", "timestamp": time.time(), "aggregates": aggregates.to_dict()}
+        return json.dumps(record, separators=(",", ":"), default=float) + "\n"
+
+    def start_session(self, aggregates: SessionAggregates) -> None:
+        """Mark a new session in the log and bind its running totals."""
+        self._aggregates = aggregates
+        self.append({"event": "session_started", "timestamp": aggregates.start_time})
+
+    def append(self, event: Dict[str, Any]) -> None:
+        """Record a session event."""
+        self._write(json.dumps(event, separators=(",", ":"), default=float) + "\n")
+        self.events_written += 1
+        self.recent.append(event)
+
+    def checkpoint(self) -> None:
+        """Record the running totals so the summary survives a crash."""
+        if self._aggregates is not None:
+            self._write(self._checkpoint_line(self._aggregates))
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+
+
+def build_output(aggregates: SessionAggregates, recent_events: List[Dict[str, Any]], final_summary: Dict[str, Any]) -> Dict[str, Any]:
+    """The ``output.json`` document read by the dashboard."""
+    events = list(recent_events)
+    if not events or events[-1] is not final_summary:
+        events.append(final_summary)
+    return {
+        "session_info": {
+            "start_time": aggregates.start_time,
+            "end_time": final_summary["timestamp"],
+            "total_events": aggregates.total_events,
+        },
+        "events": events,
+    }
+
+
+def iter_log(directory: str) -> Iterator[Dict[str, Any]]:
+    """Yield records oldest first across rotated files, skipping a torn last line."""
+    base = Path(directory) / LOG_NAME
+    # Only numbered rotations; stray .tmp/.bak files next to the log are not part of it
+    rotated = [p for p in base.parent.glob(f"{LOG_NAME}.*") if p.suffix[1:].isdigit()]
+    rotated.sort(key=lambda p: int(p.suffix[1:]), reverse=True)
+    for path in rotated + [base]:
+        if not path.exists():
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def latest_event(directory: str, kind: str, tail_bytes: int = 256 * 1024) -> Optional[Dict[str, Any]]:
+    """Newest record of a given type, read from the tail of the active log only."""
+    path = Path(directory) / LOG_NAME
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - tail_bytes))
+        lines = f.read().splitlines()
+    for raw in reversed(lines):
+        try:
+            record = json.loads(raw)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        if record.get("event") == kind:
+            return record
+    return None
+
+
+def rebuild_output(directory: str, recent: int = 200) -> Dict[str, Any]:
+    """Reconstruct ``output.json`` from the newest checkpoint and later events."""
+    aggregates = SessionAggregates()
+    final_summary: Optional[Dict[str, Any]] = None
+    tail: Deque[Dict[str, Any]] = deque(maxlen=recent)
+    since_checkpoint = 0
+    for record in iter_log(directory):
+        kind = record.get("event")
+        if kind == "session_started":
+            # Only the newest session in the log is rebuilt
+            aggregates = SessionAggregates(record.get("timestamp"))
+            final_summary = None
+            tail.clear()
+            since_checkpoint = 0
+        if kind == "aggregates":
+            aggregates = SessionAggregates.from_dict(record.get("aggregates") or {})
+            since_checkpoint = 0
+            continue
+        since_checkpoint += 1
+        tail.append(record)
+        if kind == "final_summary":
+            final_summary = record
+    aggregates.total_events += since_checkpoint
+    if final_summary is None:
+        final_summary = aggregates.final_summary()
+    return build_output(aggregates, list(tail), final_summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection event log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rb = sub.add_parser("rebuild", help="Rebuild output.json from an event log directory")
+    rb.add_argument("log_dir", help="Directory containing events.ndjson")
+    rb.add_argument("--output", "-o", default="output.json", help="Where to write the rebuilt summary")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        data = rebuild_output(args.log_dir)
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"✅ Rebuilt {args.output} from {args.log_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Per-stage frame pipeline timings with rolling percentiles.
+
+Each stage (capture, preprocess, inference, postprocess, draw, encode or
+display) keeps a bounded window of recent durations, so percentiles describe
+current behaviour on the device rather than the whole session average.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+import numpy as np
+
+PIPELINE_STAGES = ("capture", "preprocess", "inference", "postprocess", "draw", "encode", "display")
+
+
+class LapTimer:
+    """
+    Back-to-back stage timing for one loop.
+
+    Loops that share a StageTimings each keep their own LapTimer, so one
+    loop's lap never ends up in another loop's stage.
+    """
+
+    def __init__(self, timings: "StageTimings"):
+        self.timings = timings
+        self._last: Optional[float] = None
+
+    def start(self) -> None:
+        """Begin a sequence of back-to-back stages timed with ``lap``."""
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        """Attribute the time since the previous lap to ``stage``."""
+        now = time.perf_counter()
+        if self._last is not None:
+            self.timings.record(stage, now - self._last)
+        self._last = now
+
+
+class StageTimings:
+    """
+    Rolling per-stage latency window.
+
+    Args:
+        window: number of recent samples kept per stage
+    """
+
+    def __init__(self, window: int = 300):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._laps = LapTimer(self)
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.window)
+                self._counts[stage] = 0
+            self._samples[stage].append(seconds)
+            self._counts[stage] += 1
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def laps(self) -> LapTimer:
+        """A lap timer of its own for one loop recording into these timings."""
+        return LapTimer(self)
+
+    def start_lap(self) -> None:
+        """Begin a sequence of back-to-back stages timed with ``lap`` (single-loop callers)."""
+        self._laps.start()
+
+    def lap(self, stage: str) -> None:
+        """Attribute the time since the previous lap to ``stage``."""
+        self._laps.lap(stage)
+
+    def record_model_speed(self, speed: Optional[Dict[str, float]], total_seconds: float) -> float:
+        """
+        Split one model call into preprocess and inference.
+
+        Ultralytics results report per-call ``speed`` in milliseconds; the
+        model's own NMS time is returned (in seconds) so the caller can add
+        it to its post-processing sample, and any unexplained remainder of
+        the wall time is attributed to inference.
+        """
+        if not speed:
+            self.record("inference", total_seconds)
+            return 0.0
+        pre = float(speed.get("preprocess") or 0.0) / 1000.0
+        post = float(speed.get("postprocess") or 0.0) / 1000.0
+        self.record("preprocess", pre)
+        self.record("inference", max(0.0, total_seconds - pre - post))
+        return post
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Rolling p50/p90/p99/mean in milliseconds per stage, pipeline order first."""
+        with self._lock:
+            data = {stage: np.fromiter(s, dtype=np.float64) for stage, s in self._samples.items() if s}
+            counts = dict(self._counts)
+        ordered = [s for s in PIPELINE_STAGES if s in data] + sorted(s for s in data if s not in PIPELINE_STAGES)
+        report: Dict[str, Dict[str, float]] = {}
+        for stage in ordered:
+            ms = data[stage] * 1000.0
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+            report[stage] = {
+                "p50_ms": round(float(p50), 2),
+                "p90_ms": round(float(p90), 2),
+                "p99_ms": round(float(p99), 2),
+                "mean_ms": round(float(ms.mean()), 2),
+                "samples": int(ms.size),
+                "total_count": counts[stage],
+            }
+        return report
+
+    def event(self) -> Dict[str, object]:
+        """Snapshot packaged as an event-log record."""
+        return {"event": "pipeline_timings", "timestamp": time.time(), "window": self.window, "stages": self.snapshot()}
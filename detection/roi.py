@@ -0,0 +1,104 @@
+"""
+Per-camera regions of interest.
+
+Fixed cameras often see road, sky or a village edge we never care about.
+Each camera can list ROI polygons in ``cameras.json``; frames are cropped to
+the polygons' bounding box before inference (a smaller model input) and
+detections whose anchor point falls outside the polygons are discarded.
+
+Config layout (points are fractions of width/height unless "normalized" is false):
+    {
+      "cameras": {
+        "local_webcam": {"roi": [[[0.0, 0.35], [1.0, 0.35], [1.0, 1.0], [0.0, 1.0]]], "anchor": "bottom"},
+        "rtsp://192.168.1.20/stream": {"roi": [[[120, 300], [1800, 280], [1900, 1080], [40, 1080]]], "normalized": false}
+      }
+    }
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+CONFIG_PATH = os.getenv("CAMERA_CONFIG", str(Path(__file__).resolve().parent / "cameras.json"))
+
+
+def load_camera_config(path: Optional[str] = None) -> Dict[str, Any]:
+    """Camera config from JSON; empty when the file does not exist."""
+    path = path or CONFIG_PATH
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class RegionOfInterest:
+    """
+    Polygons a camera cares about, resolved to pixels once per frame size.
+
+    Args:
+        polygons: list of polygons, each a list of (x, y) points
+        normalized: points are fractions of width/height
+        anchor: point of a box tested against the mask, "center" or "bottom" (bottom-centre)
+    """
+
+    def __init__(self, polygons: Sequence[Sequence[Sequence[float]]], normalized: bool = True, anchor: str = "center"):
+        if not polygons:
+            raise ValueError("ROI needs at least one polygon")
+        if anchor not in ("center", "bottom"):
+            raise ValueError("anchor must be 'center' or 'bottom'")
+        self.polygons = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in polygons]
+        self.normalized = normalized
+        self.anchor = anchor
+        self._geometry: Dict[Tuple[int, int], Tuple[Tuple[int, int, int, int], np.ndarray, List[np.ndarray]]] = {}
+
+    @classmethod
+    def for_camera(cls, camera_id: str, config: Optional[Dict[str, Any]] = None) -> Optional["RegionOfInterest"]:
+        """ROI configured for ``camera_id``, or None when the camera has none."""
+        config = load_camera_config() if config is None else config
+        entry = (config.get("cameras") or {}).get(camera_id) or {}
+        if not entry.get("roi"):
+            return None
+        return cls(entry["roi"], entry.get("normalized", True), entry.get("anchor", "center"))
+
+    def geometry(self, width: int, height: int) -> Tuple[Tuple[int, int, int, int], np.ndarray, List[np.ndarray]]:
+        """(bounding box x0, y0, x1, y1; mask of the box region; pixel polygons), cached per resolution."""
+        key = (width, height)
+        if key not in self._geometry:
+            scale = np.array([width, height]) if self.normalized else np.ones(2)
+            pixel = [np.round(p * scale).astype(np.int32) for p in self.polygons]
+            pts = np.concatenate(pixel)
+            x0, y0 = np.clip(pts.min(axis=0), 0, [width, height])
+            x1, y1 = np.clip(pts.max(axis=0) + 1, 0, [width, height])
+            mask = np.zeros((max(1, y1 - y0), max(1, x1 - x0)), dtype=np.uint8)
+            cv2.fillPoly(mask, [p - np.array([x0, y0], dtype=np.int32) for p in pixel], 1)
+            self._geometry[key] = ((int(x0), int(y0), int(x1), int(y1)), mask.astype(bool), pixel)
+        return self._geometry[key]
+
+    def crop(self, frame: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """View of the ROI bounding box and its top-left offset; no pixels are copied."""
+        h, w = frame.shape[:2]
+        (x0, y0, x1, y1), _, _ = self.geometry(w, h)
+        return frame[y0:y1, x0:x1], (x0, y0)
+
+    def to_frame(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray,
+                 frame_shape: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Shift crop-space detections back to the frame and drop those outside the polygons."""
+        if cls.size == 0:
+            return xyxy, conf, cls
+        h, w = frame_shape[:2]
+        (x0, y0, _, _), mask, _ = self.geometry(w, h)
+        xyxy = xyxy + np.array([x0, y0, x0, y0], dtype=xyxy.dtype)
+        ax = (xyxy[:, 0] + xyxy[:, 2]) // 2 - x0
+        ay = (xyxy[:, 3] - 1 if self.anchor == "bottom" else (xyxy[:, 1] + xyxy[:, 3]) // 2) - y0
+        ax = np.clip(ax, 0, mask.shape[1] - 1)
+        ay = np.clip(ay, 0, mask.shape[0] - 1)
+        keep = mask[ay, ax]
+        return xyxy[keep], conf[keep], cls[keep]
+
+    def draw(self, frame: np.ndarray, color: Tuple[int, int, int] = (0, 200, 255)) -> None:
+        h, w = frame.shape[:2]
+        cv2.polylines(frame, self.geometry(w, h)[2], True, color, 1)
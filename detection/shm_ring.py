@@ -0,0 +1,307 @@
+"""
+Shared-memory ring of frames and detections between processes.
+
+``webcam.py`` owns the camera and the model; the backend serves streams
+and summaries. Instead of both opening the device, the detector writes each
+raw frame with its detections into a fixed-size ring in
+``multiprocessing.shared_memory`` and the backend maps the same segment and
+reads it in place: no pickling, no socket, and the writer allocates
+nothing per frame.
+
+Layout (little-endian, 64-byte aligned regions):
+    header | slot table | detections [slots, max_dets] | status blob | frames [slots, H, W, C]
+
+Each slot carries a sequence number used as a seqlock: the writer zeroes it,
+writes the frame and detections, then stores the new sequence. A reader
+checks the sequence before and after using a slot (``RingFrame.valid``), so
+a frame overwritten mid-read is detected and skipped rather than shown
+torn. The small JSON status blob (running counts, fps, model) uses the
+classic odd/even seqlock.
+
+Usage (inspect a running ring):
+    python shm_ring.py ekonet_webcam
+"""
+
+import json
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+MAGIC = b"EKORING1"
+VERSION = 1
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"), ("version", "<u4"), ("slots", "<u4"),
+    ("height", "<u4"), ("width", "<u4"), ("channels", "<u4"), ("max_dets", "<u4"),
+    ("status_bytes", "<u4"), ("writer_pid", "<u4"),
+    ("write_seq", "<u8"), ("status_seq", "<u8"), ("status_len", "<u4"), ("_pad", "<u4"),
+])
+SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"), ("ts", "<f8"), ("frame_index", "<i8"),
+    ("height", "<u4"), ("width", "<u4"), ("n_dets", "<u4"), ("detected", "<u4"),
+])
+DET_DTYPE = np.dtype([("xyxy", "<i4", (4,)), ("conf", "<f4"), ("cls", "<i4"), ("track_id", "<i4")])
+
+
+def _align(n: int, to: int = 64) -> int:
+    return (n + to - 1) // to * to
+
+
+def _layout(slots: int, height: int, width: int, channels: int, max_dets: int, status_bytes: int) -> Dict[str, int]:
+    offsets = {"header": 0}
+    offsets["slots"] = _align(HEADER_DTYPE.itemsize)
+    offsets["dets"] = offsets["slots"] + _align(SLOT_DTYPE.itemsize * slots)
+    offsets["status"] = offsets["dets"] + _align(DET_DTYPE.itemsize * max_dets * slots)
+    offsets["frames"] = offsets["status"] + _align(status_bytes)
+    offsets["size"] = offsets["frames"] + slots * height * width * channels
+    return offsets
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Map an existing segment without letting this process's resource tracker unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        except Exception:
+            pass
+        return shm
+
+
+class RingFrame:
+    """One frame read from the ring; arrays are views into shared memory until ``copy``."""
+
+    def __init__(self, ring: "FrameRing", seq: int, ts: float, frame_index: int, detected: bool,
+                 frame: np.ndarray, dets: np.ndarray):
+        self._ring = ring
+        self.seq = seq
+        self.timestamp = ts
+        self.frame_index = frame_index
+        self.detected = detected
+        self.frame = frame
+        self.xyxy = dets["xyxy"]
+        self.conf = dets["conf"]
+        self.cls = dets["cls"]
+        self.track_ids = dets["track_id"]
+
+    def valid(self) -> bool:
+        """True while the writer has not started overwriting this slot."""
+        return self._ring.slot_seq(self.seq) == self.seq
+
+    def copy(self) -> Optional["RingFrame"]:
+        """Private copy of frame and detections, or None if the slot was overwritten meanwhile."""
+        frame = self.frame.copy()
+        dets = np.empty(len(self.conf), dtype=DET_DTYPE)
+        dets["xyxy"], dets["conf"], dets["cls"], dets["track_id"] = self.xyxy, self.conf, self.cls, self.track_ids
+        if not self.valid():
+            return None
+        return RingFrame(self._ring, self.seq, self.timestamp, self.frame_index, self.detected, frame, dets)
+
+
+class FrameRing:
+    """
+    Fixed-size shared-memory ring; one writer process, any number of readers.
+
+    Use ``FrameRing.create`` in the process that owns the camera and
+    ``FrameRing.attach`` in readers.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf, offset=0)
+        if bytes(header["magic"]) != MAGIC or int(header["version"]) != VERSION:
+            raise ValueError(f"shared memory '{shm.name}' is not a frame ring (version {VERSION})")
+        self.slots = int(header["slots"])
+        self.height = int(header["height"])
+        self.width = int(header["width"])
+        self.channels = int(header["channels"])
+        self.max_dets = int(header["max_dets"])
+        self.status_bytes = int(header["status_bytes"])
+        layout = _layout(self.slots, self.height, self.width, self.channels, self.max_dets, self.status_bytes)
+        self._header = header
+        self._slots = np.ndarray((self.slots,), dtype=SLOT_DTYPE, buffer=shm.buf, offset=layout["slots"])
+        self._dets = np.ndarray((self.slots, self.max_dets), dtype=DET_DTYPE, buffer=shm.buf, offset=layout["dets"])
+        self._status = np.ndarray((self.status_bytes,), dtype=np.uint8, buffer=shm.buf, offset=layout["status"])
+        self._frames = np.ndarray((self.slots, self.height, self.width, self.channels), dtype=np.uint8,
+                                  buffer=shm.buf, offset=layout["frames"])
+
+    @classmethod
+    def create(cls, name: str, width: int, height: int, channels: int = 3, slots: int = 4,
+               max_dets: int = 64, status_bytes: int = 64 * 1024) -> "FrameRing":
+        """Create (or replace a stale) ring sized for ``width`` x ``height`` frames."""
+        layout = _layout(slots, height, width, channels, max_dets, status_bytes)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=layout["size"])
+        except FileExistsError:
+            # Left behind by a writer that crashed; readers still mapping it re-attach on timeout
+            old = _attach(name)
+            old.close()
+            old.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=layout["size"])
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf, offset=0)
+        header[...] = np.zeros((), dtype=HEADER_DTYPE)
+        for field, value in (("slots", slots), ("height", height), ("width", width), ("channels", channels),
+                             ("max_dets", max_dets), ("status_bytes", status_bytes)):
+            header[field] = value
+        header["writer_pid"] = os.getpid()
+        header["version"] = VERSION
+        header["magic"] = MAGIC  # last, so a half-initialised segment is never accepted
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        return cls(_attach(name), owner=False)
+
+    # -- writer -------------------------------------------------------------
+
+    def write(self, frame: np.ndarray, xyxy: Optional[np.ndarray] = None, conf: Optional[np.ndarray] = None,
+              cls: Optional[np.ndarray] = None, track_ids: Optional[np.ndarray] = None,
+              frame_index: int = 0, detected: bool = True, ts: Optional[float] = None) -> int:
+        """
+        Copy one frame and its detections into the next slot.
+
+        Args:
+            frame: HxWxC uint8 frame no larger than the ring's frame size
+            xyxy / conf / cls / track_ids: detections in frame pixels (extra beyond max_dets are dropped)
+            detected: False for frames that were not run through the model
+        Returns:
+            Sequence number of the written frame
+        """
+        h, w = frame.shape[:2]
+        if h > self.height or w > self.width or frame.ndim != 3 or frame.shape[2] != self.channels:
+            raise ValueError(f"frame {frame.shape} does not fit ring {self.height}x{self.width}x{self.channels}")
+        seq = int(self._header["write_seq"]) + 1
+        i = (seq - 1) % self.slots
+        slot = self._slots[i]
+        slot["seq"] = 0  # readers treat the slot as gone until the new sequence is stored
+        self._frames[i, :h, :w] = frame
+        n = 0 if cls is None else min(len(cls), self.max_dets)
+        if n:
+            dets = self._dets[i, :n]
+            dets["xyxy"] = xyxy[:n]
+            dets["conf"] = conf[:n]
+            dets["cls"] = cls[:n]
+            dets["track_id"] = track_ids[:n] if track_ids is not None else -1
+        slot["ts"] = time.time() if ts is None else ts
+        slot["frame_index"] = frame_index
+        slot["height"], slot["width"] = h, w
+        slot["n_dets"] = n
+        slot["detected"] = int(detected)
+        slot["seq"] = seq
+        self._header["write_seq"] = seq
+        return seq
+
+    def write_status(self, status: Dict[str, Any]) -> bool:
+        """Publish a small JSON status (counts, fps, ...); False if it does not fit."""
+        data = json.dumps(status, separators=(",", ":"), default=float).encode("utf-8")
+        if len(data) > self.status_bytes:
+            return False
+        seq = int(self._header["status_seq"])
+        self._header["status_seq"] = seq + 1  # odd: write in progress
+        self._status[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+        self._header["status_len"] = len(data)
+        self._header["status_seq"] = seq + 2
+        return True
+
+    # -- readers ------------------------------------------------------------
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self._header["write_seq"])
+
+    @property
+    def writer_pid(self) -> int:
+        return int(self._header["writer_pid"])
+
+    def slot_seq(self, seq: int) -> int:
+        return int(self._slots[(seq - 1) % self.slots]["seq"])
+
+    def read(self, after: int = 0, timeout: float = 1.0, poll: float = 0.002) -> Optional[RingFrame]:
+        """
+        Newest frame with a sequence above ``after``, as zero-copy views.
+
+        Intermediate frames are skipped. Call ``RingFrame.valid()`` after
+        using the views (or ``copy()``) to make sure the slot was not reused.
+
+        Returns:
+            RingFrame, or None if nothing newer arrived within ``timeout``
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = self.latest_seq
+            if seq > after:
+                i = (seq - 1) % self.slots
+                slot = self._slots[i]
+                if int(slot["seq"]) == seq:
+                    h, w, n = int(slot["height"]), int(slot["width"]), int(slot["n_dets"])
+                    frame = RingFrame(self, seq, float(slot["ts"]), int(slot["frame_index"]), bool(slot["detected"]),
+                                      self._frames[i, :h, :w], self._dets[i, :n])
+                    if frame.valid():
+                        return frame
+                continue  # overwritten while reading the slot header; take the newer one
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+
+    def read_status(self, retries: int = 10) -> Optional[Dict[str, Any]]:
+        for _ in range(retries):
+            before = int(self._header["status_seq"])
+            if before == 0:
+                return None
+            if before % 2:
+                time.sleep(0.001)
+                continue
+            data = bytes(self._status[:int(self._header["status_len"])])
+            if int(self._header["status_seq"]) == before:
+                try:
+                    return json.loads(data.decode("utf-8"))
+                except ValueError:
+                    return None
+        return None
+
+    def close(self) -> None:
+        """Unmap the segment (and remove it when this process created it)."""
+        # Views must go before the mapping can close
+        self._header = self._slots = self._dets = self._status = self._frames = None  # type: ignore[assignment]
+        try:
+            self._shm.close()
+        except BufferError:
+            # A caller still holds a frame view; the mapping goes away with the process
+            pass
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def main():
+    """Print the ring geometry, read rate and status of a running writer."""
+    name = sys.argv[1] if len(sys.argv) > 1 else "ekonet_webcam"
+    ring = FrameRing.attach(name)
+    print(f"Ring '{name}': {ring.slots} slots of {ring.width}x{ring.height}x{ring.channels}, "
+          f"writer pid {ring.writer_pid}")
+    seq, frames, start = ring.latest_seq, 0, time.time()
+    while time.time() - start < 3.0:
+        item = ring.read(seq, timeout=1.0)
+        if item is None:
+            break
+        seq, frames = item.seq, frames + 1
+    elapsed = time.time() - start
+    print(f"Read {frames} frames in {elapsed:.1f}s ({frames / elapsed:.1f} fps), latest seq {seq}")
+    print(json.dumps(ring.read_status(), indent=2))
+    ring.close()
+
+
+if __name__ == "__main__":
+    main()
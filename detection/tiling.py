@@ -0,0 +1,244 @@
+"""
+Sliced (tiled) inference for high-resolution frames.
+
+At ``imgsz=640`` a distant animal in a 4K frame shrinks to a few pixels and
+is missed. ``TiledDetector`` cuts the frame into overlapping model-sized
+tiles (plus, optionally, the whole frame for large animals), runs them
+through the model as one batch, shifts tile boxes back to frame
+coordinates and merges duplicates across tile borders with class-aware NMS.
+Tile geometry depends only on the frame size, so it is computed once per
+resolution and cached.
+
+Usage (accuracy/latency against the whole-frame baseline):
+    python tiling.py bench /path/to/images --labels /path/to/yolo_labels --tile 640 --overlap 0.2
+"""
+
+import argparse
+import json
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from postprocess import DetectionFilter, result_arrays, EMPTY_XYXY, EMPTY_CONF, EMPTY_CLS
+from tracker import iou_matrix
+
+Arrays = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _starts(length: int, tile: int, overlap: float) -> List[int]:
+    if length <= tile:
+        return [0]
+    stride = max(1, int(tile * (1.0 - overlap)))
+    n = int(np.ceil((length - tile) / stride)) + 1
+    # Spread tiles evenly so the last one ends exactly at the border
+    return [int(round(x)) for x in np.linspace(0, length - tile, n)]
+
+
+@lru_cache(maxsize=16)
+def tile_grid(width: int, height: int, tile: int = 640, overlap: float = 0.2) -> np.ndarray:
+    """Tile boxes [K, 4] (x0, y0, x1, y1) covering a ``width`` x ``height`` frame; cached per resolution."""
+    xs = _starts(width, tile, overlap)
+    ys = _starts(height, tile, overlap)
+    grid = np.array(
+        [(x, y, min(x + tile, width), min(y + tile, height)) for y in ys for x in xs],
+        dtype=np.int32,
+    )
+    grid.setflags(write=False)
+    return grid
+
+
+def merge_nms(xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray,
+              iou_threshold: float = 0.5, ios_threshold: float = 0.8) -> np.ndarray:
+    """
+    Class-aware greedy NMS over detections from all tiles.
+
+    A box is also suppressed when it lies mostly inside a stronger box of the
+    same class (intersection over the smaller box), which removes the partial
+    boxes an animal leaves on the tile it only straddles.
+
+    Returns:
+        Indices of the kept detections, highest confidence first
+    """
+    if cls.size == 0:
+        return np.zeros((0,), dtype=np.int64)
+    order = np.argsort(-conf)
+    boxes = xyxy[order].astype(np.float32)
+    classes = cls[order]
+    iou = iou_matrix(boxes, boxes)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    inter = iou * (areas[:, None] + areas[None, :]) / (1.0 + iou)
+    ios = inter / np.maximum(np.minimum(areas[:, None], areas[None, :]), 1e-6)
+    overlaps = ((iou >= iou_threshold) | (ios >= ios_threshold)) & (classes[:, None] == classes[None, :])
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep: List[int] = []
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= overlaps[i]
+    return order[np.array(keep, dtype=np.int64)]
+
+
+class TiledDetector:
+    """
+    Runs a model over overlapping tiles of a frame as one batch.
+
+    Args:
+        tile: tile side in pixels (also the model input size)
+        overlap: fraction of a tile shared with its neighbour
+        full_frame: also run the downscaled whole frame in the same batch
+        iou_threshold / ios_threshold: cross-tile merge thresholds
+    """
+
+    def __init__(self, tile: int = 640, overlap: float = 0.2, full_frame: bool = True,
+                 iou_threshold: float = 0.5, ios_threshold: float = 0.8):
+        self.tile = tile
+        self.overlap = overlap
+        self.full_frame = full_frame
+        self.iou_threshold = iou_threshold
+        self.ios_threshold = ios_threshold
+
+    def grid(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        return tile_grid(w, h, self.tile, self.overlap)
+
+    def __call__(self, model: Any, frame: np.ndarray, conf: float,
+                 classes: Optional[Sequence[int]] = None) -> Arrays:
+        """Merged (xyxy int32, conf float32, cls int64) for the whole frame."""
+        grid = self.grid(frame)
+        # Tiles are views into the frame, no copies until the model letterboxes them
+        inputs = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in grid]
+        offsets = [grid[:, :2]]
+        if self.full_frame and len(grid) > 1:
+            inputs.append(frame)
+            offsets.append(np.zeros((1, 2), dtype=np.int32))
+        offsets_all = np.concatenate(offsets)
+        results = model(inputs, conf=conf, classes=list(classes) if classes is not None else None,
+                        imgsz=self.tile, verbose=False)
+        parts_xyxy, parts_conf, parts_cls = [], [], []
+        for (ox, oy), r in zip(offsets_all, results):
+            xyxy, c, k = result_arrays(r)
+            if k.size:
+                parts_xyxy.append(xyxy + np.array([ox, oy, ox, oy], dtype=np.int32))
+                parts_conf.append(c)
+                parts_cls.append(k)
+        if not parts_cls:
+            return EMPTY_XYXY, EMPTY_CONF, EMPTY_CLS
+        xyxy = np.concatenate(parts_xyxy)
+        confs = np.concatenate(parts_conf)
+        cls = np.concatenate(parts_cls)
+        keep = merge_nms(xyxy, confs, cls, self.iou_threshold, self.ios_threshold)
+        return xyxy[keep], confs[keep], cls[keep]
+
+
+def _load_labels(path: Path, width: int, height: int) -> Arrays:
+    """YOLO-format label file (cls cx cy w h, normalised) as pixel xyxy."""
+    if not path.exists():
+        return EMPTY_XYXY, EMPTY_CONF, EMPTY_CLS
+    rows = np.loadtxt(path, ndmin=2)
+    if rows.size == 0:
+        return EMPTY_XYXY, EMPTY_CONF, EMPTY_CLS
+    cx, cy, bw, bh = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    xyxy = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1).astype(np.int32)
+    return xyxy, np.ones(len(rows), dtype=np.float32), rows[:, 0].astype(np.int64)
+
+
+def _match(pred: Arrays, truth: Arrays, iou_threshold: float = 0.5) -> int:
+    """True positives: same-class pairs matched greedily at IoU >= threshold."""
+    from tracker import greedy_match
+    if pred[2].size == 0 or truth[2].size == 0:
+        return 0
+    iou = iou_matrix(pred[0], truth[0])
+    iou[pred[2][:, None] != truth[2][None, :]] = 0.0
+    return len(greedy_match(iou, iou_threshold))
+
+
+def _latency_stats(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000.0
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 2), "p90_ms": round(float(np.percentile(ms, 90)), 2),
+            "mean_ms": round(float(ms.mean()), 2)}
+
+
+def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Whole-frame vs tiled detection over a folder; recall/precision when labels are given."""
+    import cv2
+    from ultralytics import YOLO  # type: ignore
+    from batch import iter_images
+    from detection_profile import load_profile
+
+    model = YOLO(args.model)
+    profile = load_profile()
+    detection_filter = profile.detection_filter()
+    classes = profile.class_ids
+    tiler = TiledDetector(args.tile, args.overlap, full_frame=not args.no_full_frame)
+    stats = {name: {"latency": [], "detections": 0, "tp": 0} for name in ("whole_frame", "tiled")}
+    truth_total = 0
+    images = 0
+    for path in iter_images(args.folder):
+        frame = cv2.imread(str(path))
+        if frame is None:
+            continue
+        h, w = frame.shape[:2]
+        truth = None
+        if args.labels:
+            truth = _load_labels(Path(args.labels) / (path.stem + ".txt"), w, h)
+            truth = detection_filter(truth[0], np.ones_like(truth[1]), truth[2])
+            truth_total += truth[2].size
+        runs = {
+            "whole_frame": lambda: detection_filter(*result_arrays(
+                model(frame, conf=args.conf, classes=classes, imgsz=args.tile, verbose=False)[0])),
+            "tiled": lambda: detection_filter(*tiler(model, frame, args.conf, classes)),
+        }
+        for name, run in runs.items():
+            start = time.perf_counter()
+            pred = run()
+            stats[name]["latency"].append(time.perf_counter() - start)
+            stats[name]["detections"] += int(pred[2].size)
+            if truth is not None:
+                stats[name]["tp"] += _match(pred, truth)
+        images += 1
+        if images == 1:
+            # Drop the first (warm-up) sample from both runs
+            for s in stats.values():
+                s["latency"].clear()
+    report: Dict[str, Any] = {"images": images, "tile": args.tile, "overlap": args.overlap}
+    for name, s in stats.items():
+        entry: Dict[str, Any] = {"detections": s["detections"]}
+        if s["latency"]:
+            entry["latency"] = _latency_stats(s["latency"])
+        if args.labels:
+            entry["recall"] = round(s["tp"] / truth_total, 3) if truth_total else None
+            entry["precision"] = round(s["tp"] / s["detections"], 3) if s["detections"] else None
+        report[name] = entry
+    if args.labels:
+        report["ground_truth_boxes"] = truth_total
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiled inference tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="Compare tiled and whole-frame detection on a folder of images")
+    bench.add_argument("folder", help="Directory of test images")
+    bench.add_argument("--labels", default=None, help="Directory of YOLO-format .txt labels (same stem as images)")
+    bench.add_argument("--model", default="yolov8s.pt", help="YOLO weights")
+    bench.add_argument("--conf", type=float, default=0.5, help="Confidence threshold")
+    bench.add_argument("--tile", type=int, default=640, help="Tile size in pixels")
+    bench.add_argument("--overlap", type=float, default=0.2, help="Tile overlap fraction")
+    bench.add_argument("--no-full-frame", action="store_true", help="Do not add the whole frame to the tile batch")
+    bench.add_argument("--output", "-o", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        report = benchmark(args)
+        print(json.dumps(report, indent=2))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
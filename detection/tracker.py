@@ -0,0 +1,228 @@
+"""
+Lightweight multi-object tracker for the detection pipelines.
+
+ByteTrack-style association on top of a constant-velocity box model:
+high-confidence detections are matched to live tracks by IoU first, then
+low-confidence detections get a second chance against the tracks that are
+still unmatched. Tracks are class-consistent, confirmed after a few hits,
+and retired after a period without matches, so counts reflect unique
+animals and dwell time rather than per-frame hits.
+"""
+
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between boxes a [N, 4] and b [M, 4] in xyxy format."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0).astype(np.float32)
+
+
+def greedy_match(iou: np.ndarray, min_iou: float) -> List[Tuple[int, int]]:
+    """Greedy highest-IoU-first assignment; adequate for the sparse scenes we see."""
+    pairs: List[Tuple[int, int]] = []
+    if iou.size == 0:
+        return pairs
+    order = np.argsort(-iou, axis=None)
+    used_rows, used_cols = set(), set()
+    for flat in order:
+        r, c = divmod(int(flat), iou.shape[1])
+        if iou[r, c] < min_iou:
+            break
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        pairs.append((r, c))
+    return pairs
+
+
+class Track:
+    """State for one tracked individual."""
+
+    def __init__(self, track_id: int, box: np.ndarray, cls: int, name: str, conf: float, ts: float):
+        self.track_id = track_id
+        self.box = box.astype(np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.cls = cls
+        self.name = name
+        self.max_conf = conf
+        self.first_seen = ts
+        self.last_seen = ts
+        self.hits = 1
+        self.confirmed = False
+
+    def predict(self) -> np.ndarray:
+        return self.box + self.velocity
+
+    def update(self, box: np.ndarray, conf: float, ts: float) -> None:
+        box = box.astype(np.float32)
+        # Smoothed constant-velocity estimate per processed frame
+        self.velocity = 0.5 * self.velocity + 0.5 * (box - self.box)
+        self.box = box
+        self.max_conf = max(self.max_conf, conf)
+        self.last_seen = ts
+        self.hits += 1
+
+    @property
+    def dwell_seconds(self) -> float:
+        return self.last_seen - self.first_seen
+
+
+class Tracker:
+    """
+    IoU tracker with ByteTrack-style two-stage association.
+
+    Args:
+        high_threshold: detections at or above this confidence start tracks
+        match_iou: minimum IoU for a detection to continue a track
+        min_hits: matches needed before a track counts as a unique individual
+        max_age_seconds: how long a track survives without a match
+    """
+
+    def __init__(
+        self,
+        high_threshold: float = 0.5,
+        match_iou: float = 0.3,
+        min_hits: int = 3,
+        max_age_seconds: float = 2.0,
+    ):
+        self.high_threshold = high_threshold
+        self.match_iou = match_iou
+        self.min_hits = min_hits
+        self.max_age_seconds = max_age_seconds
+        self.tracks: List[Track] = []
+        self._next_id = 1
+        self.unique_counts: Dict[str, int] = defaultdict(int)
+        self.dwell_totals: Dict[str, float] = defaultdict(float)
+
+    def _associate(self, det_idx: np.ndarray, track_idx: List[int], xyxy: np.ndarray, cls: np.ndarray):
+        if len(det_idx) == 0 or not track_idx:
+            return [], list(det_idx), track_idx
+        predicted = np.stack([self.tracks[t].predict() for t in track_idx])
+        iou = iou_matrix(predicted, xyxy[det_idx])
+        # Never join boxes of different classes into one track
+        track_cls = np.array([self.tracks[t].cls for t in track_idx])
+        iou[track_cls[:, None] != cls[det_idx][None, :]] = 0.0
+        pairs = greedy_match(iou, self.match_iou)
+        matched = [(track_idx[r], int(det_idx[c])) for r, c in pairs]
+        used_t = {r for r, _ in pairs}
+        used_d = {c for _, c in pairs}
+        rest_d = [int(det_idx[c]) for c in range(len(det_idx)) if c not in used_d]
+        rest_t = [track_idx[r] for r in range(len(track_idx)) if r not in used_t]
+        return matched, rest_d, rest_t
+
+    def update(
+        self,
+        xyxy: np.ndarray,
+        conf: np.ndarray,
+        cls: np.ndarray,
+        names: Dict[int, str],
+        ts: Optional[float] = None,
+    ) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Advance the tracker by one processed frame.
+
+        Returns:
+            (track id per input detection, -1 if untracked; list of track events)
+        """
+        ts = time.time() if ts is None else ts
+        events: List[Dict[str, Any]] = []
+        ids = np.full(len(cls), -1, dtype=np.int64)
+
+        high = np.flatnonzero(conf >= self.high_threshold)
+        low = np.flatnonzero(conf < self.high_threshold)
+        live = list(range(len(self.tracks)))
+
+        matched, unmatched_high, live = self._associate(high, live, xyxy, cls)
+        matched_low, _, live = self._associate(low, live, xyxy, cls)
+
+        for t, d in matched + matched_low:
+            track = self.tracks[t]
+            track.update(xyxy[d], float(conf[d]), ts)
+            ids[d] = track.track_id
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                self.unique_counts[track.name] += 1
+                events.append({
+                    "event": "track_started",
+                    "timestamp": track.first_seen,
+                    "track_id": track.track_id,
+                    "animal": track.name,
+                    "confidence": round(track.max_conf, 3),
+                })
+
+        for d in unmatched_high:
+            cls_id = int(cls[d])
+            track = Track(self._next_id, xyxy[d], cls_id, names.get(cls_id, str(cls_id)), float(conf[d]), ts)
+            self._next_id += 1
+            self.tracks.append(track)
+            ids[d] = track.track_id
+
+        events.extend(self._expire(ts))
+        return ids, events
+
+    def _expire(self, ts: float) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        alive: List[Track] = []
+        for track in self.tracks:
+            if ts - track.last_seen <= self.max_age_seconds:
+                alive.append(track)
+            elif track.confirmed:
+                events.append(self._ended_event(track))
+        self.tracks = alive
+        return events
+
+    def _ended_event(self, track: Track) -> Dict[str, Any]:
+        self.dwell_totals[track.name] += track.dwell_seconds
+        return {
+            "event": "track_ended",
+            "timestamp": track.last_seen,
+            "track_id": track.track_id,
+            "animal": track.name,
+            "dwell_seconds": round(track.dwell_seconds, 2),
+            "confidence": round(track.max_conf, 3),
+        }
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """End every confirmed track, e.g. when the session stops."""
+        events = [self._ended_event(t) for t in self.tracks if t.confirmed]
+        self.tracks = []
+        return events
+
+    def summary(self) -> Dict[str, Any]:
+        """Unique individuals and dwell time per species, including live tracks."""
+        dwell = dict(self.dwell_totals)
+        active = 0
+        for t in self.tracks:
+            if t.confirmed:
+                active += 1
+                dwell[t.name] = dwell.get(t.name, 0.0) + t.dwell_seconds
+        return {
+            "unique_individuals": sum(self.unique_counts.values()),
+            "active_tracks": active,
+            "by_species": [
+                {
+                    "animal": name,
+                    "individuals": count,
+                    "total_dwell_seconds": round(dwell.get(name, 0.0), 2),
+                    "mean_dwell_seconds": round(dwell.get(name, 0.0) / count, 2) if count else 0.0,
+                }
+                for name, count in sorted(self.unique_counts.items(), key=lambda x: x[1], reverse=True)
+            ],
+        }
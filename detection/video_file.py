@@ -0,0 +1,286 @@
+"""
+Offline video file mode for detection/webcam.py.
+
+Recorded MP4s (drones, trail cameras) are decoded in separate processes,
+one per segment of the video, so long files are split and decoded
+concurrently. Each decoder samples frames at a fixed rate (skipped frames
+are only grabbed, never converted) or, with PyAV installed, decodes
+keyframes only. Sampled frames are shrunk to the model input size before
+they cross the process boundary, and the main process runs batched
+detection over whatever frames are ready and folds the results into the
+same session aggregates and event log as the live loop, so the summary
+written by ``save_json_output`` has the same schema.
+"""
+
+import multiprocessing as mp
+import queue
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from batch import detect_frames
+from postprocess import DetectionFilter, class_counts, class_max_conf
+from tracker import Tracker
+from tiling import TiledDetector
+from roi import RegionOfInterest
+from event_log import EventLog, SessionAggregates
+
+try:
+    import av  # type: ignore
+    _av_ok = True
+except Exception:
+    av = None  # type: ignore
+    _av_ok = False
+
+
+def probe_video(path: str) -> Tuple[float, float]:
+    """(fps, duration in seconds) from the container metadata."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video file: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+    cap.release()
+    return fps, (frames / fps if frames > 0 else 0.0)
+
+
+def _shrink(frame: np.ndarray, imgsz: int) -> np.ndarray:
+    h, w = frame.shape[:2]
+    if imgsz <= 0 or max(h, w) <= imgsz:
+        return frame
+    f = imgsz / max(h, w)
+    return cv2.resize(frame, (max(1, round(w * f)), max(1, round(h * f))), interpolation=cv2.INTER_AREA)
+
+
+def _decode_sampled(path: str, segment: int, start: float, end: Optional[float], sample_fps: float,
+                    imgsz: int, out: "mp.Queue") -> int:
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, round(fps / sample_fps)) if sample_fps > 0 else 1
+    first = int(round(start * fps))
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    index = first
+    read = 0
+    while end is None or index / fps < end:
+        # grab() demuxes and decodes; retrieve() (colour conversion) only for sampled frames
+        if not cap.grab():
+            break
+        read += 1
+        if (index - first) % step == 0:
+            ok, frame = cap.retrieve()
+            if ok:
+                out.put((segment, index / fps, _shrink(frame, imgsz)))
+        index += 1
+    cap.release()
+    return read
+
+
+def _decode_keyframes(path: str, segment: int, start: float, end: Optional[float], imgsz: int,
+                      out: "mp.Queue") -> int:
+    read = 0
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        # The decoder drops non-key frames itself, so they are never reconstructed
+        stream.codec_context.skip_frame = "NONKEY"
+        if start > 0:
+            container.seek(int(start / stream.time_base), stream=stream, backward=True)
+        for frame in container.decode(stream):
+            ts = float(frame.time or 0.0)
+            if ts < start:
+                continue
+            if end is not None and ts >= end:
+                break
+            read += 1
+            out.put((segment, ts, _shrink(frame.to_ndarray(format="bgr24"), imgsz)))
+    return read
+
+
+def decode_segment(path: str, segment: int, start: float, end: Optional[float], sample_fps: float,
+                   keyframes: bool, imgsz: int, out: "mp.Queue") -> None:
+    """Decoder process body: puts (segment, video_time, frame) then (segment, None, frames_read)."""
+    read = 0
+    try:
+        if keyframes:
+            read = _decode_keyframes(path, segment, start, end, imgsz, out)
+        else:
+            read = _decode_sampled(path, segment, start, end, sample_fps, imgsz, out)
+    except Exception as e:
+        print(f"❌ Decoder for segment {segment} failed: {e}")
+    finally:
+        out.put((segment, None, read))
+
+
+def merge_tracking(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-segment tracker summaries into one."""
+    individuals: Dict[str, int] = defaultdict(int)
+    dwell: Dict[str, float] = defaultdict(float)
+    active = 0
+    for s in summaries:
+        active += s["active_tracks"]
+        for sp in s["by_species"]:
+            individuals[sp["animal"]] += sp["individuals"]
+            dwell[sp["animal"]] += sp["total_dwell_seconds"]
+    return {
+        "unique_individuals": sum(individuals.values()),
+        "active_tracks": active,
+        "by_species": [
+            {
+                "animal": name,
+                "individuals": count,
+                "total_dwell_seconds": round(dwell[name], 2),
+                "mean_dwell_seconds": round(dwell[name] / count, 2) if count else 0.0,
+            }
+            for name, count in sorted(individuals.items(), key=lambda x: x[1], reverse=True)
+        ],
+    }
+
+
+def run_video_file(
+    args: Any,
+    model: Any,
+    class_names: Dict[int, str],
+    detection_filter: DetectionFilter,
+    event_log: EventLog,
+    aggregates: SessionAggregates,
+    tracker_factory: Optional[Callable[[], Tracker]] = None,
+    tiler: Optional[TiledDetector] = None,
+    roi: Optional[RegionOfInterest] = None,
+) -> None:
+    """
+    Run detection over ``args.video`` and fold the results into ``aggregates``.
+
+    Args:
+        args: parsed webcam.py arguments (video, sample_fps, keyframes, segments, batch, conf)
+        tracker_factory: builds one tracker per segment when tracking is enabled
+        tiler: sliced inference per frame; frames then stay at full resolution
+        roi: crop each frame to the camera's ROI and drop detections outside it
+    """
+    if args.keyframes and not _av_ok:
+        raise RuntimeError("--keyframes needs PyAV (pip install av)")
+    fps, duration = probe_video(args.video)
+    segments = max(1, args.segments) if duration > 0 else 1
+    seg_len = duration / segments if duration > 0 else None
+    mode = "keyframes" if args.keyframes else f"{args.sample_fps} fps"
+    print(f"🎞️ {args.video}: {duration:.1f}s at {fps:.1f} fps, {segments} segment(s), sampling {mode}")
+
+    frames_q: "mp.Queue" = mp.Queue(maxsize=max(4, args.batch * 4))
+    # Tiling and pixel-space ROIs need the full-resolution frame; otherwise shrink before the process hop
+    full_res = tiler is not None or (roi is not None and not roi.normalized)
+    shrink_to = 0 if full_res else args.imgsz
+    workers = []
+    for seg in range(segments):
+        start = seg * seg_len if seg_len else 0.0
+        end = (seg + 1) * seg_len if seg_len and seg < segments - 1 else None
+        p = mp.Process(
+            target=decode_segment,
+            args=(args.video, seg, start, end, args.sample_fps, args.keyframes, shrink_to, frames_q),
+            daemon=True,
+        )
+        p.start()
+        workers.append(p)
+
+    trackers = {seg: tracker_factory() for seg in range(segments)} if tracker_factory else {}
+    name_to_id = {v: k for k, v in class_names.items()}
+    animal_detections = aggregates.animal_detections
+    max_detection_count = 0
+    last_max_animal = ""
+    finished = 0
+    source_frames = 0
+    start_time = time.time()
+    last_report = start_time
+    last_checkpoint = start_time
+
+    while finished < segments:
+        batch: List[Tuple[int, float, np.ndarray]] = []
+        try:
+            item = frames_q.get(timeout=1.0)
+        except queue.Empty:
+            if not any(p.is_alive() for p in workers) and frames_q.empty():
+                break
+            continue
+        while True:
+            seg, ts, payload = item
+            if ts is None:
+                finished += 1
+                source_frames += int(payload)
+            else:
+                batch.append(item)
+            if len(batch) >= args.batch or finished >= segments:
+                break
+            try:
+                item = frames_q.get_nowait()
+            except queue.Empty:
+                break
+        if not batch:
+            continue
+
+        frames = [f for _, _, f in batch]
+        inputs = [roi.crop(f)[0] for f in frames] if roi is not None else frames
+        if tiler is not None:
+            detections = [detection_filter(*tiler(model, f, args.conf, detection_filter.class_ids.tolist()))
+                          for f in inputs]
+        else:
+            detections = detect_frames(model, inputs, detection_filter, args.conf, args.imgsz)
+        if roi is not None:
+            detections = [roi.to_frame(*d, f.shape) for d, f in zip(detections, frames)]
+        aggregates.processed_frames += len(batch)
+        for (seg, ts, _), (xyxy, confs, class_ids) in zip(batch, detections):
+            tracker = trackers.get(seg)
+            if tracker is not None:
+                # Video time drives track ageing and dwell, independent of decode speed
+                _, track_events = tracker.update(xyxy, confs, class_ids, class_names, ts=ts)
+                frame_counts: Dict[int, int] = defaultdict(int)
+                frame_best_conf: Dict[int, float] = {}
+                for e in track_events:
+                    e.update({"video_time": round(e["timestamp"], 2), "segment": seg, "timestamp": time.time()})
+                    event_log.append(e)
+                    if e["event"] == "track_started":
+                        cid = name_to_id[e["animal"]]
+                        frame_counts[cid] += 1
+                        frame_best_conf[cid] = max(frame_best_conf.get(cid, 0.0), e["confidence"])
+            elif class_ids.size:
+                frame_counts = class_counts(class_ids)
+                frame_best_conf = class_max_conf(confs, class_ids)
+            else:
+                continue
+            for class_id, count in frame_counts.items():
+                animal_name = class_names[class_id]
+                animal_detections[animal_name] += count
+                if animal_detections[animal_name] > max_detection_count:
+                    max_detection_count = animal_detections[animal_name]
+                    if last_max_animal != animal_name:
+                        last_max_animal = animal_name
+                        event_log.append({
+                            "event": "new_top_detection",
+                            "timestamp": time.time(),
+                            "video_time": round(ts, 2),
+                            "animal": animal_name,
+                            "detection_count": max_detection_count,
+                            "confidence": frame_best_conf[class_id],
+                        })
+
+        now = time.time()
+        if now - last_checkpoint >= 5.0:
+            event_log.checkpoint()
+            last_checkpoint = now
+        if now - last_report >= 5.0:
+            rate = aggregates.processed_frames / (now - start_time)
+            print(f"⏩ {aggregates.processed_frames} frames sampled ({rate:.1f} frames/sec), {dict(animal_detections)}")
+            last_report = now
+
+    for p in workers:
+        p.join(timeout=5)
+    aggregates.frame_count = max(source_frames, aggregates.processed_frames)
+    if trackers:
+        for seg, tracker in trackers.items():
+            for e in tracker.flush():
+                e.update({"video_time": round(e["timestamp"], 2), "segment": seg, "timestamp": time.time()})
+                event_log.append(e)
+        aggregates.tracking = merge_tracking([t.summary() for t in trackers.values()])
+    elapsed = time.time() - start_time
+    print(f"✅ Processed {aggregates.processed_frames} sampled frames from {aggregates.frame_count} "
+          f"in {elapsed:.1f}s ({aggregates.processed_frames / elapsed if elapsed > 0 else 0:.1f} frames/sec)")
@@ -1,12 +1,24 @@
 import cv2
-import torch
-from ultralytics import YOLO
 import time
 from collections import defaultdict
 import os
 import json
 import signal
 import sys
+import argparse
+
+from postprocess import DetectionFilter, result_arrays, class_counts, class_max_conf, EMPTY_XYXY, EMPTY_CONF, EMPTY_CLS
+from tracker import Tracker
+from event_log import EventLog, SessionAggregates, build_output
+from control import ControlChannel
+from instrumentation import StageTimings
+from model_manager import ModelSwapper, AVAILABLE_MODELS
+from video_file import run_video_file
+from tiling import TiledDetector, tile_grid
+from roi import RegionOfInterest, load_camera_config
+from detection_profile import load_profile
+from clips import ClipRecorder
+from shm_ring import FrameRing
 
 # Fix Qt display issues for different display servers
 import os
@@ -15,26 +27,13 @@ os.environ['QT_QPA_PLATFORM'] = 'xcb'
 # Alternative: disable Qt plugins entirely
 os.environ['QT_LOGGING_RULES'] = 'qt5ct.debug=false'
 
-# Animal classes in COCO dataset - CORRECTED MAPPING
-ANIMAL_CLASSES = {
-    15: 'cat', 16: 'dog', 17: 'horse', 18: 'sheep', 19: 'cow',  # Fixed: 15=cat, 16=dog
-    20: 'elephant', 21: 'bear', 22: 'zebra', 23: 'giraffe'
-    # Note: Class 24 is 'backpack', not an animal - removed lion
-}
-
-# Colors for different animal classes - CORRECTED
-COLORS = {
-    15: (0, 0, 255),    # Cat - red  
-    16: (255, 0, 0),    # Dog - blue
-    17: (0, 255, 255),  # Horse - yellow
-    18: (255, 0, 255),  # Sheep - magenta
-    19: (255, 255, 0),  # Cow - cyan
-    20: (0, 165, 255),  # Elephant - orange
-    21: (128, 0, 128),  # Bear - purple
-    22: (0, 255, 0),    # Zebra - green
-    23: (255, 165, 0),  # Giraffe - orange-red
-    # Removed class 24 (backpack) as it's not an animal
-}
+# Classes, colors and per-class thresholds come from the shared detection profile
+# (detection/profiles/coco_animals.json by default, or $DETECTION_PROFILE)
+PROFILE = load_profile()
+ANIMAL_CLASSES = PROFILE.names
+COLORS = PROFILE.colors
+# Classes with their own minimum confidence (cats and dogs are frequent false positives)
+HIGH_CONF_CLASSES = PROFILE.thresholds
 
 def check_camera_availability():
     """Check if camera devices are available"""
@@ -43,114 +42,154 @@ def check_camera_availability():
     print(f"Available video devices: {video_devices}")
     return len(video_devices) > 0
 
-def save_json_output(output_file, detection_events, start_time, animal_detections, frame_count, processed_frames, confidence_threshold):
-    """Save the JSON output file"""
+def save_json_output(output_file, event_log, aggregates, tracker=None):
+    """Save the JSON output file from the running aggregates"""
     try:
-        # Create final summary
-        total_time = time.time() - start_time
+        if tracker is not None:
+            for event in tracker.flush():
+                event_log.append(event)
+            aggregates.tracking = tracker.summary()
         
-        # Create comprehensive JSON summary
-        summary_json = {
-            "event": "final_summary",
-            "timestamp": time.time(),
-            "session_stats": {
-                "total_time_seconds": round(total_time, 2),
-                "total_frames": frame_count,
-                "processed_frames": processed_frames,
-                "average_fps": round(processed_frames/total_time, 1) if total_time > 0 else 0,
-                "confidence_threshold": confidence_threshold
-            }
-        }
+        # Final summary is computed from running counters, not from stored events
+        summary_json = aggregates.final_summary()
+        detection_results = summary_json["detection_results"]
+        most_detected = detection_results["most_detected_animal"]
         
-        # Add detection results
-        if animal_detections:
-            most_detected = max(animal_detections.items(), key=lambda x: x[1])
-            total_detections = sum(animal_detections.values())
-            
-            # Create sorted list of all detections with percentages
-            all_detections = []
-            for animal, count in sorted(animal_detections.items(), key=lambda x: x[1], reverse=True):
-                percentage = round((count/total_detections)*100, 1)
-                all_detections.append({
-                    "animal": animal,
-                    "count": count,
-                    "percentage": percentage
-                })
-            
-            summary_json["detection_results"] = {
-                "total_detections": total_detections,
-                "most_detected_animal": {
-                    "animal": most_detected[0],
-                    "count": most_detected[1],
-                    "percentage": round((most_detected[1]/total_detections)*100, 1)
-                },
-                "all_animals": all_detections
-            }
-            
-            # Print summary to terminal
-            print(f"\n=== Detection Summary ===")
-            print(f"🏆 MOST DETECTED ANIMAL: {most_detected[0].upper()} ({most_detected[1]} times)")
-            print(f"📊 This represents {(most_detected[1]/total_detections)*100:.1f}% of all detections")
+        # Print summary to terminal
+        print(f"\n=== Detection Summary ===")
+        if most_detected:
+            print(f"🏆 MOST DETECTED ANIMAL: {most_detected['animal'].upper()} ({most_detected['count']} times)")
+            print(f"📊 This represents {most_detected['percentage']:.1f}% of all detections")
         else:
-            summary_json["detection_results"] = {
-                "total_detections": 0,
-                "most_detected_animal": None,
-                "all_animals": []
-            }
-            print(f"\n=== Detection Summary ===")
             print("❌ No animals were detected during the session")
         
-        # Add final summary to events
-        detection_events.append(summary_json)
+        # Log the summary too, so output.json can be rebuilt from the log alone
+        event_log.append(summary_json)
+        event_log.checkpoint()
         
-        # Save all events to JSON file
+        # Save recent events plus the summary to JSON file
         with open(output_file, 'w') as f:
-            json.dump({
-                "session_info": {
-                    "start_time": start_time,
-                    "end_time": time.time(),
-                    "total_events": len(detection_events)
-                },
-                "events": detection_events
-            }, f, indent=2)
-        print(f"✅ Complete detection data saved to: {output_file}")
+            json.dump(build_output(aggregates, list(event_log.recent), summary_json), f, indent=2)
+        print(f"✅ Detection summary saved to: {output_file} (full event log: {event_log.path})")
         return True
     except Exception as e:
         print(f"❌ Error saving JSON file: {e}")
         # Fallback: print to terminal
         print("Fallback - JSON data:")
-        print(json.dumps(detection_events, indent=2))
+        print(json.dumps(aggregates.to_dict(), indent=2))
         return False
 
-def main():
+def _write_ring(ring, frame, dets, frame_index, detected):
+    """Copy a raw frame and its (possibly carried-over) detections into the shared-memory ring."""
+    xyxy, confs, class_ids, track_ids = dets
+    try:
+        ring.write(frame, xyxy, confs, class_ids, track_ids, frame_index=frame_index, detected=detected)
+    except ValueError as e:
+        # Camera changed resolution after the ring was sized
+        print(f"⚠️ Shared-memory ring: {e}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Webcam animal detection with YOLOv8")
+    parser.add_argument("--track", action="store_true",
+                        help="Track individuals so counts reflect unique animals instead of frame hits")
+    parser.add_argument("--track-high-conf", type=float, default=0.6,
+                        help="Confidence needed to start a track; weaker boxes only extend existing tracks")
+    parser.add_argument("--track-min-hits", type=int, default=3,
+                        help="Matches before a track counts as an individual")
+    parser.add_argument("--track-max-age", type=float, default=2.0,
+                        help="Seconds a track survives without a match")
+    parser.add_argument("--log-dir", default=None,
+                        help="Directory for the streaming NDJSON event log (default: detection/logs)")
+    parser.add_argument("--log-max-mb", type=float, default=8.0,
+                        help="Rotate the event log after this many megabytes")
+    parser.add_argument("--log-backups", type=int, default=5,
+                        help="Rotated event log files to keep")
+    parser.add_argument("--log-fsync", type=float, default=2.0,
+                        help="Seconds between fsyncs of the event log")
+    parser.add_argument("--headless", action="store_true",
+                        help="Skip drawing and display; control via signals or the control socket")
+    parser.add_argument("--control-port", type=int, default=None,
+                        help="Serve the local control socket on 127.0.0.1:PORT")
+    parser.add_argument("--timings-window", type=int, default=300,
+                        help="Recent samples per stage used for timing percentiles")
+    parser.add_argument("--timings-interval", type=float, default=30.0,
+                        help="Seconds between pipeline_timings events in the event log")
+    parser.add_argument("--conf", type=float, default=0.5,
+                        help="Initial confidence threshold")
+    parser.add_argument("--camera-id", default="local_webcam",
+                        help="Camera key in the camera config (ROI polygons)")
+    parser.add_argument("--camera-config", default=None,
+                        help="Camera config JSON (default: $CAMERA_CONFIG or detection/cameras.json)")
+    parser.add_argument("--tiles", action="store_true",
+                        help="Sliced inference over overlapping tiles for small, distant animals")
+    parser.add_argument("--tile-size", type=int, default=640,
+                        help="Tile side in pixels")
+    parser.add_argument("--tile-overlap", type=float, default=0.2,
+                        help="Fraction of each tile shared with its neighbours")
+    clips = parser.add_argument_group("event clips")
+    clips.add_argument("--clips-dir", default=None,
+                       help="Save pre/post-event clips of detections to this directory")
+    clips.add_argument("--clip-pre", type=float, default=5.0,
+                       help="Seconds of footage kept before a detection")
+    clips.add_argument("--clip-post", type=float, default=10.0,
+                       help="Seconds recorded after the last detection")
+    clips.add_argument("--clip-buffer-mb", type=float, default=64.0,
+                       help="Memory cap of the pre-roll buffer")
+    clips.add_argument("--clip-disk-mb", type=float, default=2048.0,
+                       help="Oldest clips are deleted beyond this total size")
+    parser.add_argument("--shm", default=None,
+                        help="Publish raw frames and detections to this shared-memory ring (read by the backend)")
+    parser.add_argument("--shm-slots", type=int, default=4,
+                        help="Frames held in the shared-memory ring")
+    video = parser.add_argument_group("video file mode")
+    video.add_argument("--video", default=None,
+                       help="Run over a recorded video file instead of a live camera")
+    video.add_argument("--sample-fps", type=float, default=2.0,
+                       help="Frames per second of video time to run detection on (0 = every frame)")
+    video.add_argument("--keyframes", action="store_true",
+                       help="Detect on keyframes only (needs PyAV)")
+    video.add_argument("--segments", type=int, default=1,
+                       help="Split the video into this many segments decoded concurrently")
+    video.add_argument("--batch", type=int, default=8,
+                       help="Frames per batched model call")
+    video.add_argument("--imgsz", type=int, default=640,
+                       help="Inference size; sampled frames are shrunk to it in the decoder")
+    return parser.parse_args(argv)
+
+def main(args=None):
+    args = args or parse_args()
     # Check camera availability first
-    if not check_camera_availability():
+    if not args.video and not check_camera_availability():
         print("Warning: No video devices found!")
     # Initialize JSON output file
     script_dir = os.path.dirname(os.path.abspath(__file__))
     output_file = os.path.join(script_dir, "output.json")
-    detection_events = []
+    log_dir = args.log_dir or os.path.join(script_dir, "logs")
+    # Events stream to disk as they happen; only a bounded tail stays in memory
+    event_log = EventLog(
+        log_dir,
+        max_bytes=int(args.log_max_mb * 1024 * 1024),
+        backups=args.log_backups,
+        fsync_interval=args.log_fsync,
+    )
+    aggregates = SessionAggregates(confidence_threshold=args.conf)
     
     print(f"JSON output will be saved to: {output_file}")
+    print(f"Event log: {event_log.path}")
     
     # Global variables for signal handler
-    global global_detection_events, global_start_time, global_animal_detections
-    global global_frame_count, global_processed_frames, global_confidence_threshold, global_output_file
+    global global_event_log, global_aggregates, global_output_file, global_tracker
     
-    global_detection_events = detection_events
-    global_start_time = 0
-    global_animal_detections = defaultdict(int)
-    global_frame_count = 0
-    global_processed_frames = 0
-    global_confidence_threshold = 0.5
+    global_event_log = event_log
+    global_aggregates = aggregates
     global_output_file = output_file
+    global_tracker = None
     
     # Signal handler for Ctrl+C
     def signal_handler(sig, frame):
         print('\n🛑 Ctrl+C detected! Saving results and exiting...')
-        save_json_output(global_output_file, global_detection_events, global_start_time, 
-                        global_animal_detections, global_frame_count, global_processed_frames, 
-                        global_confidence_threshold)
+        save_json_output(global_output_file, global_event_log, global_aggregates, global_tracker)
+        global_event_log.close()
         if 'cap' in locals() or 'cap' in globals():
             try:
                 cap.release()
@@ -164,16 +203,37 @@ def main():
     
     # Load YOLOv8 model - using larger model for better accuracy
     print("Loading YOLOv8 model (yolov8s.pt)...")
+    # Later switches load and warm up in the background, then swap in atomically
+    models = ModelSwapper(AVAILABLE_MODELS)
     try:
-        model = YOLO('yolov8s.pt')
-        # Warm up the model with higher resolution
-        model(torch.zeros(1, 3, 640, 640).cpu(), verbose=False)
+        models.load('yolov8s.pt')
         
     except Exception as e:
         print(f"Error loading model: {e}")
         print("Make sure you have installed: pip install ultralytics opencv-python")
         return
 
+    if args.video:
+        # Offline file mode: same aggregates, event log and output.json as the live loop
+        event_log.start_session(aggregates)
+        tracker_factory = None
+        if args.track:
+            tracker_factory = lambda: Tracker(
+                high_threshold=args.track_high_conf,
+                min_hits=args.track_min_hits,
+                max_age_seconds=args.track_max_age,
+            )
+        run_video_file(
+            args, models.model, ANIMAL_CLASSES,
+            DetectionFilter(ANIMAL_CLASSES.keys(), HIGH_CONF_CLASSES),
+            event_log, aggregates, tracker_factory,
+            tiler=TiledDetector(args.tile_size, args.tile_overlap) if args.tiles else None,
+            roi=RegionOfInterest.for_camera(args.camera_id, load_camera_config(args.camera_config)),
+        )
+        save_json_output(output_file, event_log, aggregates)
+        event_log.close()
+        return
+
     # Open webcam with better error handling
     print("Attempting to open webcam...")
     
@@ -222,113 +282,188 @@ def main():
         return
 
     print("Webcam Animal Detection Started!")
-    print("Press 'q' to quit")
-    print("Press 'p' to pause/resume")
-    print("Press 'c' to change confidence threshold")
-    print("Press 'm' to cycle through models (n/s/m/l)")
+    control = ControlChannel()
+    if args.headless:
+        # No window and no keyboard: commands come from signals and the control socket
+        control.install_signal_handlers()
+        print("Headless mode: send SIGTERM to stop, SIGUSR1 to pause/resume, SIGUSR2 for status")
+    else:
+        signal.signal(signal.SIGTERM, signal_handler)
+        print("Press 'q' to quit")
+        print("Press 'p' to pause/resume")
+        print("Press 'c' to change confidence threshold")
+        print("Press 'm' to cycle through models (n/s/m/l)")
+    if args.control_port:
+        control.serve(port=args.control_port)
     
     # Configuration
-    confidence_threshold = 0.5  # Increased from 0.4 for better accuracy
+    confidence_threshold = args.conf  # 0.5 by default, increased from 0.4 for better accuracy
     frame_skip = 2  # Process every 2nd frame for better performance
     paused = False
-    available_models = ['yolov8n.pt', 'yolov8s.pt', 'yolov8m.pt', 'yolov8l.pt']
-    current_model_idx = 1  # Start with yolov8s.pt
+    
+    detection_filter = DetectionFilter(ANIMAL_CLASSES.keys(), HIGH_CONF_CLASSES)
+    # Crop to the camera's ROI before inference and drop detections outside its polygons
+    roi = RegionOfInterest.for_camera(args.camera_id, load_camera_config(args.camera_config))
+    if roi is not None:
+        print(f"ROI: {len(roi.polygons)} polygon(s) configured for {args.camera_id}")
+    tiler = None
+    if args.tiles:
+        # Tile geometry is cached per resolution; tiles go through the model as one batch
+        tiler = TiledDetector(args.tile_size, args.tile_overlap)
+        frame_w, frame_h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        grid = tile_grid(frame_w, frame_h, args.tile_size, args.tile_overlap)
+        print(f"Tiled inference: {len(grid)} tiles of {args.tile_size}px per {frame_w}x{frame_h} frame")
+    tracker = None
+    if args.track:
+        tracker = Tracker(
+            high_threshold=args.track_high_conf,
+            min_hits=args.track_min_hits,
+            max_age_seconds=args.track_max_age,
+        )
+        print("Tracking enabled: counts are unique individuals")
+    name_to_id = {v: k for k, v in ANIMAL_CLASSES.items()}
+    clips = None
+    if args.clips_dir:
+        # Encoded frames go to a bounded ring buffer; clips are written on a background thread
+        clips = ClipRecorder(
+            args.clips_dir,
+            camera=args.camera_id,
+            pre_seconds=args.clip_pre,
+            post_seconds=args.clip_post,
+            max_buffer_bytes=int(args.clip_buffer_mb * 1024 * 1024),
+            max_disk_bytes=int(args.clip_disk_mb * 1024 * 1024),
+        )
+        print(f"Event clips: {args.clip_pre}s before / {args.clip_post}s after detections -> {args.clips_dir}")
+    ring = None
+    last_ring_dets = (EMPTY_XYXY, EMPTY_CONF, EMPTY_CLS, None)
+    last_ring_status = 0.0
+    if args.shm:
+        # This process owns camera and model; the backend streams and summarises from the ring
+        frame_w, frame_h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        ring = FrameRing.create(args.shm, frame_w, frame_h, slots=args.shm_slots)
+        print(f"Shared-memory ring '{args.shm}': {args.shm_slots} x {frame_w}x{frame_h} frames")
     
     # For statistics
     start_time = time.time()
     frame_count = 0
     processed_frames = 0
-    animal_detections = defaultdict(int)
+    aggregates.start_time = start_time
+    aggregates.confidence_threshold = confidence_threshold
+    animal_detections = aggregates.animal_detections
     fps_history = []
     last_max_animal = ""
     max_detection_count = 0
     last_status_print = time.time()
+    checkpoint_interval = 5.0
+    last_checkpoint = time.time()
+    event_log.start_session(aggregates)
+    # Rolling per-stage latency percentiles, emitted to the event log periodically
+    timings = StageTimings(window=args.timings_window)
+    last_timings_event = time.time()
     
     # Update global variables for signal handler
-    global_start_time = start_time
-    global_animal_detections = animal_detections
-    global_confidence_threshold = confidence_threshold
+    global_tracker = tracker
     
-    while True:
+    running = True
+    while running:
         if not paused:
+            timings.start_lap()
             ret, frame = cap.read()
             if not ret:
                 print("Error: Could not read frame from webcam")
                 break
+            timings.lap("capture")
             frame_count += 1
+            if clips is not None:
+                # Buffer the clean frame before boxes are drawn on it
+                clips.add_frame(frame)
             
-            # Update global variables for signal handler
-            global_frame_count = frame_count
-            global_processed_frames = processed_frames
+            # Keep running totals current for checkpoints and the signal handler
+            aggregates.frame_count = frame_count
+            aggregates.processed_frames = processed_frames
             # Only process every nth frame
             if frame_count % frame_skip == 0:
                 processed_frames += 1
                 # Perform detection with higher image size for better accuracy
-                results = model(
-                    frame, 
-                    conf=confidence_threshold, 
-                    classes=list(ANIMAL_CLASSES.keys()), 
-                    verbose=False,
-                    imgsz=640  # Higher resolution for better accuracy
-                )
-                # Process detections
-                for result in results:
-                    boxes = result.boxes
-                    if boxes is not None:
-                        for box in boxes:
-                            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-                            confidence = box.conf[0].cpu().numpy()
-                            class_id = int(box.cls[0].cpu().numpy())
-                            if class_id in ANIMAL_CLASSES:
-                                animal_name = ANIMAL_CLASSES[class_id]
-                                
-                                # Additional confidence filtering for cats and dogs
-                                if (class_id == 15 or class_id == 16) and confidence < 0.6:
-                                    continue  # Skip low-confidence cat/dog detections
-                                
-                                animal_detections[animal_name] += 1
-                                
-                                # Check if this is now the most detected animal and save to JSON
-                                if animal_detections[animal_name] > max_detection_count:
-                                    max_detection_count = animal_detections[animal_name]
-                                    if last_max_animal != animal_name:
-                                        last_max_animal = animal_name
-                                        # Create JSON for new top detection
-                                        new_top_json = {
-                                            "event": "new_top_detection",
-                                            "timestamp": time.time(),
-                                            "animal": animal_name,
-                                            "detection_count": max_detection_count,
-                                            "confidence": float(confidence)
-                                        }
-                                        detection_events.append(new_top_json)
-                                        print(f"🏆 NEW TOP DETECTION: {animal_name} (detected {max_detection_count} times)")
-                                
-                                # Get color for this animal
-                                color = COLORS.get(class_id, (0, 255, 0))
-                                # Draw bounding box
-                                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                                # Draw label with class ID for verification
-                                if (class_id == 15 or class_id == 16):
-                                    label = f"{animal_name}: {confidence:.2f} [HIGH-CONF]"
-                                else:
-                                    label = f"{animal_name}: {confidence:.2f}"
-                                (text_width, text_height), _ = cv2.getTextSize(
-                                    label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-                                )
-                                # Draw background for text
-                                cv2.rectangle(
-                                    frame, 
-                                    (x1, y1 - text_height - 10), 
-                                    (x1 + text_width, y1), 
-                                    color, 
-                                    -1
-                                )
-                                # Draw text
-                                cv2.putText(
-                                    frame, label, (x1, y1 - 5), 
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2
-                                )
+                model_start = time.perf_counter()
+                infer_frame = roi.crop(frame)[0] if roi is not None else frame
+                if tiler is not None:
+                    # Tiles plus cross-tile merge count as inference
+                    detections = [tiler(models.model, infer_frame, confidence_threshold, ANIMAL_CLASSES.keys())]
+                    timings.record("inference", time.perf_counter() - model_start)
+                    model_post = 0.0
+                else:
+                    results = models.model(
+                        infer_frame, 
+                        conf=confidence_threshold, 
+                        classes=list(ANIMAL_CLASSES.keys()), 
+                        verbose=False,
+                        imgsz=640  # Higher resolution for better accuracy
+                    )
+                    model_post = timings.record_model_speed(
+                        getattr(results[0], 'speed', None) if len(results) else None,
+                        time.perf_counter() - model_start,
+                    )
+                    detections = [result_arrays(result) for result in results]
+                post_start = time.perf_counter()
+                if roi is not None:
+                    detections = [roi.to_frame(*arrays, frame.shape) for arrays in detections]
+                # Process detections: one host copy per result, array masks for filtering
+                draw_boxes = []
+                ring_dets = []
+                for arrays in detections:
+                    xyxy, confs, class_ids = detection_filter(*arrays)
+                    if clips is not None and class_ids.size:
+                        best = int(confs.argmax())
+                        clips.trigger(ANIMAL_CLASSES[int(class_ids[best])], confidence=round(float(confs[best]), 3))
+                    track_ids = None
+                    if tracker is not None:
+                        # Tracker must see empty frames too so idle tracks expire
+                        track_ids, track_events = tracker.update(xyxy, confs, class_ids, ANIMAL_CLASSES)
+                        for event in track_events:
+                            event_log.append(event)
+                        # Count each individual once, when its track is confirmed
+                        started = [e for e in track_events if e["event"] == "track_started"]
+                        frame_counts = defaultdict(int)
+                        frame_best_conf = {}
+                        for e in started:
+                            cid = name_to_id[e["animal"]]
+                            frame_counts[cid] += 1
+                            frame_best_conf[cid] = max(frame_best_conf.get(cid, 0.0), e["confidence"])
+                    elif class_ids.size:
+                        frame_counts = class_counts(class_ids)
+                        frame_best_conf = class_max_conf(confs, class_ids)
+                    else:
+                        continue
+                    if ring is not None and class_ids.size:
+                        ring_dets.append((xyxy, confs, class_ids, track_ids))
+                    for class_id, count in frame_counts.items():
+                        animal_name = ANIMAL_CLASSES[class_id]
+                        animal_detections[animal_name] += count
+                        
+                        # Check if this is now the most detected animal and save to JSON
+                        if animal_detections[animal_name] > max_detection_count:
+                            max_detection_count = animal_detections[animal_name]
+                            if last_max_animal != animal_name:
+                                last_max_animal = animal_name
+                                # Create JSON for new top detection
+                                new_top_json = {
+                                    "event": "new_top_detection",
+                                    "timestamp": time.time(),
+                                    "animal": animal_name,
+                                    "detection_count": max_detection_count,
+                                    "confidence": frame_best_conf[class_id]
+                                }
+                                event_log.append(new_top_json)
+                                print(f"🏆 NEW TOP DETECTION: {animal_name} (detected {max_detection_count} times)")
+                    
+                    if not args.headless:
+                        ids_list = track_ids.tolist() if track_ids is not None else [-1] * len(class_ids)
+                        draw_boxes.extend(zip(xyxy.tolist(), confs.tolist(), class_ids.tolist(), ids_list))
+                if ring is not None:
+                    # Raw frame before any drawing; skipped frames reuse these boxes below
+                    last_ring_dets = ring_dets[-1] if ring_dets else (EMPTY_XYXY, EMPTY_CONF, EMPTY_CLS, None)
+                    _write_ring(ring, frame, last_ring_dets, frame_count, detected=True)
                 # Calculate FPS
                 elapsed_time = time.time() - start_time
                 current_fps = processed_frames / elapsed_time if elapsed_time > 0 else 0
@@ -354,87 +489,185 @@ def main():
                         },
                         "all_detections": dict(animal_detections)
                     }
-                    detection_events.append(status_json)
+                    event_log.append(status_json)
                     print(f"📊 Current Leader: {most_detected[0]} ({most_detected[1]}/{total_detections} detections)")
                     last_status_print = current_time
                 
-                # Display FPS
-                cv2.putText(
-                    frame, f"FPS: {avg_fps:.1f}", (10, 30), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2
-                )
-                # Display confidence threshold and current model
-                cv2.putText(
-                    frame, f"Conf: {confidence_threshold} | Model: {available_models[current_model_idx]}", (10, 60), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2
-                )
-                # Display detection status
-                status = "PAUSED" if paused else "LIVE"
-                cv2.putText(
-                    frame, f"Status: {status}", (10, 90), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255) if paused else (0, 255, 0), 2
-                )
-                # Display animal detection counts (top 3)
-                sorted_animals = sorted(animal_detections.items(), key=lambda x: x[1], reverse=True)[:3]
-                y_offset = 120
-                for animal, count in sorted_animals:
+                # Checkpoint running totals so a crash loses at most a few seconds
+                if current_time - last_checkpoint >= checkpoint_interval:
+                    if tracker is not None:
+                        aggregates.tracking = tracker.summary()
+                    event_log.checkpoint()
+                    last_checkpoint = current_time
+                    stage_p50 = {stage: s["p50_ms"] for stage, s in timings.snapshot().items()}
+                    if args.headless:
+                        print(f"⏱️ FPS {avg_fps:.1f} | stage p50 ms {stage_p50}")
+                    control.publish(
+                        fps=round(avg_fps, 1),
+                        frames=frame_count,
+                        processed_frames=processed_frames,
+                        detections=dict(animal_detections),
+                        stage_timings=timings.snapshot(),
+                    )
+                if current_time - last_timings_event >= args.timings_interval:
+                    event_log.append(timings.event())
+                    last_timings_event = current_time
+                timings.record("postprocess", model_post + time.perf_counter() - post_start)
+                timings.start_lap()
+                
+                if not args.headless:
+                    for (x1, y1, x2, y2), confidence, class_id, track_id in draw_boxes:
+                        animal_name = ANIMAL_CLASSES[class_id]
+                        if track_id >= 0:
+                            animal_name = f"{animal_name} #{track_id}"
+                        # Get color for this animal
+                        color = PROFILE.color(class_id)
+                        # Draw bounding box
+                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                        # Draw label with class ID for verification
+                        if class_id in HIGH_CONF_CLASSES:
+                            label = f"{animal_name}: {confidence:.2f} [HIGH-CONF]"
+                        else:
+                            label = f"{animal_name}: {confidence:.2f}"
+                        (text_width, text_height), _ = cv2.getTextSize(
+                            label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
+                        )
+                        # Draw background for text
+                        cv2.rectangle(
+                            frame, 
+                            (x1, y1 - text_height - 10), 
+                            (x1 + text_width, y1), 
+                            color, 
+                            -1
+                        )
+                        # Draw text
+                        cv2.putText(
+                            frame, label, (x1, y1 - 5), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2
+                        )
+                    if roi is not None:
+                        roi.draw(frame)
+                    # Display FPS
+                    cv2.putText(
+                        frame, f"FPS: {avg_fps:.1f}", (10, 30), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2
+                    )
+                    # Display confidence threshold and current model (plus any model loading in the background)
+                    loading = models.status()['loading']
+                    model_label = f"{models.name} -> {loading}" if loading else models.name
+                    cv2.putText(
+                        frame, f"Conf: {confidence_threshold} | Model: {model_label}", (10, 60), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2
+                    )
+                    # Display detection status
+                    status = "PAUSED" if paused else "LIVE"
                     cv2.putText(
-                        frame, f"{animal}: {count}", (10, y_offset), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2
+                        frame, f"Status: {status}", (10, 90), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255) if paused else (0, 255, 0), 2
                     )
-                    y_offset += 25
-            # Display frame and handle keyboard input
+                    # Display animal detection counts (top 3)
+                    sorted_animals = sorted(animal_detections.items(), key=lambda x: x[1], reverse=True)[:3]
+                    y_offset = 120
+                    for animal, count in sorted_animals:
+                        cv2.putText(
+                            frame, f"{animal}: {count}", (10, y_offset), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2
+                        )
+                        y_offset += 25
+                    timings.lap("draw")
+            elif ring is not None:
+                _write_ring(ring, frame, last_ring_dets, frame_count, detected=False)
+            if ring is not None and time.time() - last_ring_status >= 1.0:
+                last_ring_status = time.time()
+                ring.write_status({
+                    "timestamp": last_ring_status,
+                    "start_time": start_time,
+                    "camera": args.camera_id,
+                    "frames": frame_count,
+                    "processed_frames": processed_frames,
+                    "fps": round(sum(fps_history) / len(fps_history), 1) if fps_history else 0.0,
+                    "detections": dict(animal_detections),
+                    "tracking": tracker.summary() if tracker is not None else None,
+                    "confidence_threshold": confidence_threshold,
+                    "model": models.name,
+                })
+        
+        # Commands from the control socket / signals, then the keyboard in windowed mode
+        commands = control.drain()
+        if not args.headless:
             try:
-                cv2.imshow('Webcam Animal Detection', frame)
+                if not paused:
+                    cv2.imshow('Webcam Animal Detection', frame)
                 key = cv2.waitKey(1) & 0xFF
             except cv2.error as e:
                 print(f"Display error: {e}")
-                print("OpenCV display failed. Consider using a different display method.")
+                print("OpenCV display failed. Consider using --headless.")
                 key = ord('q')  # Force quit if display fails
-                
-            if key == ord('q'):  # Quit
-                break
-            elif key == ord('p'):  # Pause/Resume
-                paused = not paused
+            if not paused:
+                timings.lap("display")
+            key_commands = {
+                ord('q'): ["quit"], ord('p'): ["toggle"], ord('c'): ["conf"], ord('m'): ["model"],
+                ord('+'): ["skip", str(frame_skip - 1)], ord('-'): ["skip", str(frame_skip + 1)],
+            }
+            if key in key_commands:
+                commands.append(key_commands[key])
+        elif paused:
+            time.sleep(0.05)
+        
+        if clips is not None:
+            for event in clips.drain_saved():
+                event_log.append(event)
+        
+        for name, *params in commands:
+            if name == "quit":  # Quit
+                running = False
+            elif name in ("toggle", "pause", "resume"):  # Pause/Resume
+                paused = (not paused) if name == "toggle" else (name == "pause")
                 print(f"Detection {'paused' if paused else 'resumed'}")
-            elif key == ord('c'):  # Change confidence
-                confidence_threshold = max(0.1, min(0.9, confidence_threshold + 0.1))
-                if confidence_threshold > 0.9:
-                    confidence_threshold = 0.1
+            elif name == "conf":  # Change confidence
+                try:
+                    if params:
+                        confidence_threshold = round(max(0.1, min(0.9, float(params[0]))), 2)
+                    else:
+                        confidence_threshold = round(confidence_threshold + 0.1, 1)
+                        if confidence_threshold > 0.9:
+                            confidence_threshold = 0.1
+                except ValueError:
+                    print(f"Invalid confidence value: {params[0]}")
+                    continue
+                aggregates.confidence_threshold = confidence_threshold
                 print(f"Confidence threshold set to: {confidence_threshold}")
-            elif key == ord('m'):  # Cycle through models
-                current_model_idx = (current_model_idx + 1) % len(available_models)
-                new_model = available_models[current_model_idx]
-                print(f"Switching to model: {new_model}")
+            elif name == "model":  # Cycle through models or pick one by name (non-blocking)
+                reply = models.request(params[0] if params else None)
+                print(f"Switching model: {reply.get('message') or reply.get('error')}")
+            elif name == "skip":  # Change frame processing interval
                 try:
-                    model = YOLO(new_model)
-                    print(f"Successfully loaded {new_model}")
-                except Exception as e:
-                    print(f"Error loading {new_model}: {e}")
-                    # Revert to previous model
-                    current_model_idx = (current_model_idx - 1) % len(available_models)
-            elif key == ord('+'):  # Increase frame processing
-                frame_skip = max(1, frame_skip - 1)
+                    frame_skip = max(1, min(5, int(params[0])))
+                except (IndexError, ValueError):
+                    continue
                 print(f"Processing every {frame_skip} frame(s)")
-            elif key == ord('-'):  # Decrease frame processing
-                frame_skip = min(5, frame_skip + 1)
-                print(f"Processing every {frame_skip} frame(s)")
-        else:
-            # Even when paused, still handle keyboard input
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):  # Quit
-                break
-            elif key == ord('p'):  # Pause/Resume
-                paused = not paused
-                print(f"Detection {'paused' if paused else 'resumed'}")
+        control.publish(paused=paused, confidence_threshold=confidence_threshold,
+                        frame_skip=frame_skip, model=models.name, model_status=models.status())
     
     # Cleanup
     cap.release()
-    cv2.destroyAllWindows()
+    control.close()
+    if ring is not None:
+        ring.close()
+    if clips is not None:
+        clips.close()
+        for event in clips.drain_saved():
+            event_log.append(event)
+    if not args.headless:
+        cv2.destroyAllWindows()
     
     # Save final results
-    save_json_output(output_file, detection_events, start_time, animal_detections, 
-                    frame_count, processed_frames, confidence_threshold)
+    aggregates.frame_count = frame_count
+    aggregates.processed_frames = processed_frames
+    event_log.append(timings.event())
+    save_json_output(output_file, event_log, aggregates, tracker)
+    event_log.close()
+    print(f"⏱️ Stage timings (ms): {json.dumps(timings.snapshot())}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(parse_args())
\ No newline at end of file
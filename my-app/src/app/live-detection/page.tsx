@@ -130,6 +130,52 @@ export default function LiveDetectionPage() {
     }
   }, [mediaStream])
 
+  // Live detections pushed by the backend (SSE) while the stream is playing
+  useEffect(() => {
+    if (!isPlaying) return
+    const backend = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:5002'
+    const source = new EventSource(`${backend}/webcam/events`)
+    source.addEventListener('delta', (e) => {
+      const delta = JSON.parse((e as MessageEvent).data)
+      const totals: { [key: string]: number } = delta.totals || {}
+      const [animal, count] = Object.entries(totals).sort((a, b) => b[1] - a[1])[0] || ["", 0]
+      setSessionData((prev) => ({
+        ...prev,
+        totalEvents: delta.total_detections,
+        allDetections: totals,
+        leader: {
+          animal,
+          count,
+          percentage: delta.total_detections ? Math.round((count / delta.total_detections) * 1000) / 10 : 0,
+        },
+      }))
+    })
+    source.addEventListener('detection', (e) => {
+      const data = JSON.parse((e as MessageEvent).data)
+      const top = data.detections?.[0]
+      if (!top) return
+      const detection: Detection = {
+        animal: top.animal,
+        confidence: top.confidence,
+        timestamp: data.timestamp * 1000,
+        x: top.box?.[0] ?? 0,
+        y: top.box?.[1] ?? 0,
+      }
+      setLatestDetection(detection)
+      setCurrentDetections(
+        data.detections.map((d: any) => ({
+          animal: d.animal,
+          confidence: d.confidence,
+          timestamp: data.timestamp * 1000,
+          x: d.box?.[0] ?? 0,
+          y: d.box?.[1] ?? 0,
+        }))
+      )
+      setRecentEvents((prev) => [`${top.animal} (${Math.round(top.confidence * 100)}%)`, ...prev].slice(0, 20))
+    })
+    return () => source.close()
+  }, [isPlaying])
+
   const chartData = Object.entries(sessionData.allDetections).map(([animal, count]) => ({
     animal,
     count,
@@ -1,48 +1,221 @@
 #!/usr/bin/env python3
 """
-Test script to verify IP camera functionality with YOLO detection
+Probe IP cameras (or stand-in video files) before deployment.
+
+Every source is opened concurrently and measured for:
+  - connect time (opening the capture)
+  - time to first frame
+  - sustained FPS over the probe window
+  - frame jitter (spread of inter-frame intervals)
+  - decode cost (CPU time of grab() + retrieve() per frame on the probing thread; FFmpeg
+    decodes inside grab(), and thread CPU time leaves out the wait on the network)
+
+The result is a ranked report: working cameras first, best sustained FPS and
+steadiest timing at the top.
+
+Usage:
+    python test_ip_camera.py http://10.50.51.10:8080/video rtsp://cam2/stream
+    python test_ip_camera.py --sources cameras.txt --duration 10 --workers 32 --output report.json
+    python test_ip_camera.py sample.mp4 --backend   # also check the backend accepts the first source
+
+Video files are read at their native frame rate, so they behave like a live camera.
 """
 
-import cv2
-import requests
-import time
+import argparse
+import csv
+import json
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+DEFAULT_SOURCE = "http://10.50.51.10:8080/video"
+
+
+def _open(source: str, timeout_ms: int) -> cv2.VideoCapture:
+    """Open with connect/read timeouts where this OpenCV build supports them."""
+    target: Any = int(source) if source.isdigit() else source
+    params: List[int] = []
+    if isinstance(target, str):
+        for name in ("CAP_PROP_OPEN_TIMEOUT_MSEC", "CAP_PROP_READ_TIMEOUT_MSEC"):
+            if hasattr(cv2, name):
+                params += [getattr(cv2, name), timeout_ms]
+    return cv2.VideoCapture(target, cv2.CAP_ANY, params) if params else cv2.VideoCapture(target)
 
-def test_ip_camera_connection(ip_url):
-    """Test if we can connect to the IP camera"""
-    print(f"Testing connection to: {ip_url}")
-    
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000.0, 1)
+
+
+def probe_camera(source: str, duration: float = 5.0, timeout_ms: int = 5000) -> Dict[str, Any]:
+    """
+    Measure one source for ``duration`` seconds after its first frame.
+
+    Returns:
+        Report row; ``ok`` is False and ``error`` set when the source could not be read
+    """
+    result: Dict[str, Any] = {"source": source, "ok": False, "error": None}
+    is_file = Path(source).is_file()
+    start = time.perf_counter()
+    cap = _open(source, timeout_ms)
+    result["connect_ms"] = _ms(time.perf_counter() - start)
     try:
-        # Try to open the IP camera stream
-        cap = cv2.VideoCapture(ip_url)
-        
         if not cap.isOpened():
-            print(f"❌ Failed to open IP camera at {ip_url}")
-            return False
-        
-        # Try to read a frame
-        ret, frame = cap.read()
-        if not ret:
-            print(f"❌ Failed to read frame from {ip_url}")
-            cap.release()
-            return False
-        
-        print(f"✅ Successfully connected to IP camera at {ip_url}")
-        print(f"   Frame shape: {frame.shape}")
-        cap.release()
-        return True
-        
+            result["error"] = "could not open"
+            return result
+        # Files are paced to their nominal rate so they stand in for a live camera
+        nominal_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        pace = 1.0 / nominal_fps if is_file and nominal_fps > 0 else 0.0
+        arrivals: List[float] = []
+        decode_costs: List[float] = []
+        shape = None
+        first_frame_at = None
+        window_end = None
+        # grab() can keep succeeding while retrieve() never does (e.g. an unsupported codec)
+        first_deadline = time.perf_counter() + timeout_ms / 1000.0
+        next_due = time.perf_counter()
+        while True:
+            if pace:
+                delay = next_due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_due += pace
+            cpu_start = time.thread_time()
+            if not cap.grab():
+                if first_frame_at is None:
+                    result["error"] = "no frame received"
+                break
+            arrived = time.perf_counter()
+            ok, frame = cap.retrieve()
+            decode_cpu = time.thread_time() - cpu_start
+            if not ok or frame is None:
+                if first_frame_at is None and time.perf_counter() >= first_deadline:
+                    result["error"] = "no decodable frame within timeout"
+                    break
+                continue
+            if first_frame_at is None:
+                first_frame_at = arrived
+                window_end = arrived + duration
+                shape = frame.shape
+            arrivals.append(arrived)
+            decode_costs.append(decode_cpu)
+            if arrived >= window_end:
+                break
+        if first_frame_at is None:
+            result["error"] = result["error"] or "no frame received"
+            return result
+        result["time_to_first_frame_ms"] = _ms(first_frame_at - start)
+        result["resolution"] = f"{shape[1]}x{shape[0]}"
+        result["nominal_fps"] = round(nominal_fps, 2) if nominal_fps else None
+        result["frames"] = len(arrivals)
+        span = arrivals[-1] - arrivals[0]
+        result["sustained_fps"] = round((len(arrivals) - 1) / span, 2) if span > 0 else 0.0
+        intervals = np.diff(arrivals)
+        if intervals.size:
+            result["jitter_ms"] = _ms(float(intervals.std()))
+            result["interval_p95_ms"] = _ms(float(np.percentile(intervals, 95)))
+            result["max_gap_ms"] = _ms(float(intervals.max()))
+        costs = np.asarray(decode_costs)
+        result["decode_ms_mean"] = _ms(float(costs.mean()))
+        result["decode_ms_p95"] = _ms(float(np.percentile(costs, 95)))
+        # Short windows (stream ended early) are reported but rank below full ones
+        result["ok"] = len(arrivals) > 1
+        if span < duration * 0.5:
+            result["error"] = f"stream ended after {span:.1f}s"
+        return result
     except Exception as e:
-        print(f"❌ Error connecting to IP camera: {e}")
-        return False
+        result["error"] = str(e)
+        return result
+    finally:
+        cap.release()
+
+
+def rank(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Working sources first, then higher sustained FPS, lower jitter, faster first frame."""
+    def key(r: Dict[str, Any]):
+        return (
+            not r["ok"],
+            r.get("error") is not None,
+            -(r.get("sustained_fps") or 0.0),
+            r.get("jitter_ms") if r.get("jitter_ms") is not None else float("inf"),
+            r.get("time_to_first_frame_ms") or float("inf"),
+        )
+    ranked = sorted(results, key=key)
+    for i, r in enumerate(ranked, 1):
+        r["rank"] = i
+    return ranked
+
+
+def probe_all(sources: List[str], duration: float, workers: int, timeout_ms: int) -> List[Dict[str, Any]]:
+    """Probe every source concurrently (decode and network waits release the GIL)."""
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources)))) as pool:
+        futures = {pool.submit(probe_camera, s, duration, timeout_ms): s for s in sources}
+        for future in as_completed(futures):
+            r = future.result()
+            status = "✅" if r["ok"] else "❌"
+            print(f"{status} {r['source']}: {r.get('sustained_fps', '-')} fps"
+                  f"{'' if r['error'] is None else ' (' + r['error'] + ')'}", file=sys.stderr)
+            results.append(r)
+    return rank(results)
+
+
+COLUMNS = ["rank", "source", "ok", "connect_ms", "time_to_first_frame_ms", "sustained_fps", "nominal_fps",
+           "jitter_ms", "interval_p95_ms", "max_gap_ms", "decode_ms_mean", "decode_ms_p95", "resolution",
+           "frames", "error"]
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'#':>3}  {'fps':>6}  {'jitter':>7}  {'ttff':>7}  {'connect':>7}  {'decode':>6}  {'res':>9}  source"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        def fmt(key: str, width: int) -> str:
+            v = r.get(key)
+            return f"{'-' if v is None else v:>{width}}"
+        line = (f"{r['rank']:>3}  {fmt('sustained_fps', 6)}  {fmt('jitter_ms', 7)}  "
+                f"{fmt('time_to_first_frame_ms', 7)}  {fmt('connect_ms', 7)}  {fmt('decode_ms_mean', 6)}  "
+                f"{fmt('resolution', 9)}  {r['source']}")
+        if r.get("error"):
+            line += f"  ({r['error']})"
+        print(line)
+    working = sum(1 for r in results if r["ok"])
+    print(f"\n{working}/{len(results)} sources delivering frames (times in ms)")
+
+
+def write_report(results: List[Dict[str, Any]], path: str) -> None:
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, "w") as f:
+            json.dump({"generated_at": time.time(), "cameras": results}, f, indent=2)
+    print(f"📝 Report written to {path}")
+
+
+def load_sources(args: argparse.Namespace) -> List[str]:
+    sources = list(args.urls)
+    if args.sources:
+        with open(args.sources, "r") as f:
+            sources += [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    # Keep order, drop duplicates
+    return list(dict.fromkeys(sources)) or [DEFAULT_SOURCE]
+
 
 def test_backend_ip_camera(ip_url):
     """Test backend IP camera processing"""
+    import requests
     print(f"\nTesting backend IP camera processing...")
-    
+
     try:
         # Test setting IP camera URL
-        response = requests.get(f"http://localhost:5002/webcam/start?source={ip_url}")
+        response = requests.get("http://localhost:5002/webcam/start", params={"source": ip_url}, timeout=30)
         if response.status_code == 200:
             data = response.json()
             print(f"✅ Backend accepted IP camera URL")
@@ -51,44 +224,45 @@ def test_backend_ip_camera(ip_url):
         else:
             print(f"❌ Backend rejected IP camera URL: {response.status_code}")
             return False
-            
+
     except Exception as e:
         print(f"❌ Error testing backend: {e}")
         return False
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Concurrent IP camera probe with a ranked report")
+    parser.add_argument("urls", nargs="*", help="Camera URLs, device indexes or video files")
+    parser.add_argument("--sources", "-s", default=None, help="Text file with one source per line (# comments)")
+    parser.add_argument("--duration", "-d", type=float, default=5.0, help="Seconds measured after the first frame")
+    parser.add_argument("--workers", "-w", type=int, default=16, help="Cameras probed at the same time")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Connect/read timeout in seconds")
+    parser.add_argument("--output", "-o", default=None, help="Write the report as .json or .csv")
+    parser.add_argument("--backend", action="store_true",
+                        help="Also check that the backend (localhost:5002) accepts the best source")
+    return parser.parse_args()
+
+
 def main():
-    # Test IP camera URL (adjust as needed)
-    ip_url = "http://10.50.51.10:8080/video"
-    
-    print("🔍 Testing IP Camera Integration")
+    args = parse_args()
+    sources = load_sources(args)
+
+    print(f"🔍 Probing {len(sources)} source(s) for {args.duration:.0f}s each, {args.workers} at a time")
     print("=" * 50)
-    
-    # Test 1: Direct connection to IP camera
-    print("\n1. Testing direct IP camera connection...")
-    if test_ip_camera_connection(ip_url):
-        print("✅ Direct connection successful")
-    else:
-        print("❌ Direct connection failed")
-        print("   Make sure your phone's IP Webcam app is running")
-        print("   Verify the IP address and port are correct")
-        return
-    
-    # Test 2: Backend integration
-    print("\n2. Testing backend integration...")
-    if test_backend_ip_camera(ip_url):
-        print("✅ Backend integration successful")
-    else:
-        print("❌ Backend integration failed")
-        print("   Make sure the backend server is running on port 5002")
-        return
-    
-    print("\n🎉 All tests passed! IP camera should work with YOLO detection.")
-    print("\nNext steps:")
-    print("1. Go to the Live Detection page")
-    print("2. Select 'IP Camera' as source")
-    print("3. Verify the URL is correct")
-    print("4. Click 'Start IP Camera'")
-    print("5. You should see the stream with YOLO detection boxes")
+    started = time.perf_counter()
+    results = probe_all(sources, args.duration, args.workers, int(args.timeout * 1000))
+    print()
+    print_report(results)
+    print(f"⏱️  Probed in {time.perf_counter() - started:.1f}s")
+    if args.output:
+        write_report(results, args.output)
+
+    if args.backend and results and results[0]["ok"]:
+        if not test_backend_ip_camera(results[0]["source"]):
+            print("   Make sure the backend server is running on port 5002")
+    # Non-zero exit when any camera failed, so deployment scripts can gate on it
+    return 0 if all(r["ok"] for r in results) else 1
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())